@@ -0,0 +1,139 @@
+from typing import Dict, Optional
+
+# Token counts tracked for every call
+TOKEN_FIELDS = ("prompt_tokens", "cached_tokens", "completion_tokens")
+
+
+class UsageTotals:
+    """Summed token usage and cost of a set of calls"""
+
+    def __init__(self):
+        self.calls = 0
+        self.estimated_calls = 0  # Calls whose usage the provider didn't report
+        self.cache_hits = 0  # Calls answered from the response cache: no tokens, no cost
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.completion_tokens = 0
+        self.cost_usd = 0.0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def add(self, usage: dict, cost: float):
+        self.calls += 1
+        if usage.get("cache_hit"):
+            self.cache_hits += 1
+            return
+        self.estimated_calls += 1 if usage.get("estimated") else 0
+        self.prompt_tokens += usage.get("prompt_tokens", 0)
+        self.cached_tokens += usage.get("cached_tokens", 0)
+        self.completion_tokens += usage.get("completion_tokens", 0)
+        self.cost_usd += cost
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "estimated_calls": self.estimated_calls,
+            "cache_hits": self.cache_hits,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "UsageTotals":
+        totals = cls()
+        for field in ("calls", "estimated_calls", "cache_hits") + TOKEN_FIELDS:
+            setattr(totals, field, data.get(field, 0))
+        totals.cost_usd = data.get("cost_usd", 0.0)
+        return totals
+
+
+class UsageLedger:
+    """
+    Token usage and cost of one game, broken down per agent, phase and model.
+    Prices come from the `pricing` section of game_config.yaml, in USD per
+    million tokens; cached prompt tokens are billed at the cached_input price.
+    Replays from the response cache reached no provider and cost nothing.
+    """
+
+    def __init__(self, pricing: Optional[dict] = None):
+        pricing = pricing or {}
+        self.default_price = pricing.get("default") or {}
+        self.prices: Dict[str, dict] = pricing.get("models") or {}
+        self.phase = "setup"  # Set by the engine as phases start
+        self.game = UsageTotals()
+        self.agents: Dict[str, UsageTotals] = {}
+        self.phases: Dict[str, UsageTotals] = {}
+        self.models: Dict[str, UsageTotals] = {}
+
+    def price(self, model: str) -> dict:
+        return self.prices.get(model) or self.prices.get(model.split("/", 1)[0]) or self.default_price
+
+    def cost(self, model: str, usage: dict) -> float:
+        if usage.get("cache_hit"):
+            return 0.0
+        price = self.price(model)
+        cached = usage.get("cached_tokens", 0)
+        uncached = max(0, usage.get("prompt_tokens", 0) - cached)
+        return (
+            uncached * price.get("input", 0)
+            + cached * price.get("cached_input", price.get("input", 0))
+            + usage.get("completion_tokens", 0) * price.get("output", 0)
+        ) / 1_000_000
+
+    def record(self, agent: str, model: str, usage: dict):
+        cost = self.cost(model, usage)
+        for totals, key in ((self.agents, agent), (self.phases, self.phase), (self.models, model)):
+            totals.setdefault(key, UsageTotals()).add(usage, cost)
+        self.game.add(usage, cost)
+
+    def summary(self) -> dict:
+        return {
+            "game": self.game.as_dict(),
+            "agents": {name: t.as_dict() for name, t in self.agents.items()},
+            "phases": {name: t.as_dict() for name, t in self.phases.items()},
+            "models": {name: t.as_dict() for name, t in self.models.items()},
+        }
+
+    def restore(self, summary: dict):
+        """Continue from a summary (e.g. a checkpointed game)"""
+        self.game = UsageTotals.from_dict(summary.get("game", {}))
+        for attr in ("agents", "phases", "models"):
+            setattr(self, attr, {name: UsageTotals.from_dict(t) for name, t in summary.get(attr, {}).items()})
+
+
+class Budget:
+    """
+    Per-game spending limit on tokens and/or cost (whichever is hit first).
+    Past `downgrade_at` of the budget, agents switch to `cheap_model`; once the
+    budget is used up the game ends.
+    """
+
+    def __init__(self, settings: dict):
+        self.max_tokens = settings.get("max_tokens")
+        self.max_cost_usd = settings.get("max_cost_usd")
+        self.downgrade_at = settings.get("downgrade_at")
+        self.cheap_model = settings.get("cheap_model")
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_tokens or self.max_cost_usd)
+
+    def used(self, totals: UsageTotals) -> float:
+        """Fraction of the budget spent (the larger of the token and cost fractions)"""
+        fractions = []
+        if self.max_tokens:
+            fractions.append(totals.total_tokens / self.max_tokens)
+        if self.max_cost_usd:
+            fractions.append(totals.cost_usd / self.max_cost_usd)
+        return max(fractions, default=0.0)
+
+    def should_downgrade(self, totals: UsageTotals) -> bool:
+        return bool(self.enabled and self.downgrade_at and self.cheap_model and self.used(totals) >= self.downgrade_at)
+
+    def exhausted(self, totals: UsageTotals) -> bool:
+        return self.enabled and self.used(totals) >= 1.0
@@ -1,29 +1,47 @@
-import os
-
-from openai import AsyncOpenAI
+import asyncio
+import time
 from dotenv import load_dotenv
-from typing import List, AsyncGenerator
+from typing import List, AsyncGenerator, Optional
 
 load_dotenv()
 
 # Import prompts
 from .prompts import PROMPTS_EN, PROMPTS_ZH  
 from .config import GameConfig
+from .backends import LLMBackend, create_backend
+from .cache import with_response_cache
+from .hedging import with_hedging
+from . import metrics
+from .memory import ContextMemory, count_tokens, estimate_tokens
+from .ratelimit import CallClock, RateLimiter, clocked_task
+from .structured import TaggedStreamParser
+from .tracing import span, traced
 
 # Initialize config to get language setting
 _config = GameConfig("game_config.yaml")
 PROMPTS = PROMPTS_ZH if _config.config['language'] == 'zh' else PROMPTS_EN
 
-# Initialize OpenAI client for OpenRouter
-client = AsyncOpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=os.getenv("OPENROUTER_API_KEY"),
-)
+# Shared per-provider rate limiter for every agent in this process
+rate_limiter = RateLimiter(_config.section("rate_limits"))
+
+def default_backend() -> LLMBackend:
+    """Backend configured in game_config.yaml (OpenRouter unless overridden)"""
+    backend = create_backend(_config.section("backend"), rate_limiter)
+    backend = with_hedging(backend, _config.section("hedging"))
+    return with_response_cache(backend, _config.section("response_cache"))
+
+def with_cache_breakpoint(message: dict) -> dict:
+    """Copy of a message with an (Anthropic-style) ephemeral cache_control hint on its content"""
+    return {
+        "role": message["role"],
+        "content": [{"type": "text", "text": message["content"], "cache_control": {"type": "ephemeral"}}]
+    }
 
 class Agent:
-    def __init__(self, name: str, model: str, role: str, system_prompt: str):
+    def __init__(self, name: str, model: str, role: str, system_prompt: str, backend: Optional[LLMBackend] = None):
         self.name = name
         self.model = model
+        self.assigned_model = model  # The model seated for the game; budget downgrades only change self.model
         self.role = role
         self.system_prompt = system_prompt
         self.is_alive = True
@@ -31,17 +49,28 @@ class Agent:
         self.thought_process = ""
         self.last_message = ""
         self.history: List[dict] = []  # Memory: list of {role: str, content: str}
+        self.backend = backend or default_backend()
+        self.memory = ContextMemory.from_config(_config.section("memory"))  # Decides what of history is sent
+        self.game_intro = ""  # Set by the GameEngine; part of the static message prefix
+        self.event_callback = None  # Set by the GameEngine; reports call-level events such as hedges
+        self.ledger = None  # Set by the GameEngine; the game's UsageLedger
+        self.cache_control = _config.section("prompt_cache")["cache_control"]
+        self.act_mode = _config.config["act_mode"]  # "two_call" or "single_call" (reasoning + result in one request)
+        self.call_timeout = _config.section("deadlines")["call_seconds"]  # Seconds per LLM call (None = no limit)
+        self.deadline_hit = False  # Set when a call times out; the engine resets it per decision
+        self.last_usage: dict = {}  # Token usage of the latest call
+        self.cache_stats = {"cached_tokens": 0, "uncached_tokens": 0}  # Input tokens over all calls
     
     def add_memory(self, content: str):
         """Add a system notification to agent's memory"""
         self.history.append({"role": "user", "content": f"[System Notification]: {content}"})
     
-    async def vote(self, context: str, round_num: int, game_intro: str, broadcast_callback=None) -> str:
+    async def vote(self, context: str, round_num: int, game_intro: str, broadcast_callback=None, stream_decision: bool = True) -> str:
         """Vote for a player to eliminate during day phase"""
         task = "Vote to eliminate one player you believe is a werewolf."
         instruction = "Output ONLY the player's name. No other text."
         
-        return await self.act(context, round_num, game_intro, task, instruction, broadcast_callback)
+        return await self.act(context, round_num, game_intro, task, instruction, broadcast_callback, stream_decision)
 
     async def think(self, context: str, round_num: int, game_intro: str) -> AsyncGenerator[str, None]:
         self.status = "reasoning"
@@ -53,8 +82,9 @@ class Agent:
             game_intro=game_intro,
             player_name=self.name
         )
-        async for chunk in self.call_model(prompt, stream=_config.config['enable_streaming']):
-            yield chunk
+        with span(f"think {self.name}", "agent"):
+            async for chunk in self.call_model(prompt, stream=_config.config['enable_streaming']):
+                yield chunk
 
         self.status = "idle"
 
@@ -69,17 +99,23 @@ class Agent:
             player_name=self.name,
             thought_process=self.thought_process
         )
-        async for chunk in self.call_model(prompt, stream=_config.config['enable_streaming']):
-            yield chunk
+        with span(f"speak {self.name}", "agent"):
+            async for chunk in self.call_model(prompt, stream=_config.config['enable_streaming']):
+                yield chunk
 
         self.status = "idle"        
 
-    async def act(self, context: str, round_num: int, game_intro: str, task: str, output_instruction: str, broadcast_callback=None):
+    @traced("agent")
+    async def act(self, context: str, round_num: int, game_intro: str, task: str, output_instruction: str, broadcast_callback=None, stream_decision: bool = True):
         """
         Generic method for agent to make a decision.
         Returns the decision as a string.
         Optionally broadcasts thought chunks via callback.
+        If stream_decision is False, only the thoughts are broadcast (e.g. secret ballots).
         """
+        if self.act_mode == "single_call":
+            return await self.act_structured(context, round_num, task, output_instruction, broadcast_callback, stream_decision)
+        
         self.status = "reasoning"
         self.thought_process = ""
         
@@ -115,7 +151,7 @@ class Agent:
         decision = ""
         try:
             self.last_message = ""
-            if broadcast_callback:
+            if broadcast_callback and stream_decision:
                 # If broadcasting, we can stream the action too if desired, 
                 # but usually action is short. Let's stream it for consistency if callback exists.
                 async for chunk in self.call_model(decide_prompt, stream=_config.config['enable_streaming']):
@@ -133,72 +169,271 @@ class Agent:
         self.status = "idle"
         return decision
 
+    @traced("agent")
+    async def act_structured(self, context: str, round_num: int, task: str, output_instruction: str, broadcast_callback=None, stream_decision: bool = True) -> str:
+        """
+        Single-call version of `act`: reasoning and decision come back in one tagged
+        response. The reasoning streams as "thought" events, the answer as "action".
+        """
+        self.status = "reasoning"
+        prompt = PROMPTS["act_structured"].format(
+            context=context,
+            round=round_num,
+            task=task,
+            output_instruction=output_instruction
+        )
+        
+        parser = TaggedStreamParser(("thought", "answer"))
+        try:
+            async for event_type, text in self.call_model_tagged(prompt, parser, {"thought": "thought", "answer": "action"},
+                                                                  stream=bool(broadcast_callback) and _config.config['enable_streaming']):
+                if broadcast_callback and (event_type == "thought" or stream_decision):
+                    await broadcast_callback(event_type, self.name, text)
+            decision = parser.get("answer")
+        except Exception as e:
+            decision = f"Error deciding: {str(e)}"
+        
+        self.thought_process = parser.parts["thought"].strip()
+        self.last_message = decision
+        self.status = "idle"
+        return decision
+
+    async def discuss(self, context: str, round_num: int) -> AsyncGenerator[tuple, None]:
+        """
+        Single-call version of `think` followed by `speak`.
+        Yields ("thought", chunk) and ("speech", chunk) pairs as the response streams.
+        """
+        self.status = "speaking"
+        prompt = PROMPTS["discuss_structured"].format(context=context, round=round_num)
+        
+        parser = TaggedStreamParser(("thought", "speech"))
+        with span(f"discuss {self.name}", "agent"):
+            async for event_type, text in self.call_model_tagged(prompt, parser, {"thought": "thought", "speech": "speech"},
+                                                                  stream=_config.config['enable_streaming']):
+                yield event_type, text
+        
+        self.thought_process = parser.parts["thought"].strip()
+        self.last_message = parser.get("speech")
+        self.status = "idle"
+
+    async def call_model_tagged(self, prompt: str, parser: TaggedStreamParser, event_types: dict, stream: bool = True) -> AsyncGenerator[tuple, None]:
+        """
+        `call_model` for tagged responses: yields (event type, text) as the sections stream in.
+        Text outside any tag counts as reasoning; each section ends with a newline so viewers flush it.
+        """
+        self.thought_process = ""
+        self.last_message = ""
+        current = None
+        
+        async def segments():
+            async for chunk in self.call_model(prompt, stream=stream):
+                for segment in parser.feed(chunk):
+                    yield segment
+            for segment in parser.close():
+                yield segment
+        
+        async for section, text in segments():
+            event_type = event_types.get(section, "thought")
+            if section is None and not text.strip():
+                continue
+            if current and event_type != current:
+                yield current, "\n"
+            current = event_type
+            yield event_type, text
+        if current:
+            yield current, "\n"
+
     def add_memory(self, content: str):
         """
         Inject external information into the agent's memory.
         """
         self.history.append({"role": "user", "content": f"[System Notification]: {content}"})
 
-    async def call_model(self, prompt: str, stream: bool = True) -> AsyncGenerator[str, None]:
+    @traced("agent")
+    async def reask(self, answer: str, options: List[str], output_instruction: str, max_tokens: int) -> str:
+        """Short follow-up when an answer named no legal option: the options and the instruction only"""
+        self.status = "deciding"
+        self.last_message = ""
+        prompt = PROMPTS["decision_retry"].format(
+            answer=answer.strip()[:80],
+            options=", ".join(options),
+            output_instruction=output_instruction
+        )
+        async for _ in self.call_model(prompt, stream=False, max_tokens=max_tokens):
+            pass
+        self.status = "idle"
+        return self.last_message.strip()
+
+    async def within_deadline(self, clock: CallClock, awaitable):
+        """
+        Await part of an LLM call, raising asyncio.TimeoutError once the call has
+        run for call_timeout seconds on its clock (rate limit waits don't count)
+        """
+        task = clocked_task(clock, awaitable)
+        try:
+            while not task.done():
+                remaining = None if self.call_timeout is None else self.call_timeout - clock.elapsed()
+                if remaining is not None and remaining <= 0:
+                    raise asyncio.TimeoutError
+                await asyncio.wait({task}, timeout=remaining)
+            return task.result()
+        finally:
+            if not task.done():
+                task.cancel()
+                await asyncio.wait({task})
+
+    async def call_model(self, prompt: str, stream: bool = True, **params) -> AsyncGenerator[str, None]:
         """
         Call the LLM model.
         :param prompt: The user prompt
         :param stream: Whether to stream the response (yield chunks) or yield once (full response)
+        :param params: Extra sampling parameters for the backend (e.g. max_tokens)
         """
-        try:
-            # Construct messages with history
-            messages = [{"role": "system", "content": self.system_prompt}]
-            messages.extend(self.history)
-            messages.append({"role": "user", "content": prompt})
-
-            if stream:
-                response_stream = await client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    stream=True
-                )
-
-                full_response = ""
-                async for chunk in response_stream:
-                    content = chunk.choices[0].delta.content
-                    if content:
-                        self.thought_process += content if self.status == "reasoning" else ""
-                        self.last_message += content
-                        full_response += content
-                        yield content
-                # Yield a newline to ensure the viewer flushes the buffer
-                yield "\n"
-            else:
-                response = await client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    stream=False
-                )
-                
-                content = response.choices[0].message.content or ""
-                self.thought_process += content if self.status == "reasoning" else ""
-                self.last_message += content
-                full_response = content
-                # Append newline to ensure viewer flushes
-                yield content + "\n"
-
-            # Update history after successful completion
-            self.history.append({"role": "user", "content": prompt})
-            self.history.append({"role": "assistant", "content": full_response})
+        with span(f"call_model {self.name}", "llm", model=self.model) as call_span:
+            started = time.monotonic()
+            clock = CallClock()
+            consumer_time = 0.0
+            first_token_at = None
+            metrics.LLM_REQUESTS.inc(model=self.model)
+            try:
+                messages = self.build_messages(prompt)
+                usage = {}
 
-        except Exception as e:
-            error_msg = f"Error speaking: {str(e)}"
-            self.last_message = error_msg
-            yield error_msg
+                if stream:
+                    full_response = ""
+                    chunks = self.backend.stream(self.model, messages, usage=usage, **params)
+                    try:
+                        while True:
+                            # Cancelling a pending chunk closes the stream (and its connection)
+                            try:
+                                content = await self.within_deadline(clock, chunks.__anext__())
+                            except StopAsyncIteration:
+                                break
+                            if content:
+                                if first_token_at is None:
+                                    first_token_at = time.monotonic()
+                                self.thought_process += content if self.status == "reasoning" else ""
+                                self.last_message += content
+                                full_response += content
+                                yielded = time.monotonic()
+                                yield content
+                                consumer_time += time.monotonic() - yielded
+                    finally:
+                        await chunks.aclose()
+                    # Yield a newline to ensure the viewer flushes the buffer
+                    yield "\n"
+                else:
+                    content = await self.within_deadline(clock, self.backend.complete(self.model, messages, usage=usage, **params))
+                    self.thought_process += content if self.status == "reasoning" else ""
+                    self.last_message += content
+                    full_response = content
+                    # Append newline to ensure viewer flushes
+                    yielded = time.monotonic()
+                    yield content + "\n"
+                    consumer_time += time.monotonic() - yielded
+
+                # Update history after successful completion
+                self.history.append({"role": "user", "content": prompt})
+                self.history.append({"role": "assistant", "content": full_response})
+                if not usage.get("prompt_tokens"):
+                    # Provider didn't report usage: estimate it so accounting and budgets still work
+                    usage.update(prompt_tokens=count_tokens(messages), completion_tokens=estimate_tokens(full_response),
+                                 cached_tokens=usage.get("cached_tokens", 0), estimated=True)
+                self.record_usage(usage)
+                if self.ledger:
+                    self.ledger.record(self.name, self.model, usage)
+                self.record_call_metrics(started, first_token_at, full_response)
+                if call_span:
+                    # Time actually spent waiting on the model, not on whoever consumed the chunks
+                    call_span.args.update(llm_wait_s=round(time.monotonic() - started - consumer_time, 4),
+                                          completion_tokens=usage["completion_tokens"])
+                hedge = usage.get("hedge")
+                if hedge:
+                    metrics.LLM_HEDGES.inc(model=self.model, winner=hedge["winner"])
+                if hedge and self.event_callback:
+                    await self.event_callback("hedge", self.name, (
+                        f"No first token from {hedge['model']} within {hedge['delay_ms']} ms; "
+                        f"hedged to {hedge['fallback']}, answered by {hedge['winner']}.\n"
+                    ))
+
+            except asyncio.TimeoutError:
+                # Whatever streamed so far stands; the partial exchange is not kept in history
+                self.deadline_hit = True
+                metrics.TIMEOUTS.inc(scope="call")
+                if self.event_callback:
+                    await self.event_callback("timeout", self.name, (
+                        f"{self.model} did not finish within {self.call_timeout:g} s; the call was cancelled.\n"
+                    ))
+                if stream:
+                    yield "\n"
+            except Exception as e:
+                metrics.LLM_ERRORS.inc(model=self.model)
+                error_msg = f"Error speaking: {str(e)}"
+                self.last_message = error_msg
+                yield error_msg
+
+    def record_call_metrics(self, started: float, first_token_at: Optional[float], response: str):
+        """Latency and throughput of the call that just finished (see src/metrics.py)"""
+        finished = time.monotonic()
+        completion_tokens = self.last_usage.get("completion_tokens") or estimate_tokens(response)
+        metrics.LLM_REQUEST_DURATION.observe(finished - started, model=self.model)
+        if first_token_at is not None:
+            metrics.LLM_TIME_TO_FIRST_TOKEN.observe(first_token_at - started, model=self.model)
+            if finished > first_token_at:
+                metrics.LLM_TOKENS_PER_SECOND.observe(completion_tokens / (finished - first_token_at), model=self.model)
+        metrics.LLM_TOKENS.inc(self.last_usage.get("prompt_tokens", 0), model=self.model, kind="prompt")
+        metrics.LLM_TOKENS.inc(self.last_usage.get("cached_tokens", 0), model=self.model, kind="cached")
+        metrics.LLM_TOKENS.inc(completion_tokens, model=self.model, kind="completion")
+
+    def static_prefix(self) -> str:
+        """System message: game settings, role rules and identity. Identical on every call."""
+        if not self.game_intro:
+            return self.system_prompt
+        return PROMPTS["static_context"].format(
+            game_intro=self.game_intro,
+            system_prompt=self.system_prompt,
+            player_name=self.name
+        )
+
+    def build_messages(self, prompt: str) -> List[dict]:
+        """
+        Lay out a request so that it shares the longest possible prefix with earlier ones:
+        the static system message first, then the (append-only) history compacted to the
+        memory's token budget, and only then the volatile per-call prompt.
+        With cache_control enabled, the end of the static part and of the history are
+        marked as cache breakpoints for providers that support them.
+        """
+        messages = [{"role": "system", "content": self.static_prefix()}]
+        messages.extend(self.memory.build(self.history))
+
+        if self.cache_control:
+            messages[0] = with_cache_breakpoint(messages[0])
+            if len(messages) > 1:
+                messages[-1] = with_cache_breakpoint(messages[-1])
+
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
+    def record_usage(self, usage: dict):
+        """Keep the provider-reported token usage of the latest call"""
+        if not usage:
+            self.last_usage = {}
+            return
+        cached = usage.get("cached_tokens", 0)
+        uncached = max(0, usage.get("prompt_tokens", 0) - cached)
+        self.last_usage = dict(usage, uncached_tokens=uncached)
+        self.cache_stats["cached_tokens"] += cached
+        self.cache_stats["uncached_tokens"] += uncached
 
 
 class God(Agent):
-    def __init__(self, name: str, model: str, role: str, system_prompt: str):
+    def __init__(self, name: str, model: str, role: str, system_prompt: str, backend: Optional[LLMBackend] = None):
         super().__init__(
             "GOD", 
             "x-ai/grok-4.1-fast:free", # Use a fast model for the host
             "God", 
-            "You are the God of the Werewolf Arena. You are omniscient and omnipotent. You can see the inner thoughts of all players."
+            "You are the God of the Werewolf Arena. You are omniscient and omnipotent. You can see the inner thoughts of all players.",
+            backend
         )
 
     async def announce(self, message: str) -> AsyncGenerator[str, None]:
@@ -207,18 +442,20 @@ class God(Agent):
         
         prompt = PROMPTS["god_announce"].format(message=message)
 
-        async for chunk in self.call_model(prompt, stream=_config.config['enable_streaming']):
-            yield chunk
+        with span(f"announce {self.name}", "agent"):
+            async for chunk in self.call_model(prompt, stream=_config.config['enable_streaming']):
+                yield chunk
 
         self.status = "idle"
 
 class Werewolf(Agent):
-    def __init__(self, name: str, model: str, role: str, system_prompt: str):
+    def __init__(self, name: str, model: str, role: str, system_prompt: str, backend: Optional[LLMBackend] = None):
         super().__init__(
             name, 
             model, 
             role, 
-            system_prompt
+            system_prompt,
+            backend
         )
     
     async def kill(self, alive_players: List[str], round_num: int, game_intro: str, teammates: List[str] = None, teammate_votes: List[str] = None, broadcast_callback=None) -> str:
@@ -239,12 +476,13 @@ class Werewolf(Agent):
 
 
 class Seer(Agent):
-    def __init__(self, name: str, model: str, role: str, system_prompt: str):
+    def __init__(self, name: str, model: str, role: str, system_prompt: str, backend: Optional[LLMBackend] = None):
         super().__init__(
             name, 
             model, 
             role, 
-            system_prompt
+            system_prompt,
+            backend
         )
     
     async def verify(self, alive_players: List[str], round_num: int, game_intro: str, broadcast_callback=None) -> str:
@@ -255,13 +493,21 @@ class Seer(Agent):
         return await self.act(context, round_num, game_intro, task, instruction, broadcast_callback)
 
 class Witch(Agent):
-    def __init__(self, name: str, model: str, role: str, system_prompt: str):
+    def __init__(self, name: str, model: str, role: str, system_prompt: str, backend: Optional[LLMBackend] = None):
         super().__init__(
             name, 
             model, 
             role, 
-            system_prompt
+            system_prompt,
+            backend
         )
+        # Each potion can be used once per game
+        self.has_antidote = True
+        self.has_poison = True
+    
+    def potions_left(self) -> str:
+        left = [name for name, available in (("Antidote", self.has_antidote), ("Poison", self.has_poison)) if available]
+        return f"Potions left: {', '.join(left) if left else 'none'}."
     
     async def use_potion(self, night_info: str, round_num: int, game_intro: str, broadcast_callback=None) -> str:
         context = f"Night Info: {night_info}"
@@ -0,0 +1,374 @@
+"""
+Post-game analytics: per-model Elo ratings split by faction, and decision
+statistics (votes, Seer checks, Witch potions) across many games.
+
+Games are read from tournament results (JSON lines) and from event log
+directories (the game_over event carries the winner, players and decision
+record). Ratings are kept in a JSON file and only updated with games they
+have not seen yet:
+
+    python -m src.analytics results.jsonl logs/ --ratings ratings.json
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from .config import GameConfig
+from .event_log import EventLogReader
+from .registry import VILLAGERS, WEREWOLVES
+
+FACTIONS = (VILLAGERS, WEREWOLVES)
+
+
+def faction_of(role: str) -> str:
+    return WEREWOLVES if role == "Werewolf" else VILLAGERS
+
+
+def game_from_result(result: dict) -> Optional[dict]:
+    """A tournament result line as a game, or None if it did not finish"""
+    if result.get("error") or not result.get("winner"):
+        return None
+    return {
+        "game_id": result["game_id"],
+        "winner": result["winner"],
+        "end_reason": result.get("end_reason"),
+        "finished_at": result.get("finished_at") or 0,
+        "players": result["players"],
+        "record": result.get("record") or {},
+    }
+
+
+def game_from_log(log_dir: str, game_id: str) -> Optional[dict]:
+    """A game from its event log, or None if it did not finish (or predates decision records)"""
+    reader = EventLogReader(log_dir, game_id)
+    event = reader.game_over()
+    if not event or not event.get("winner") or not event.get("players"):
+        return None
+    return {
+        "game_id": game_id,
+        "winner": event["winner"],
+        "end_reason": event.get("end_reason"),
+        "finished_at": reader.finished_at(),
+        "players": event["players"],
+        "record": event.get("record") or {},
+    }
+
+
+def game_from_engine(engine) -> Optional[dict]:
+    """A game that just ended in this process, or None if it did not finish"""
+    if not engine.winner:
+        return None
+    return {
+        "game_id": engine.game_id,
+        "winner": engine.winner,
+        "end_reason": engine.end_reason,
+        "finished_at": engine.finished_at or 0,
+        "players": engine.player_summary(),
+        "record": engine.record,
+    }
+
+
+def read_games(source: str) -> Iterator[Optional[dict]]:
+    """Every game in a results file or event log directory (None for the unfinished ones)"""
+    if os.path.isdir(source):
+        for name in os.listdir(source):
+            if name.endswith(".evlog"):
+                yield game_from_log(source, name[:-len(".evlog")])
+    elif os.path.exists(source):
+        with open(source, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield game_from_result(json.loads(line))
+
+
+def load_games(sources: Iterable[str]) -> List[dict]:
+    """
+    Finished games from results files and event log directories, each game
+    once, in the order they finished (Elo depends on the order games are rated)
+    """
+    games: Dict[str, dict] = {}
+    for source in sources:
+        for game in read_games(source):
+            if game is not None:
+                games.setdefault(game["game_id"], game)
+    return sorted(games.values(), key=lambda game: game["finished_at"])
+
+
+class Leaderboard:
+    """
+    Elo ratings per model and faction, updated one game at a time. Each side
+    is rated as the mean rating of its players; every (model, faction) on a
+    side then moves by k * (score - expected), once per game however many of
+    its players took part. A draw scores 0.5 for both sides; games cut
+    short by the budget are not rated, since neither side was outplayed.
+    """
+
+    def __init__(self, k_factor: float = 24, initial_rating: float = 1500):
+        self.k_factor = k_factor
+        self.initial_rating = initial_rating
+        self.ratings: Dict[str, Dict[str, float]] = {}  # {model: {faction: rating}}
+        self.played: Dict[str, Dict[str, int]] = {}
+        self.won: Dict[str, Dict[str, int]] = {}
+        self.rated_games = set()
+
+    def rating(self, model: str, faction: str) -> float:
+        return self.ratings.get(model, {}).get(faction, self.initial_rating)
+
+    def update(self, game: dict) -> bool:
+        """Rate one finished game; returns False if it was already rated or can't be"""
+        if game["game_id"] in self.rated_games or game.get("end_reason") == "budget":
+            return False
+        sides: Dict[str, List[str]] = {faction: [] for faction in FACTIONS}
+        for player in game["players"]:
+            sides[faction_of(player["role"])].append(player["model"])
+        if not all(sides.values()):
+            return False
+
+        strength = {f: sum(self.rating(m, f) for m in models) / len(models) for f, models in sides.items()}
+        expected = 1 / (1 + 10 ** ((strength[WEREWOLVES] - strength[VILLAGERS]) / 400))
+        score = {"villagers": 1.0, "werewolves": 0.0}.get(game["winner"], 0.5)
+        results = {VILLAGERS: (score, expected), WEREWOLVES: (1 - score, 1 - expected)}
+
+        for faction, models in sides.items():
+            actual, predicted = results[faction]
+            for model in set(models):
+                self.ratings.setdefault(model, {})[faction] = self.rating(model, faction) + self.k_factor * (actual - predicted)
+                self.played.setdefault(model, {}).setdefault(faction, 0)
+                self.played[model][faction] += 1
+                self.won.setdefault(model, {}).setdefault(faction, 0)
+                self.won[model][faction] += 1 if actual == 1 else 0
+        self.rated_games.add(game["game_id"])
+        return True
+
+    def table(self) -> List[dict]:
+        """One row per model, best average rating first"""
+        rows = []
+        for model in self.ratings:
+            row = {"model": model}
+            for faction in FACTIONS:
+                row[faction] = {
+                    "rating": round(self.rating(model, faction), 1),
+                    "games": self.played[model].get(faction, 0),
+                    "wins": self.won[model].get(faction, 0),
+                }
+            row["rating"] = round(sum(row[f]["rating"] for f in FACTIONS) / len(FACTIONS), 1)
+            rows.append(row)
+        return sorted(rows, key=lambda row: -row["rating"])
+
+    def to_dict(self) -> dict:
+        return {
+            "k_factor": self.k_factor,
+            "initial_rating": self.initial_rating,
+            "ratings": self.ratings,
+            "played": self.played,
+            "won": self.won,
+            "rated_games": sorted(self.rated_games),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Leaderboard":
+        board = cls(data["k_factor"], data["initial_rating"])
+        board.ratings = data["ratings"]
+        board.played = data["played"]
+        board.won = data["won"]
+        board.rated_games = set(data["rated_games"])
+        return board
+
+    def save(self, path: str):
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        # A unique temp file per writer, so concurrent saves never interleave
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str, k_factor: float = 24, initial_rating: float = 1500) -> "Leaderboard":
+        if not os.path.exists(path):
+            return cls(k_factor, initial_rating)
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def decision_stats(games: List[dict]) -> dict:
+    """
+    Vote matrix (voter faction x target faction), voter accuracy, Seer hit rate
+    and Witch potion efficiency, overall and per model. The records are
+    flattened into arrays once and aggregated with NumPy, so this stays fast
+    over thousands of games.
+    """
+    # Flat per-decision columns: model and faction of the actor, faction of the target (-1 = none)
+    votes, checks, potions = ([], [], []), ([], []), ([], [], [])
+    for game in games:
+        players = {p["name"]: p for p in game["players"]}
+
+        def faction_index(name: Optional[str]) -> int:
+            return FACTIONS.index(faction_of(players[name]["role"])) if name in players else -1
+
+        for day in game["record"].get("days", []):
+            for voter, target in day["votes"].items():
+                votes[0].append(players[voter]["model"])
+                votes[1].append(faction_index(voter))
+                votes[2].append(faction_index(target))
+        for night in game["record"].get("nights", []):
+            if night.get("seer_check"):
+                checks[0].append(players[night["seer"]]["model"])
+                checks[1].append(faction_index(night["seer_check"]))
+            witch = night.get("witch")
+            if witch and witch["action"] != "PASS":
+                potions[0].append(players[witch["name"]]["model"])
+                potions[1].append(witch["action"] == "SAVE")
+                potions[2].append(faction_index(witch["target"]))
+
+    wolf, village = FACTIONS.index(WEREWOLVES), FACTIONS.index(VILLAGERS)
+
+    # Rows: voter faction; columns: voted villager, voted werewolf, abstained
+    voter_faction, target_faction = np.array(votes[1], dtype=int), np.array(votes[2], dtype=int)
+    matrix = np.zeros((len(FACTIONS), len(FACTIONS) + 1), dtype=int)
+    np.add.at(matrix, (voter_faction, np.where(target_faction < 0, len(FACTIONS), target_faction)), 1)
+
+    # Village ballots that named someone: right if they named a werewolf
+    village_ballots = (voter_faction == village) & (target_faction >= 0)
+    is_save, potion_target = np.array(potions[1], dtype=bool), np.array(potions[2], dtype=int)
+
+    return {
+        "games": len(games),
+        "vote_matrix": {
+            FACTIONS[row]: {"villagers": int(counts[0]), "werewolves": int(counts[1]), "abstained": int(counts[2])}
+            for row, counts in enumerate(matrix)
+        },
+        "voter_accuracy": rates(np.array(votes[0])[village_ballots], target_faction[village_ballots] == wolf),
+        "seer_hit_rate": rates(np.array(checks[0]), np.array(checks[1], dtype=int) == wolf),
+        # A save is efficient when it kept a villager alive; a poison when it killed a werewolf
+        "witch_save_efficiency": rates(np.array(potions[0])[is_save], potion_target[is_save] == village),
+        "witch_poison_accuracy": rates(np.array(potions[0])[~is_save], potion_target[~is_save] == wolf),
+    }
+
+
+def rates(models, hits) -> dict:
+    """Share of hits overall and per model, with the number of decisions behind each"""
+    if len(models) == 0:
+        return {"overall": None, "decisions": 0, "models": {}}
+    names, index = np.unique(models, return_inverse=True)
+    totals = np.bincount(index, minlength=len(names))
+    successes = np.bincount(index, weights=hits.astype(float), minlength=len(names))
+    return {
+        "overall": round(float(hits.mean()), 4),
+        "decisions": int(len(hits)),
+        "models": {
+            str(name): {"rate": round(float(s / t), 4), "decisions": int(t)}
+            for name, s, t in zip(names, successes, totals)
+        },
+    }
+
+
+class Analytics:
+    """
+    Finished games and their ratings, kept in memory. The sources are read
+    once, on first use; after that the server adds each game as it ends, so
+    a report only reads. One lock serializes loading, rating (and saving the
+    ratings file) and reports across threads.
+    """
+
+    def __init__(self, sources: Iterable[str], settings: dict):
+        self.sources = list(sources)
+        self.settings = settings
+        self.lock = threading.Lock()
+        self.games: List[dict] = []
+        self.game_ids = set()
+        self.board: Optional[Leaderboard] = None
+        self.newly_rated = 0
+
+    def _load(self):
+        if self.board is not None:
+            return
+        self.board = Leaderboard.load(self.settings["ratings_path"], self.settings["k_factor"],
+                                      self.settings["initial_rating"])
+        self._rate(load_games(self.sources))
+
+    def _rate(self, games: Iterable[dict]):
+        """Keep games not seen before and rate them, saving the ratings if any were new"""
+        rated = 0
+        for game in games:
+            if game["game_id"] in self.game_ids:
+                continue
+            self.game_ids.add(game["game_id"])
+            self.games.append(game)
+            rated += self.board.update(game)
+        if rated:
+            self.board.save(self.settings["ratings_path"])
+        self.newly_rated += rated
+
+    def add(self, game: dict):
+        """Rate a game that just finished"""
+        with self.lock:
+            self._load()
+            self._rate([game])
+
+    def report(self) -> dict:
+        with self.lock:
+            self._load()
+            return {"games": len(self.games), "newly_rated": self.newly_rated, "leaderboard": self.board.table(),
+                    "stats": decision_stats(self.games)}
+
+
+def build_report(sources: Iterable[str], settings: dict) -> dict:
+    """Rate games not seen before (saving the ratings), then compute statistics over all of them"""
+    return Analytics(sources, settings).report()
+
+
+def print_report(report: dict):
+    print(f"{report['games']} finished games ({report['newly_rated']} newly rated)\n")
+    print(f"{'Model':<40} {'Rating':>7} {'Village':>16} {'Wolf':>16}")
+    for row in report["leaderboard"]:
+        village, wolf = row[VILLAGERS], row[WEREWOLVES]
+        print(f"{row['model']:<40} {row['rating']:>7.1f} "
+              f"{village['rating']:>7.1f} {village['wins']:>3}/{village['games']:<4} "
+              f"{wolf['rating']:>7.1f} {wolf['wins']:>3}/{wolf['games']:<4}")
+
+    stats = report["stats"]
+    print("\nVotes (voter faction -> target):")
+    for faction, counts in stats["vote_matrix"].items():
+        print(f"  {faction:<11} {counts}")
+    for key, label in (("voter_accuracy", "Village voters naming a werewolf"), ("seer_hit_rate", "Seer checks finding a werewolf"),
+                       ("witch_save_efficiency", "Witch saves of villagers"), ("witch_poison_accuracy", "Witch poisons of werewolves")):
+        entry = stats[key]
+        overall = "-" if entry["overall"] is None else f"{entry['overall']:.1%}"
+        print(f"{label}: {overall} of {entry['decisions']}")
+        for model, value in entry["models"].items():
+            print(f"  {model:<38} {value['rate']:.1%} of {value['decisions']}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Model ratings and decision statistics from finished games.")
+    parser.add_argument("sources", nargs="*", help="Tournament results files and/or event log directories")
+    parser.add_argument("--config", default="game_config.yaml", help="Game config file")
+    parser.add_argument("--ratings", help="Ratings file to update (default: analytics.ratings_path)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    config = GameConfig(args.config)
+    settings = config.section("analytics")
+    if args.ratings:
+        settings["ratings_path"] = args.ratings
+    sources = args.sources or [config.section("event_log")["dir"]]
+
+    report = build_report(sources, settings)
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,16 @@
 import asyncio
 import json
-from fastapi import FastAPI, Request
-from fastapi.responses import StreamingResponse
+from typing import Dict, Optional
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from .agents import Agent, God, Werewolf, Seer, Witch
-from .game_engine import GameEngine
+from .checkpoint import list_checkpoints
+from . import analytics, metrics
+from .config import GameConfig
+from .event_log import EventLogReader
+from .events import Subscription
+from .sessions import GameActiveError, GameManager, GameLimitError, GameSession
+from .wire import WireProtocol
 
 app = FastAPI()
 
@@ -16,84 +22,311 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global game engine instance
-engine: GameEngine = None
+# Global game manager (one GameEngine per game id)
+manager: GameManager = None
 
-def init_game():
-    global engine
+# Most recently created game, used by the legacy single-game endpoints
+latest_game_id: Optional[str] = None
+
+# Where game event logs are written (and replayed from)
+event_log_dir = "logs"
+
+# Ratings and decision statistics, updated as games finish
+game_analytics: Optional[analytics.Analytics] = None
+
+def init_manager():
+    global manager, event_log_dir
     print("Initializing Werewolf Arena...")
-    
-    # Load configuration
-    from .config import GameConfig
+
     config = GameConfig("game_config.yaml")
-    
-    # Get prompts based on language
-    prompts = config.get_prompts()
-    
-    # Assign roles randomly
-    player_configs = config.assign_roles()
-    
+    sessions = config.section("sessions")
+
     print(f"Game Mode: {config.config['mode']}")
     print(f"Language: {config.config['language']}")
-    print("\nPlayer Assignment:")
-    for pc in player_configs:
-        print(f"  - {pc['name']}: {pc['role']} (Model: {pc['model']})")
-    print()
-    
-    # Create God
-    god = God("God", "x-ai/grok-4.1-fast:free", "God", prompts["god"])
-    
-    # Create players based on configuration
-    players = [god]
-    for pc in player_configs:
-        role_type = pc["role"]
-        name = pc["name"]
-        model = pc["model"]
-        prompt = prompts.get(role_type, prompts["villager"])
-        
-        if role_type == "werewolf":
-            players.append(Werewolf(name, model, "Werewolf", prompt))
-        elif role_type == "seer":
-            players.append(Seer(name, model, "Seer", prompt))
-        elif role_type == "witch":
-            players.append(Witch(name, model, "Witch", prompt))
-        else:  # villager
-            players.append(Agent(name, model, "Villager", prompt))
-    
-    engine = GameEngine(players)
-    
-    # Store role mapping for God Mode in terminal
-    engine.role_mapping = {p.name: p.role for p in players if p.name != "God"}
+    print(f"Max concurrent games: {sessions['max_concurrent_games']}\n")
+
+    event_log_dir = config.section("event_log")["dir"]
+    manager = GameManager(
+        max_games=sessions["max_concurrent_games"],
+        ttl_seconds=sessions["game_ttl_seconds"],
+        on_finished=rate_finished_game,
+    )
+    manager.run_in_background(manager.run_reaper(sessions["reaper_interval_seconds"]))
+
+    checkpoints = config.section("checkpoint")
+    if checkpoints["enabled"] and checkpoints["resume_on_startup"]:
+        for game_id in list_checkpoints(checkpoints["dir"]):
+            try:
+                manager.resume_game(game_id, GameConfig("game_config.yaml"))
+            except (GameLimitError, ValueError) as e:
+                print(f"Could not resume game {game_id}: {e}")
+
+def get_game_analytics() -> analytics.Analytics:
+    global game_analytics
+    if game_analytics is None:
+        settings = GameConfig("game_config.yaml").section("analytics")
+        game_analytics = analytics.Analytics([event_log_dir] + list(settings["results_files"]), settings)
+    return game_analytics
+
+def rate_finished_game(session: GameSession):
+    """Rate a game as soon as it ends, off the event loop"""
+    game = analytics.game_from_engine(session.engine)
+    if game:
+        manager.run_in_background(asyncio.to_thread(get_game_analytics().add, game))
+
+def running_sessions():
+    return [s for s in manager.sessions.values() if not s.is_finished] if manager else []
+
+# Per-game gauges, read from the live games at scrape time
+metrics.REGISTRY.register(metrics.Gauge(
+    "werewolf_games_running", "Games currently being played.",
+    collect=lambda: [({}, len(running_sessions()))]))
+metrics.REGISTRY.register(metrics.Gauge(
+    "werewolf_game_subscribers", "Connected viewers per game.", ["game_id"],
+    collect=lambda: [({"game_id": s.game_id}, len(s.engine.events.subscribers)) for s in running_sessions()]))
+metrics.REGISTRY.register(metrics.Gauge(
+    "werewolf_game_event_queue_depth", "Events queued for the slowest viewer of each game.", ["game_id"],
+    collect=lambda: [
+        ({"game_id": s.game_id}, max((sub.queue.qsize() for sub in s.engine.events.subscribers), default=0))
+        for s in running_sessions()
+    ]))
+metrics.REGISTRY.register(metrics.Gauge(
+    "werewolf_game_round", "Current round per game.", ["game_id"],
+    collect=lambda: [({"game_id": s.game_id}, s.engine.round_number) for s in running_sessions()]))
+
+def get_session(game_id: Optional[str]) -> GameSession:
+    session = manager.get(game_id) if game_id else None
+    if not session:
+        raise HTTPException(status_code=404, detail=f"Game {game_id} not found")
+    return session
+
+def create_session() -> GameSession:
+    global latest_game_id
+    try:
+        # Fresh config per game so every game gets its own role assignment
+        session = manager.create_game(GameConfig("game_config.yaml"))
+    except GameLimitError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    latest_game_id = session.game_id
+    return session
+
+def parse_last_event_id(request: Request) -> Optional[int]:
+    """Resume point from the SSE Last-Event-ID header (or ?last_event_id= for plain clients)"""
+    value = request.headers.get("last-event-id") or request.query_params.get("last_event_id")
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+def stream_response(session: GameSession, request: Request) -> StreamingResponse:
+    engine = session.engine
+    subscription = engine.events.subscribe(parse_last_event_id(request))
+
+    async def event_generator():
+        try:
+            if subscription.missed:
+                # Resume point already fell out of the ring buffer
+                gap = {"type": "system", "agent": "System", "content": f"{subscription.missed} events were missed."}
+                yield f"data: {json.dumps(gap)}\n\n"
+
+            async for event_id, event_json in subscription:
+                if await request.is_disconnected():
+                    break
+                yield f"id: {event_id}\ndata: {event_json}\n\n"
+        finally:
+            engine.events.unsubscribe(subscription)
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+def open_event_log(game_id: str) -> EventLogReader:
+    # Game ids are hex strings; anything else could escape the log directory
+    if not game_id.isalnum():
+        raise HTTPException(status_code=404, detail=f"Game {game_id} not found")
+    try:
+        return EventLogReader(event_log_dir, game_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"No event log for game {game_id}")
 
 @app.on_event("startup")
 async def startup_event():
-    init_game()
+    init_manager()
+
+@app.post("/games")
+async def create_game():
+    session = create_session()
+    return {"game_id": session.game_id, "status": "Game started"}
+
+@app.post("/games/{game_id}/resume")
+async def resume_game(game_id: str):
+    # Game ids are hex strings; anything else could escape the checkpoint directory
+    if not game_id.isalnum():
+        raise HTTPException(status_code=404, detail=f"Game {game_id} not found")
+    try:
+        session = manager.resume_game(game_id, GameConfig("game_config.yaml"))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except GameActiveError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except GameLimitError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return {"game_id": session.game_id, "status": "Game resumed", "round": session.engine.round_number}
+
+@app.get("/games")
+async def list_games():
+    return manager.list_games()
+
+@app.get("/games/{game_id}/roles")
+async def get_game_roles(game_id: str):
+    """Endpoint for God Mode to get player roles"""
+    return get_session(game_id).engine.role_mapping
+
+@app.get("/games/{game_id}/stream")
+async def stream_game(game_id: str, request: Request):
+    return stream_response(get_session(game_id), request)
+
+@app.get("/games/{game_id}/replay/phases")
+async def get_replay_phases(game_id: str):
+    """Phase boundaries of a logged game, for seeking with /replay?phase=N"""
+    return open_event_log(game_id).phases()
+
+@app.get("/games/{game_id}/replay")
+async def replay_game(game_id: str, request: Request, speed: float = 1.0, phase: int = 0):
+    """
+    Replay a logged game from disk as SSE, without any LLM calls.
+    speed scales the original pacing (0 = as fast as possible); phase seeks to the
+    n-th phase event. Reconnecting with Last-Event-ID resumes the replay.
+    """
+    reader = open_event_log(game_id)
+    if not reader.is_finished():
+        # Its log is still being written: follow it live via /games/{id}/stream instead
+        raise HTTPException(status_code=409, detail=f"Game {game_id} has not finished yet")
+    try:
+        offset = reader.seek_phase(phase)
+    except IndexError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    resume_after = parse_last_event_id(request) or 0
+
+    async def event_generator():
+        previous_ts = None
+        for event_id, ts, event_json in reader.read(offset):
+            if event_id <= resume_after:
+                continue
+            if await request.is_disconnected():
+                break
+            if speed > 0 and previous_ts is not None:
+                await asyncio.sleep(max(0.0, ts - previous_ts) / speed)
+            previous_ts = ts
+            yield f"id: {event_id}\ndata: {event_json}\n\n"
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of LLM latency, token, event and game metrics"""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/analytics")
+async def get_analytics():
+    """Per-model Elo ratings by faction and decision statistics over all finished games"""
+    return await asyncio.to_thread(get_game_analytics().report)
+
+@app.websocket("/ws")
+async def websocket_stream(websocket: WebSocket, fmt: str = Query("msgpack", alias="format")):
+    """
+    Multiplexed event stream: one connection can follow several games.
+    After the server's hello (format and event type codes), the client sends
+    {"op": "subscribe", "game_id": ..., "last_event_id": optional} or
+    {"op": "unsubscribe", "game_id": ...}. Events arrive as compact arrays
+    with interned codes (see WireProtocol). Compression is negotiated by the
+    server as permessage-deflate.
+    """
+    await websocket.accept()
+    protocol = WireProtocol(fmt)
+    send_lock = asyncio.Lock()
+    forwarders: Dict[str, asyncio.Task] = {}
+
+    async def send(*messages):
+        # One lock for the whole batch keeps intern announcements ahead of the events using them
+        async with send_lock:
+            for message in messages:
+                data = protocol.encode(message)
+                if isinstance(data, bytes):
+                    await websocket.send_bytes(data)
+                else:
+                    await websocket.send_text(data)
+
+    async def forward(session: GameSession, subscription: Subscription):
+        last_id = 0
+        try:
+            async for event_id, event_json in subscription:
+                last_id = event_id
+                await send(*protocol.event(session.game_id, event_id, event_json))
+            if subscription.overflowed:
+                # Too slow: resubscribe with last_event_id to catch up from the ring buffer
+                await send({"op": "overflow", "game_id": session.game_id, "last_event_id": last_id})
+            else:
+                await send({"op": "end", "game_id": session.game_id})
+        except (WebSocketDisconnect, RuntimeError):
+            pass  # Connection went away; the receive loop cleans up
+        finally:
+            session.engine.events.unsubscribe(subscription)
+            # A resubscribe may already have registered its own forwarder
+            if forwarders.get(session.game_id) is asyncio.current_task():
+                del forwarders[session.game_id]
+
+    try:
+        await send(protocol.hello())
+        while True:
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                break
+            message = protocol.decode(frame.get("bytes") or frame.get("text") or "")
+            op = message.get("op") if message else None
+            game_id = str(message.get("game_id", "")) if message else ""
+
+            if op == "subscribe":
+                session = manager.get(game_id) if manager else None
+                if not session:
+                    await send({"op": "error", "game_id": game_id, "detail": f"Game {game_id} not found"})
+                    continue
+                last_event_id = message.get("last_event_id")
+                try:
+                    last_event_id = int(last_event_id) if last_event_id is not None else None
+                except (TypeError, ValueError):
+                    await send({"op": "error", "game_id": game_id, "detail": "last_event_id must be an integer"})
+                    continue
+                if game_id in forwarders:
+                    forwarders.pop(game_id).cancel()
+                subscription = session.engine.events.subscribe(last_event_id)
+                await send({"op": "subscribed", "game_id": game_id, "missed": subscription.missed})
+                forwarders[game_id] = asyncio.create_task(forward(session, subscription))
+            elif op == "unsubscribe":
+                task = forwarders.pop(game_id, None)
+                if task:
+                    task.cancel()
+            else:
+                await send({"op": "error", "detail": "Expected a subscribe or unsubscribe message"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in list(forwarders.values()):
+            task.cancel()
+
+# Legacy single-game endpoints: operate on the most recently created game
 
 @app.post("/start")
 async def start_game():
-    if not engine:
-        init_game()
-    
-    # Run game in background
-    asyncio.create_task(engine.start_game())
-    return {"status": "Game started"}
+    session = create_session()
+    return {"status": "Game started", "game_id": session.game_id}
 
 @app.get("/roles")
 async def get_roles():
     """Endpoint for God Mode to get player roles"""
-    if not engine:
+    session = manager.get(latest_game_id) if latest_game_id else None
+    if not session:
         return {}
-    return getattr(engine, 'role_mapping', {})
+    return session.engine.role_mapping
 
 @app.get("/stream")
 async def stream(request: Request):
-    async def event_generator():
-        while True:
-            if await request.is_disconnected():
-                break
-            
-            # Get event from queue
-            event_json = await engine.event_queue.get()
-            yield f"data: {event_json}\n\n"
-            
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
+    return stream_response(get_session(latest_game_id), request)
@@ -0,0 +1,363 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+
+import httpx
+from openai import AsyncOpenAI, APIConnectionError, InternalServerError, RateLimitError
+
+from . import metrics
+from .memory import count_tokens, estimate_tokens, message_text
+from .ratelimit import RateLimiter, parse_retry_after, throttled
+from .tracing import span
+
+
+def read_usage(target: Optional[dict], reported) -> None:
+    """Copy an OpenAI-style usage object into a plain dict"""
+    if target is None or reported is None:
+        return
+    details = getattr(reported, "prompt_tokens_details", None)
+    target["prompt_tokens"] = reported.prompt_tokens or 0
+    target["completion_tokens"] = reported.completion_tokens or 0
+    target["cached_tokens"] = getattr(details, "cached_tokens", None) or 0
+
+
+class LLMBackend:
+    """
+    Interface between agents and a language model provider.
+    Backends are injected into agents, so the engine can run against a real
+    provider, a scripted conversation, or a fast offline fake.
+    """
+
+    async def stream(self, model: str, messages: List[dict], usage: Optional[dict] = None, **params) -> AsyncIterator[str]:
+        """
+        Yield the completion as text chunks.
+        If a `usage` dict is passed, it is filled with prompt_tokens, completion_tokens
+        and cached_tokens once the completion is done (when the backend knows them).
+        """
+        raise NotImplementedError
+        yield  # Makes this an async generator, like the implementations
+
+    async def complete(self, model: str, messages: List[dict], usage: Optional[dict] = None, **params) -> str:
+        """Return the whole completion at once"""
+        return "".join([chunk async for chunk in self.stream(model, messages, usage=usage, **params)])
+
+    async def warmup(self):
+        """Open connections ahead of the first request (no-op unless the backend has any)"""
+
+
+# Connection pool settings of an OpenAI-compatible endpoint
+DEFAULT_POOL = {
+    "max_connections": 100,
+    "max_keepalive_connections": 20,
+    "keepalive_expiry": 30.0,  # Seconds an idle connection is kept open
+    "http2": False,  # Needs the optional `h2` package
+    "connect_timeout": 5.0,
+    "read_timeout": 60.0,  # Longest gap between streamed chunks
+    "warmup": True,  # Connect (DNS + TCP + TLS) before the first turn
+}
+
+
+def make_http_client(pool: dict) -> httpx.AsyncClient:
+    http2 = pool["http2"]
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            print("HTTP/2 requested but the `h2` package is not installed; using HTTP/1.1.")
+            http2 = False
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=pool["max_connections"],
+            max_keepalive_connections=pool["max_keepalive_connections"],
+            keepalive_expiry=pool["keepalive_expiry"],
+        ),
+        timeout=httpx.Timeout(pool["read_timeout"], connect=pool["connect_timeout"]),
+    )
+
+
+class OpenAIBackend(LLMBackend):
+    """
+    Any OpenAI-compatible chat completions endpoint (OpenRouter by default).
+    Requests wait for a rate limit slot; 429, 5xx and connection errors are
+    retried with jittered backoff, honoring the provider's Retry-After header.
+    """
+
+    # Errors worth retrying with backoff (429, 5xx, dropped connections)
+    RETRYABLE_ERRORS = (RateLimitError, InternalServerError, APIConnectionError)
+
+    def __init__(self, base_url: str, api_key: Optional[str], rate_limiter: Optional[RateLimiter] = None,
+                 pool: Optional[dict] = None):
+        self.base_url = base_url
+        self.pool = dict(DEFAULT_POOL, **(pool or {}))
+        self.http_client = make_http_client(self.pool)
+        # Retries are handled here with the rate limiter, not by the client
+        self.client = AsyncOpenAI(base_url=base_url, api_key=api_key, max_retries=0, http_client=self.http_client)
+        self.rate_limiter = rate_limiter or RateLimiter({"enabled": False})
+        self.warmed_up = False
+
+    async def warmup(self):
+        """Resolve DNS and finish the TLS handshake now, leaving a keep-alive connection in the pool"""
+        if self.warmed_up or not self.pool["warmup"]:
+            return
+        self.warmed_up = True
+        try:
+            await self.http_client.head(self.base_url, timeout=self.pool["connect_timeout"])
+        except httpx.HTTPError as e:
+            # Not fatal: the first real request will connect (and report) on its own
+            print(f"Warmup of {self.base_url} failed: {e!r}")
+
+    async def create(self, model: str, messages: List[dict], stream: bool, **params):
+        for attempt in range(self.rate_limiter.max_retries + 1):
+            with span("rate_limit_wait", "wait", model=model), throttled():
+                await self.rate_limiter.acquire(model)
+            try:
+                return await self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    stream=stream,
+                    **params
+                )
+            except self.RETRYABLE_ERRORS as e:
+                if attempt == self.rate_limiter.max_retries:
+                    raise
+                metrics.LLM_RETRIES.inc(model=model)
+                response = getattr(e, "response", None)
+                retry_after = parse_retry_after(response.headers if response is not None else None)
+                with span("backoff", "wait", model=model, attempt=attempt), throttled():
+                    await asyncio.sleep(self.rate_limiter.backoff(model, attempt, retry_after))
+
+    async def stream(self, model: str, messages: List[dict], usage: Optional[dict] = None, **params) -> AsyncIterator[str]:
+        if usage is not None:
+            # Ask for the usage summary in the final chunk
+            params.setdefault("stream_options", {"include_usage": True})
+        response_stream = await self.create(model, messages, stream=True, **params)
+        try:
+            async for chunk in response_stream:
+                read_usage(usage, getattr(chunk, "usage", None))
+                if not chunk.choices:
+                    continue
+                content = chunk.choices[0].delta.content
+                if content:
+                    yield content
+        finally:
+            # Release the connection right away if the consumer stopped early (e.g. a deadline)
+            await response_stream.close()
+
+    async def complete(self, model: str, messages: List[dict], usage: Optional[dict] = None, **params) -> str:
+        response = await self.create(model, messages, stream=False, **params)
+        read_usage(usage, response.usage)
+        return response.choices[0].message.content or ""
+
+
+# A scripted response: a full string, or a list of chunks to stream as-is
+ScriptedResponse = Union[str, List[str]]
+
+
+class ScriptedBackend(LLMBackend):
+    """
+    Replays a fixed list of responses in order, or asks a function for each one.
+    Every call is recorded in `calls` as (model, messages) for assertions.
+    """
+
+    def __init__(self, responses: Union[List[ScriptedResponse], Callable[[str, List[dict]], ScriptedResponse]],
+                 chunk_delay: float = 0.0):
+        self.responses = responses
+        self.chunk_delay = chunk_delay
+        self.calls: List[Tuple[str, List[dict]]] = []
+
+    def next_response(self, model: str, messages: List[dict]) -> ScriptedResponse:
+        if callable(self.responses):
+            return self.responses(model, messages)
+        if len(self.calls) > len(self.responses):
+            raise IndexError(f"ScriptedBackend ran out of responses after {len(self.responses)} calls")
+        return self.responses[len(self.calls) - 1]
+
+    async def stream(self, model: str, messages: List[dict], usage: Optional[dict] = None, **params) -> AsyncIterator[str]:
+        self.calls.append((model, messages))
+        response = self.next_response(model, messages)
+        chunks = [response] if isinstance(response, str) else response
+        for chunk in chunks:
+            if self.chunk_delay:
+                await asyncio.sleep(self.chunk_delay)
+            yield chunk
+
+
+FILLER_WORDS = (
+    "I", "think", "the", "wolves", "are", "hiding", "among", "us", "and", "we",
+    "should", "watch", "who", "stays", "quiet", "suspicious", "vote", "carefully",
+)
+
+
+class FakeBackend(LLMBackend):
+    """
+    Offline, randomized stand-in for a real model.
+    Decision prompts get a legal-looking answer (a living player's name, or a
+    Witch potion command); everything else gets filler text. Prompts asking for
+    a tagged response get one. Output is streamed
+    in chunks of `chunk_size` characters with configurable latency, and is
+    reproducible for a given seed: each answer is drawn from an RNG seeded with
+    the seed and the request, so it doesn't depend on the order concurrent
+    requests arrive in. Usage is estimated locally, and cached tokens
+    simulate a provider prefix cache: the longest run of leading messages already
+    sent in an earlier request counts as cached.
+    """
+
+    def __init__(self, seed: Optional[int] = None, first_token_ms: float = 0, chunk_ms: float = 0,
+                 chunk_size: int = 8, words: int = 12):
+        self.seed = seed
+        self.rng = random.Random()  # Shared by every request when unseeded
+        self.first_token_delay = first_token_ms / 1000
+        self.chunk_delay = chunk_ms / 1000
+        self.chunk_size = max(1, chunk_size)
+        self.words = words
+        self.seen_prefixes = set()  # Hashes of every message prefix sent so far
+
+    def cached_tokens(self, model: str, messages: List[dict]) -> int:
+        digest = hashlib.sha256(model.encode())
+        cached = 0
+        for i, message in enumerate(messages):
+            # Like real providers, match on content only (cache_control hints don't count)
+            digest.update(json.dumps([message["role"], message_text(message)], ensure_ascii=False).encode())
+            key = digest.copy().hexdigest()
+            if key in self.seen_prefixes and cached == i:
+                cached = i + 1
+            self.seen_prefixes.add(key)
+        return count_tokens(messages[:cached])
+
+    def request_rng(self, model: str, messages: List[dict]) -> random.Random:
+        """RNG for one request: fresh and derived from the seed and the request when seeded"""
+        if self.seed is None:
+            return self.rng
+        payload = json.dumps([self.seed, model, [[m["role"], message_text(m)] for m in messages]], ensure_ascii=False)
+        return random.Random(hashlib.sha256(payload.encode()).hexdigest())
+
+    def respond(self, messages: List[dict], rng: random.Random) -> str:
+        prompt = message_text(messages[-1])
+        text = "\n".join(message_text(m) for m in messages)
+
+        alive = re.search(r"(?:Alive players: |Valid choices: |有效选项：)([^.\n]+)", prompt)
+        everyone = re.search(r"players: ([^.\n]+)\. Role distribution", text)
+        names_match = alive or everyone
+        names = [n.strip() for n in names_match.group(1).split(",")] if names_match else []
+
+        if "<answer>" in prompt:
+            return f"<thought>{self.filler(names, rng)}</thought>\n<answer>{self.decide(prompt, names, rng)}</answer>"
+        if "<speech>" in prompt:
+            return f"<thought>{self.filler(names, rng)}</thought>\n<speech>{self.filler(names, rng)}</speech>"
+        return self.decide(prompt, names, rng)
+
+    def decide(self, prompt: str, names: List[str], rng: random.Random) -> str:
+        if "'SAVE' or 'POISON <Name>' or 'PASS'" in prompt:
+            options = ["PASS", "SAVE"] + ([f"POISON {rng.choice(names)}"] if names else [])
+            return rng.choice(options)
+        if "Output ONLY" in prompt and names:
+            return rng.choice(names)
+        return self.filler(names, rng)
+
+    def filler(self, names: List[str], rng: random.Random) -> str:
+        return " ".join(rng.choice(FILLER_WORDS + tuple(names)) for _ in range(self.words)) + "."
+
+    async def stream(self, model: str, messages: List[dict], usage: Optional[dict] = None, **params) -> AsyncIterator[str]:
+        response = self.respond(messages, self.request_rng(model, messages))
+        if usage is not None:
+            usage["prompt_tokens"] = count_tokens(messages)
+            usage["completion_tokens"] = estimate_tokens(response)
+            usage["cached_tokens"] = self.cached_tokens(model, messages)
+        if self.first_token_delay:
+            await asyncio.sleep(self.first_token_delay)
+        for i in range(0, len(response), self.chunk_size):
+            if i and self.chunk_delay:
+                await asyncio.sleep(self.chunk_delay)
+            yield response[i:i + self.chunk_size]
+
+
+class RoutedBackend(LLMBackend):
+    """
+    Sends each model to its own endpoint: an exact model name in `routes` wins,
+    then the provider prefix (the part before `/`), then the default endpoint.
+    """
+
+    def __init__(self, default: LLMBackend, endpoints: Dict[str, LLMBackend], routes: Dict[str, str]):
+        self.default = default
+        self.endpoints = endpoints
+        self.routes = routes
+
+    def backend_for(self, model: str) -> LLMBackend:
+        name = self.routes.get(model) or self.routes.get(model.split("/", 1)[0])
+        return self.endpoints[name] if name else self.default
+
+    async def stream(self, model: str, messages: List[dict], usage: Optional[dict] = None, **params) -> AsyncIterator[str]:
+        async for chunk in self.backend_for(model).stream(model, messages, usage=usage, **params):
+            yield chunk
+
+    async def complete(self, model: str, messages: List[dict], usage: Optional[dict] = None, **params) -> str:
+        return await self.backend_for(model).complete(model, messages, usage=usage, **params)
+
+    async def warmup(self):
+        await asyncio.gather(self.default.warmup(), *(b.warmup() for b in self.endpoints.values()))
+
+
+# OpenAI-compatible backends are shared per endpoint so agents reuse connections
+_openai_backends: Dict[Tuple[str, str], OpenAIBackend] = {}
+
+
+def openai_endpoint(endpoint: dict, pool: dict, rate_limiter: Optional[RateLimiter]) -> OpenAIBackend:
+    """Shared backend for one endpoint (base_url + api_key_env), with its pool settings"""
+    key = (endpoint["base_url"], endpoint.get("api_key_env") or "")
+    if key not in _openai_backends:
+        api_key_env = endpoint.get("api_key_env")
+        _openai_backends[key] = OpenAIBackend(
+            base_url=endpoint["base_url"],
+            # Local servers often need no key, but the client insists on one
+            api_key=os.getenv(api_key_env) if api_key_env else "none",
+            rate_limiter=rate_limiter,
+            pool=dict(pool, **(endpoint.get("pool") or {})),
+        )
+    return _openai_backends[key]
+
+
+async def close_backends():
+    """
+    Close the shared endpoints' HTTP clients. Their connections belong to the
+    event loop that opened them, so call this before that loop ends.
+    """
+    backends = list(_openai_backends.values())
+    _openai_backends.clear()
+    await asyncio.gather(*(backend.http_client.aclose() for backend in backends), return_exceptions=True)
+
+
+def create_backend(settings: dict, rate_limiter: Optional[RateLimiter] = None, seed: Optional[int] = None) -> LLMBackend:
+    """Build a backend from the `backend` section of game_config.yaml"""
+    backend_type = settings.get("type", "openai")
+
+    if backend_type == "fake":
+        fake = settings.get("fake") or {}
+        return FakeBackend(
+            seed=seed if seed is not None else fake.get("seed"),
+            first_token_ms=fake.get("first_token_ms", 0),
+            chunk_ms=fake.get("chunk_ms", 0),
+            chunk_size=fake.get("chunk_size", 8),
+        )
+
+    if backend_type == "openai":
+        pool = dict(DEFAULT_POOL, **(settings.get("pool") or {}))
+        default = openai_endpoint(settings, pool, rate_limiter)
+        routes = settings.get("routes") or {}
+        if not routes:
+            return default
+        endpoints = settings.get("endpoints") or {}
+        unknown = set(routes.values()) - set(endpoints)
+        if unknown:
+            raise ValueError(f"Backend routes point at undefined endpoints: {', '.join(sorted(unknown))}")
+        return RoutedBackend(
+            default,
+            {name: openai_endpoint(endpoint, pool, rate_limiter) for name, endpoint in endpoints.items()},
+            routes,
+        )
+
+    raise ValueError(f"Unknown backend type: {backend_type}")
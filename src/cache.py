@@ -0,0 +1,190 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from .backends import LLMBackend
+
+CACHE_MODES = ("off", "record", "replay")
+
+# How long a write waits for another process's lock before the cache gives up on it
+BUSY_TIMEOUT_SECONDS = 0.5
+
+
+class ResponseCache:
+    """
+    Content-addressed on-disk store of completions (SQLite).
+    Each entry keeps the completion's original chunks and their timing, so a
+    replay streams exactly what the live run streamed. Least recently used
+    entries are evicted once the stored chunks exceed max_bytes.
+
+    get/put block on SQLite; from the event loop use get_async/put_async,
+    which run them in a worker thread. The cache is best effort: if the file
+    stays locked past a short busy timeout, a lookup is a miss and a store is
+    skipped rather than stalling the game.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # WAL + busy timeout so tournament workers can share one cache file
+        self.db = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+        self.lock = threading.Lock()  # One connection, used from worker threads
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                chunks TEXT NOT NULL,
+                offsets TEXT NOT NULL,
+                usage TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self.db.commit()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model: str, messages: List[dict], params: dict) -> str:
+        payload = json.dumps({"model": model, "messages": messages, "params": params}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[List[str], List[float], dict]]:
+        """Return (chunks, chunk time offsets, usage) or None"""
+        with self.lock:
+            try:
+                row = self.db.execute("SELECT chunks, offsets, usage FROM responses WHERE key = ?", (key,)).fetchone()
+            except sqlite3.OperationalError:  # Locked by another process for too long
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            try:
+                self.db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+                self.db.commit()
+            except sqlite3.OperationalError:  # Only the LRU order is lost
+                self.db.rollback()
+        return json.loads(row[0]), json.loads(row[1]), json.loads(row[2])
+
+    def put(self, key: str, model: str, chunks: List[str], offsets: List[float], usage: dict):
+        chunks_json = json.dumps(chunks, ensure_ascii=False)
+        now = time.time()
+        with self.lock:
+            try:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, model, chunks_json, json.dumps(offsets), json.dumps(usage),
+                     len(chunks_json.encode("utf-8")), now, now)
+                )
+                self.db.commit()
+                self.evict()
+            except sqlite3.OperationalError:
+                self.db.rollback()
+
+    async def get_async(self, key: str) -> Optional[Tuple[List[str], List[float], dict]]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def put_async(self, key: str, model: str, chunks: List[str], offsets: List[float], usage: dict):
+        await asyncio.to_thread(self.put, key, model, chunks, offsets, usage)
+
+    def total_bytes(self) -> int:
+        return self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def evict(self) -> int:
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        excess = self.total_bytes() - self.max_bytes
+        if excess <= 0:
+            return 0
+        evicted = 0
+        for key, size in self.db.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+            if excess <= 0:
+                break
+            self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            excess -= size
+            evicted += 1
+        self.db.commit()
+        return evicted
+
+
+class CachingBackend(LLMBackend):
+    """
+    Wraps another backend with a ResponseCache.
+
+    - record: always call the inner backend and store the result
+    - replay: stream stored completions (same chunk boundaries, and with
+      replay_timing also the same pacing); call and record on a miss
+    """
+
+    def __init__(self, inner: LLMBackend, cache: ResponseCache, mode: str = "replay", replay_timing: bool = False):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown response cache mode: {mode}")
+        self.inner = inner
+        self.cache = cache
+        self.mode = mode
+        self.replay_timing = replay_timing
+
+    async def stream(self, model: str, messages: List[dict], usage: Optional[dict] = None, **params) -> AsyncIterator[str]:
+        key = ResponseCache.make_key(model, messages, params)
+
+        if self.mode == "replay":
+            hit = await self.cache.get_async(key)
+            if hit is not None:
+                chunks, offsets, stored_usage = hit
+                if usage is not None:
+                    # Entries stored before hedges were stripped may still carry one
+                    usage.update({k: v for k, v in stored_usage.items() if k != "hedge"}, cache_hit=True)
+                start = time.monotonic()
+                for chunk, offset in zip(chunks, offsets):
+                    if self.replay_timing:
+                        delay = offset - (time.monotonic() - start)
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                    yield chunk
+                return
+
+        chunks: List[str] = []
+        offsets: List[float] = []
+        inner_usage: Dict = {}
+        start = time.monotonic()
+        async for chunk in self.inner.stream(model, messages, usage=inner_usage, **params):
+            chunks.append(chunk)
+            offsets.append(round(time.monotonic() - start, 4))
+            yield chunk
+
+        # Only completions that finished are stored; a hedge belongs to this call, not to its replays
+        stored_usage = {k: v for k, v in inner_usage.items() if k != "hedge"}
+        await self.cache.put_async(key, model, chunks, offsets, stored_usage)
+        if usage is not None:
+            usage.update(inner_usage)
+
+    async def warmup(self):
+        await self.inner.warmup()
+
+
+# One open cache per file, shared by every backend in the process
+_caches: Dict[str, ResponseCache] = {}
+
+
+def with_response_cache(backend: LLMBackend, settings: dict) -> LLMBackend:
+    """Wrap a backend according to the `response_cache` section of game_config.yaml"""
+    mode = settings.get("mode", "off")
+    if mode not in CACHE_MODES:
+        raise ValueError(f"Unknown response cache mode: {mode}")
+    if mode == "off":
+        return backend
+
+    path = settings["path"]
+    if path not in _caches:
+        _caches[path] = ResponseCache(path, int(settings["max_mb"] * 1024 * 1024))
+    return CachingBackend(backend, _caches[path], mode, settings.get("replay_timing", False))
@@ -0,0 +1,111 @@
+import json
+import os
+import time
+from typing import Optional
+
+CHECKPOINT_VERSION = 1
+
+# Per-agent attributes captured in a checkpoint
+AGENT_FIELDS = ("is_alive", "status", "thought_process", "last_message", "history", "cache_stats")
+# Witch-only potion state
+WITCH_FIELDS = ("has_antidote", "has_poison")
+
+
+def checkpoint_path(checkpoint_dir: str, game_id: str) -> str:
+    return os.path.join(checkpoint_dir, f"{game_id}.json")
+
+
+def engine_state(engine) -> dict:
+    """Everything needed to continue a game from the current phase boundary"""
+    players = []
+    for p in engine.players:
+        state = {"name": p.name, "role": p.role, "model": p.assigned_model}
+        state.update({field: getattr(p, field) for field in AGENT_FIELDS})
+        state.update({field: getattr(p, field) for field in WITCH_FIELDS if hasattr(p, field)})
+        state["memory"] = {
+            "summary_lines": p.memory.summary_lines,
+            "compacted": p.memory.compacted,
+            "total_saved_tokens": p.memory.total_saved_tokens,
+        }
+        players.append(state)
+
+    return {
+        "version": CHECKPOINT_VERSION,
+        "game_id": engine.game_id,
+        "saved_at": time.time(),
+        "round_number": engine.round_number,
+        "next_phase": engine.next_phase,
+        "alive_players": list(engine.alive_players),
+        "roles": engine.roles,
+        "last_event_id": engine.events.last_id,
+        "usage": engine.ledger.summary(),
+        "downgraded": engine.downgraded,
+        "record": engine.record,
+        "players": players,
+    }
+
+
+def apply_state(engine, state: dict):
+    """Restore a freshly built engine (same players, same order) to a checkpointed state"""
+    by_name = {p.name: p for p in engine.players}
+    for saved in state["players"]:
+        player = by_name[saved["name"]]
+        for field in AGENT_FIELDS + WITCH_FIELDS:
+            if field in saved:
+                setattr(player, field, saved[field])
+        memory = saved.get("memory") or {}
+        player.memory.summary_lines = memory.get("summary_lines", [])
+        player.memory.compacted = memory.get("compacted", 0)
+        player.memory.total_saved_tokens = memory.get("total_saved_tokens", 0)
+
+    engine.round_number = state["round_number"]
+    engine.next_phase = state["next_phase"]
+    engine.alive_players = list(state["alive_players"])
+    engine.roles = dict(state["roles"])
+    # Keep SSE ids increasing across the restart
+    engine.events.last_id = state["last_event_id"]
+    # Budgets count what the game spent before the restart too
+    engine.ledger.restore(state.get("usage", {}))
+    engine.downgraded = state.get("downgraded", False)
+    if engine.downgraded:
+        for player in engine.players:
+            player.model = engine.budget.cheap_model
+    engine.record = state.get("record") or {"nights": [], "days": []}
+    engine.resumed = True
+
+
+def write_checkpoint(checkpoint_dir: str, state: dict) -> str:
+    """Write a checkpoint atomically: a crash mid-write leaves the previous one intact"""
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    path = checkpoint_path(checkpoint_dir, state["game_id"])
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_checkpoint(checkpoint_dir: str, game_id: str) -> Optional[dict]:
+    path = checkpoint_path(checkpoint_dir, game_id)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    if state.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version in {path}")
+    return state
+
+
+def remove_checkpoint(checkpoint_dir: str, game_id: str):
+    path = checkpoint_path(checkpoint_dir, game_id)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def list_checkpoints(checkpoint_dir: str) -> list:
+    """Game ids that have a checkpoint (i.e. games that did not finish)"""
+    if not os.path.isdir(checkpoint_dir):
+        return []
+    return sorted(name[:-len(".json")] for name in os.listdir(checkpoint_dir) if name.endswith(".json"))
@@ -1,13 +1,24 @@
 import yaml
 import random
-from typing import List, Dict
+from typing import List, Dict, Optional
 from .prompts import PROMPTS_EN, PROMPTS_ZH
 
+# Extra names for lobbies larger than `player_names` (numbered names after these)
+LOBBY_NAMES = [
+    "Ivy", "Jack", "Kate", "Leo", "Mia", "Noah", "Olivia", "Paul", "Quinn", "Rose",
+    "Sam", "Tina", "Uma", "Victor", "Wendy", "Xavier", "Yara", "Zack", "Amber", "Blake",
+    "Chloe", "Derek", "Ella", "Felix", "Gina", "Hugo", "Iris", "Jonas", "Kira", "Lucas",
+    "Maya", "Nico", "Opal", "Pierre", "Rita", "Simon", "Tara", "Ulf", "Vera", "Walt",
+    "Xena", "Yusuf",
+]
+
 # Default configuration
 DEFAULT_CONFIG = {
     "mode": "test",  # "test" or "arena"
     "language": "zh",  # "en" or "zh"
     "enable_streaming": False,
+    "act_mode": "two_call",  # "two_call" (think, then decide) or "single_call" (one tagged response)
+    "max_rounds": None,  # Stop undecided games after this many rounds (None = no limit)
     "num_players": 6,
     "roles": {
         "werewolf": 2,
@@ -19,6 +30,16 @@ DEFAULT_CONFIG = {
         "Alice", "Bob", "Charlie", "Diana", 
         "Eve", "Frank", "Grace", "Henry"
     ],
+    # Large lobbies: generate the role distribution for `size` players instead of using `roles`
+    "lobby": {
+        "size": None,  # e.g. 20-50 (None = use `roles` as given)
+        "werewolf_ratio": 0.25  # Share of werewolves; one seer and one witch, the rest villagers
+    },
+    # Day-phase discussion
+    "discussion": {
+        "speakers": 3,  # Players who speak each day (0 = everyone alive)
+        "selection": "first"  # "first" (seating order), "rotate" (next ones each round) or "sample" (random)
+    },
     "models": {
         "test": "x-ai/grok-4.1-fast:free",
         "arena": [
@@ -30,6 +51,139 @@ DEFAULT_CONFIG = {
             "qwen/qwen3-235b-a22b-2507",
             "deepseek/deepseek-chat-v3-0324"
         ]
+    },
+    # LLM backend used by the agents
+    "backend": {
+        "type": "openai",  # "openai" (any OpenAI-compatible API) or "fake" (offline, random answers)
+        "base_url": "https://openrouter.ai/api/v1",
+        "api_key_env": "OPENROUTER_API_KEY",  # Environment variable holding the API key
+        # HTTP connection pool overrides, shared by every endpoint unless an endpoint
+        # has its own (defaults: DEFAULT_POOL in backends.py)
+        "pool": {},
+        # Extra OpenAI-compatible endpoints: {name: {base_url, api_key_env, pool}}
+        "endpoints": {},
+        # Model name or provider prefix -> endpoint name (everything else uses base_url)
+        "routes": {},
+        "fake": {
+            "seed": None,
+            "first_token_ms": 0,  # Simulated time to first token
+            "chunk_ms": 0,  # Simulated delay between chunks
+            "chunk_size": 8  # Characters per streamed chunk
+        }
+    },
+    # Hedged requests: duplicate a request that is slow to start to a fallback model
+    "hedging": {
+        "enabled": False,
+        "fallbacks": {},  # Model name or provider prefix -> fallback model
+        "hedge_same_model": True,  # Without a fallback, duplicate to the same model
+        "initial_delay_ms": 4000,  # Hedge delay until a model has min_samples latency samples
+        "percentile": 95,  # Then: this percentile of recent time-to-first-token...
+        "multiplier": 1.0,  # ...times this factor...
+        "min_delay_ms": 500,  # ...clamped to [min_delay_ms, max_delay_ms]
+        "max_delay_ms": 15000,
+        "window": 50,  # Latency samples kept per model
+        "min_samples": 10
+    },
+    # Model prices in USD per million tokens, for cost accounting
+    "pricing": {
+        "default": {"input": 0.0, "cached_input": 0.0, "output": 0.0},
+        "models": {}  # Model name or provider prefix -> {input, cached_input, output}
+    },
+    # Per-game spending limit (None = unlimited); the game ends when it is used up
+    "budget": {
+        "max_tokens": None,
+        "max_cost_usd": None,
+        "downgrade_at": 0.8,  # Fraction of the budget after which agents switch to cheap_model (None = never)
+        "cheap_model": "x-ai/grok-4.1-fast:free"
+    },
+    # Per-game timing spans, exported as Chrome trace JSON
+    "tracing": {
+        "enabled": False,
+        "dir": "traces",
+        "print_summary": True  # Print each game's critical path when it ends
+    },
+    # Model ratings and decision statistics over finished games (GET /analytics, python -m src.analytics)
+    "analytics": {
+        "ratings_path": "ratings.json",  # Elo ratings, updated incrementally with games not rated yet
+        "results_files": [],  # Tournament results (JSON lines) to include besides the event logs
+        "k_factor": 24,
+        "initial_rating": 1500
+    },
+    # Per-agent conversation memory
+    "memory": {
+        "enabled": True,
+        "budget_tokens": 4000,  # Estimated history tokens sent per call before compacting
+        "keep_recent": 6,  # Newest history messages always sent verbatim
+        "summary_chars": 160  # Agent replies are cut to this length in the summary
+    },
+    # On-disk cache of completions, for replaying and rerunning seeded games
+    "response_cache": {
+        "mode": "off",  # "off", "record" (store every completion) or "replay" (serve stored ones, record misses)
+        "path": ".cache/responses.sqlite",
+        "max_mb": 512,  # Least recently used completions are evicted beyond this size
+        "replay_timing": False  # Reproduce the original delays between chunks on replay
+    },
+    # Provider-side prompt caching
+    "prompt_cache": {
+        "cache_control": False  # Mark cache breakpoints (Anthropic-style cache_control) in requests
+    },
+    # Server-side game hosting
+    "sessions": {
+        "max_concurrent_games": 32,  # Running games allowed at once
+        "game_ttl_seconds": 600,  # How long finished games are kept before eviction
+        "reaper_interval_seconds": 30
+    },
+    # Per-game event broadcasting
+    "events": {
+        "buffer_size": 4096,  # Events kept for Last-Event-ID replay
+        "subscriber_queue_size": 1024,  # Live events queued per viewer
+        "overflow_policy": "disconnect",  # "disconnect" or "drop_oldest" for slow viewers
+        "coalesce_window_ms": 50,  # Merge streamed chunks from one agent over this window (0 = off)
+        "coalesce_max_bytes": 512  # ...or until this many bytes are buffered (0 = no limit)
+    },
+    # Persistent per-game event log (used for replays)
+    "event_log": {
+        "enabled": True,
+        "dir": "logs"
+    },
+    # Phase-boundary snapshots for resuming interrupted games
+    "checkpoint": {
+        "enabled": True,
+        "dir": "checkpoints",
+        "resume_on_startup": False  # Resume every unfinished checkpointed game when the server starts
+    },
+    # Time limits (seconds, None = no limit); a timed-out decision falls back to a safe default
+    "deadlines": {
+        "call_seconds": 120,  # One LLM call, streaming included; the request is cancelled
+        "decision_seconds": 300,  # One decision (thinking, answering and re-asks)
+        "phase_seconds": 1800,  # A whole night or day; the rest of the phase is skipped
+        "vote_fallback": "abstain",  # Day vote: "abstain" or "random" (a random living player)
+        "werewolf_fallback": "random",  # Pack proposal: "random" (a random non-werewolf) or "abstain"
+        "seer_fallback": "random"  # Seer check: "random" or "abstain" (no check tonight); the Witch always passes
+    },
+    # Turning free-text answers into legal actions
+    "decisions": {
+        "max_retries": 1,  # Re-ask this many times when an answer names no legal target
+        "retry_max_tokens": 20
+    },
+    # Day-phase voting
+    "voting": {
+        "mode": "sequential",  # "sequential" (open votes, one by one) or "concurrent" (secret ballot)
+        "max_concurrency": 4  # LLM calls in flight at once in concurrent mode
+    },
+    # Night-phase role actions
+    "night": {
+        "wolf_consensus_rounds": 1  # Extra rounds for the pack to agree when proposals differ
+    },
+    # Request rate limits, keyed by model or provider (the part of the model name before "/")
+    "rate_limits": {
+        "enabled": True,
+        "default": {"requests_per_second": 5, "burst": 10},
+        "providers": {},
+        "models": {},
+        "max_retries": 4,  # Retries on 429 / 5xx / connection errors
+        "base_delay": 1.0,  # Backoff base (seconds), jittered and doubled per retry
+        "max_delay": 30.0
     }
 }
 
@@ -48,6 +202,12 @@ class GameConfig:
         except FileNotFoundError:
             print(f"Config file {path} not found. Using default config.")
     
+    def section(self, name: str) -> Dict:
+        """Get a nested config section, filling missing keys from the defaults"""
+        merged = dict(DEFAULT_CONFIG.get(name, {}))
+        merged.update(self.config.get(name) or {})
+        return merged
+    
     def get_prompts(self) -> Dict[str, str]:
         """Get prompts based on language setting"""
         if self.config["language"] == "zh":
@@ -62,26 +222,49 @@ class GameConfig:
             # Test mode: use free model for all players
             return [self.config["models"]["test"]]
     
-    def assign_roles(self) -> List[Dict[str, str]]:
-        """Randomly assign roles to players"""
+    def role_counts(self) -> Dict[str, int]:
+        """Players per role: the `roles` section, or a generated distribution for a large lobby"""
+        lobby = self.section("lobby")
+        size = lobby["size"]
+        if not size:
+            return dict(self.config["roles"])
+        if size < 5:
+            raise ValueError("A lobby needs at least 5 players (werewolf, seer, witch and two villagers)")
+        werewolves = min(max(1, round(size * lobby["werewolf_ratio"])), (size - 3) // 2)
+        return {"werewolf": werewolves, "seer": 1, "witch": 1, "villager": size - werewolves - 2}
+
+    def player_name_pool(self, count: int) -> List[str]:
+        """`count` distinct names: the configured ones first, then LOBBY_NAMES, then numbered ones"""
+        names = list(dict.fromkeys(self.config["player_names"] + LOBBY_NAMES))
+        names += [f"Player{i}" for i in range(len(names) + 1, count + 1)]
+        return names[:count]
+
+    def assign_roles(self, seed: Optional[int] = None) -> List[Dict[str, str]]:
+        """
+        Randomly assign roles to players.
+        Pass a seed to get the same assignment every time (e.g. for tournaments and reruns).
+        """
+        rng = random.Random(seed)
+        
         roles = []
-        for role, count in self.config["roles"].items():
+        for role, count in self.role_counts().items():
             roles.extend([role] * count)
         
         # Shuffle roles
-        random.shuffle(roles)
+        rng.shuffle(roles)
         
         # Assign names
-        names = self.config["player_names"][:len(roles)]
-        random.shuffle(names)
+        names = self.player_name_pool(len(roles))
+        rng.shuffle(names)
         
-        # Get models
-        models = self.get_models()
+        # Get models (copy so shuffling never reorders the config itself)
+        models = list(self.get_models())
         
         # Assign models (in arena mode, one model per player)
         if self.config["mode"] == "arena":
-            random.shuffle(models)
-            player_models = models[:len(roles)]
+            rng.shuffle(models)
+            # Large lobbies reuse models round-robin
+            player_models = [models[i % len(models)] for i in range(len(roles))]
         else:
             # Test mode: same model for all
             player_models = [models[0]] * len(roles)
@@ -0,0 +1,98 @@
+import difflib
+import re
+import unicodedata
+from typing import Callable, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Witch commands, in English and Chinese
+POTION_KEYWORDS = (
+    ("SAVE", r"\bsave\b|\bheal\b|\bantidote\b|救|解药"),
+    ("POISON", r"\bpoison\b|毒"),
+    ("PASS", r"\bpass\b|\bskip\b|\bnone\b|\bnothing\b|\bnobody\b|\bno one\b|\bneither\b|跳过|不用|放弃|弃权"),
+)
+# A SAVE or POISON keyword right after one of these is negated ("不救", "don't save")
+NEGATION = re.compile(r"(?:不|别|\b(?:don t|do not|not|never|won t) )$")
+# Refusals that mean PASS when the answer names no command ("No.")
+REFUSAL = r"\bno\b|\bnope\b"
+
+# (action, target) with action SAVE, POISON or PASS; target is set for POISON only
+PotionDecision = Tuple[str, Optional[str]]
+
+
+def normalize(text: str) -> str:
+    """Lowercase, with punctuation and symbols (incl. markdown and full-width marks) turned into spaces"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = "".join(" " if unicodedata.category(c)[0] in "PS" else c for c in text)
+    return " ".join(text.split())
+
+
+def mentions(text: str, name: str) -> List[int]:
+    """Positions where a (normalized) name appears as a whole word in normalized text"""
+    pattern = rf"(?<![a-z0-9]){re.escape(name)}(?![a-z0-9])"
+    return [m.start() for m in re.finditer(pattern, text)]
+
+
+def resolve_name(answer: str, candidates: Sequence[str]) -> Optional[str]:
+    """
+    Match a free-text answer to one of the legal targets.
+    Tries an exact match, then names mentioned in the answer (the last one
+    mentioned wins: conclusions come after reasoning), then close spellings.
+    """
+    text = normalize(answer or "")
+    if not text:
+        return None
+    by_normalized = {normalize(c): c for c in candidates}
+    if text in by_normalized:
+        return by_normalized[text]
+
+    found = [(max(positions), c) for n, c in by_normalized.items() if (positions := mentions(text, n))]
+    if found:
+        return max(found)[1]
+
+    # Mangled spellings ("Alise", "Charlie's" already handled by punctuation stripping)
+    for token in reversed(text.split()):
+        close = difflib.get_close_matches(token, list(by_normalized), n=1, cutoff=0.8)
+        if close:
+            return by_normalized[close[0]]
+    return None
+
+
+def parse_potion(answer: str, candidates: Sequence[str]) -> Optional[PotionDecision]:
+    """Parse a Witch decision (English or Chinese); None if it can't be understood"""
+    text = normalize(answer or "")
+    earliest = None
+    refused = bool(re.search(REFUSAL, text))
+    for action, pattern in POTION_KEYWORDS:
+        for m in re.finditer(pattern, text):
+            if action != "PASS" and NEGATION.search(text[:m.start()]):
+                refused = True
+                continue
+            if earliest is None or m.start() < earliest[0]:
+                earliest = (m.start(), m.end(), action)
+            break
+
+    if earliest is None:
+        # Declining a potion without naming another command is a PASS
+        return ("PASS", None) if refused else None
+    _, end, action = earliest
+    if action != "POISON":
+        return action, None
+    target = resolve_name(text[end:], candidates)
+    return (action, target) if target else None
+
+
+async def resolve(agent, answer: str, parse: Callable[[str], Optional[T]], options: Sequence[str],
+                  output_instruction: str, settings: dict) -> Optional[T]:
+    """
+    Parse an agent's answer; if it names no legal option, re-ask (cheaply, with a
+    small max_tokens) up to `max_retries` times. Returns None if it never does.
+    No re-asks after a call of this decision hit its deadline.
+    """
+    result = parse(answer)
+    for _ in range(settings["max_retries"]):
+        if result is not None or getattr(agent, "deadline_hit", False):
+            break
+        answer = await agent.reask(answer, options, output_instruction, settings["retry_max_tokens"])
+        result = parse(answer)
+    return result
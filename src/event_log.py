@@ -0,0 +1,127 @@
+import json
+import os
+import struct
+import time
+import zlib
+from typing import Iterator, List, Optional, Tuple
+
+# Record header: payload length, unix timestamp, event id
+HEADER = struct.Struct(">IdI")
+
+# Preset dictionary for per-record compression. Records are compressed one by
+# one so any offset can be read without the ones before it; the dictionary
+# gives small events most of the benefit of compressing the stream as a whole.
+ZDICT = (
+    b'{"type": "game_over", "agent": "System", "content": "Voted for '
+    b'{"type": "system", "agent": "System", "content": "Voting phase started."}'
+    b'{"type": "phase", "agent": "System", "content": "Night Phase Started"}'
+    b'{"type": "phase", "agent": "System", "content": "Day Phase Started"}'
+    b'{"type": "action", "agent": "{"type": "speech", "agent": "God", "content": "'
+    b'{"type": "thought", "agent": "[Thinking...]", "content": "\\n"}'
+)
+
+# (event id, timestamp, serialized event)
+LoggedEvent = Tuple[int, float, str]
+
+
+def log_paths(log_dir: str, game_id: str) -> Tuple[str, str]:
+    """Paths of a game's event log and its phase index"""
+    return os.path.join(log_dir, f"{game_id}.evlog"), os.path.join(log_dir, f"{game_id}.idx")
+
+
+class EventLogWriter:
+    """
+    Append-only, compressed, length-prefixed log of one game's events.
+    Next to it, a JSON-lines index records the byte offset of every phase event
+    so a replay can seek straight to a phase.
+    """
+
+    def __init__(self, log_dir: str, game_id: str):
+        os.makedirs(log_dir, exist_ok=True)
+        self.path, self.index_path = log_paths(log_dir, game_id)
+        self.file = open(self.path, "ab")
+        self.index = open(self.index_path, "a", encoding="utf-8")
+        self.offset = self.file.tell()
+
+    def append(self, event_id: int, event: dict, event_json: str):
+        if self.file.closed:
+            return
+        compressor = zlib.compressobj(zdict=ZDICT)
+        payload = compressor.compress(event_json.encode("utf-8")) + compressor.flush()
+        ts = time.time()
+        record_offset = self.offset
+        self.file.write(HEADER.pack(len(payload), ts, event_id) + payload)
+        self.offset += HEADER.size + len(payload)
+
+        if event["type"] in ("phase", "game_over"):
+            entry = {"event_id": event_id, "offset": record_offset, "ts": ts,
+                     "type": event["type"], "content": event["content"]}
+            self.index.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            # Phase boundaries are natural points to make the log durable
+            self.flush()
+
+    def flush(self):
+        self.file.flush()
+        self.index.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+            self.index.close()
+
+
+class EventLogReader:
+    """Reads a game's event log, optionally starting from a phase offset"""
+
+    def __init__(self, log_dir: str, game_id: str):
+        self.path, self.index_path = log_paths(log_dir, game_id)
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"No event log for game {game_id}")
+
+    def phases(self) -> List[dict]:
+        """Phase (and game over) entries: event_id, offset, ts, type, content"""
+        if not os.path.exists(self.index_path):
+            return []
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def is_finished(self) -> bool:
+        return any(entry["type"] == "game_over" for entry in self.phases())
+
+    def finished_at(self) -> Optional[float]:
+        """When the game_over event was logged, or None for an unfinished game"""
+        entry = next((e for e in self.phases() if e["type"] == "game_over"), None)
+        return entry["ts"] if entry else None
+
+    def game_over(self) -> Optional[dict]:
+        """The game_over event (winner, players, decision record, usage), or None for an unfinished game"""
+        entry = next((e for e in self.phases() if e["type"] == "game_over"), None)
+        if entry is None:
+            return None
+        for _, _, event_json in self.read(entry["offset"]):
+            return json.loads(event_json)
+        return None
+
+    def read(self, offset: int = 0) -> Iterator[LoggedEvent]:
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            while True:
+                header = f.read(HEADER.size)
+                if len(header) < HEADER.size:
+                    return
+                length, ts, event_id = HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length:
+                    return  # Truncated tail of a crashed writer
+                decompressor = zlib.decompressobj(zdict=ZDICT)
+                yield event_id, ts, (decompressor.decompress(payload) + decompressor.flush()).decode("utf-8")
+
+    def seek_phase(self, phase: Optional[int]) -> int:
+        """Byte offset of the n-th phase event (0-based), or 0 to start from the beginning"""
+        if not phase:
+            return 0
+        starts = [entry for entry in self.phases() if entry["type"] == "phase"]
+        if phase >= len(starts):
+            raise IndexError(f"Game has only {len(starts)} phase events")
+        return starts[phase]["offset"]
@@ -0,0 +1,221 @@
+import asyncio
+import json
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+# (event_id, serialized event)
+Event = Tuple[int, str]
+
+OVERFLOW_POLICIES = ("disconnect", "drop_oldest")
+
+# Streamed token chunks that may be merged before publishing
+COALESCED_TYPES = ("thought", "speech", "action")
+
+
+class Subscription:
+    """
+    One viewer's view of an EventBus.
+    Replayed events are held in an unbounded backlog (they are already bounded by
+    the bus ring buffer); live events go through a bounded queue.
+    """
+
+    def __init__(self, max_queue: int, overflow_policy: str):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.backlog: Deque[Event] = deque()
+        self.overflow_policy = overflow_policy
+        self.closed = False
+        self.overflowed = False  # True if we were cut off for being too slow
+        self.dropped = 0  # Events discarded under the drop_oldest policy
+        self.missed = 0  # Events requested on resume that had already left the ring buffer
+
+    def deliver(self, item: Event) -> bool:
+        """Queue a live event. Returns False if the subscriber should be dropped."""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        if self.overflow_policy == "drop_oldest":
+            self.queue.get_nowait()
+            self.dropped += 1
+            self.queue.put_nowait(item)
+            return True
+
+        # disconnect: let the client reconnect with Last-Event-ID and catch up from the ring
+        self.overflowed = True
+        self.close()
+        return False
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            # Wake up a reader blocked on an empty queue
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+    async def get(self) -> Optional[Event]:
+        """Next event, or None once the subscription is closed and drained"""
+        if self.backlog:
+            return self.backlog.popleft()
+        if self.closed and self.queue.empty():
+            return None
+        return await self.queue.get()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Event:
+        item = await self.get()
+        if item is None:
+            raise StopAsyncIteration
+        return item
+
+
+class EventBus:
+    """
+    Broadcast bus for one game.
+    Every published event gets a sequential id and is kept in a bounded ring buffer,
+    so reconnecting clients can resume from their Last-Event-ID. Each subscriber
+    gets its own bounded queue, so viewers never steal events from each other.
+    """
+
+    def __init__(self, buffer_size: int = 4096, subscriber_queue_size: int = 1024, overflow_policy: str = "disconnect"):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+        self.buffer: Deque[Event] = deque(maxlen=buffer_size)
+        self.subscriber_queue_size = subscriber_queue_size
+        self.overflow_policy = overflow_policy
+        self.subscribers: Set[Subscription] = set()
+        self.sinks: List[Callable[[int, dict, str], None]] = []  # e.g. the persistent event log
+        self.last_id = 0
+        self.closed = False
+
+    def publish(self, event: dict) -> int:
+        self.last_id += 1
+        item = (self.last_id, json.dumps(event))
+        self.buffer.append(item)
+        for sink in self.sinks:
+            sink(self.last_id, event, item[1])
+
+        for sub in list(self.subscribers):
+            if not sub.deliver(item):
+                self.subscribers.discard(sub)
+        return self.last_id
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> Subscription:
+        """
+        Subscribe to live events.
+        If last_event_id is given, everything after it that is still buffered is replayed first.
+        """
+        sub = Subscription(self.subscriber_queue_size, self.overflow_policy)
+
+        if last_event_id is not None:
+            replay = [item for item in self.buffer if item[0] > last_event_id]
+            first_available = replay[0][0] if replay else self.last_id + 1
+            sub.missed = max(0, first_available - last_event_id - 1)
+            sub.backlog.extend(replay)
+
+        if self.closed:
+            sub.close()
+        else:
+            self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        self.subscribers.discard(sub)
+        sub.close()
+
+    def close(self):
+        """End the stream for every subscriber (after they drain what is queued)"""
+        self.closed = True
+        for sub in list(self.subscribers):
+            sub.close()
+        self.subscribers.clear()
+
+    @classmethod
+    def from_config(cls, settings: dict) -> "EventBus":
+        return cls(
+            buffer_size=settings["buffer_size"],
+            subscriber_queue_size=settings["subscriber_queue_size"],
+            overflow_policy=settings["overflow_policy"],
+        )
+
+
+class _PendingChunks:
+    def __init__(self, event_type: str, agent: str, timer: Optional[asyncio.TimerHandle]):
+        self.event_type = event_type
+        self.agent = agent
+        self.parts: List[str] = []
+        self.size = 0
+        self.timer = timer
+
+
+class ChunkCoalescer:
+    """
+    Merges consecutive thought/speech/action chunks from the same agent before they
+    reach the bus, so a game emits one frame per ~window instead of one per token.
+    A buffer is flushed when its time window expires, when it reaches max_bytes,
+    when the same agent switches event type, or when any other event type
+    (phase, system, game_over...) arrives.
+    """
+
+    def __init__(self, publish: Callable[[dict], int], window_ms: float = 50, max_bytes: int = 512):
+        self.publish = publish
+        self.window = window_ms / 1000
+        self.max_bytes = max_bytes
+        self.pending: Dict[Tuple[str, str], _PendingChunks] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0 or self.max_bytes > 0
+
+    def add(self, event: dict):
+        if not self.enabled:
+            self.publish(event)
+            return
+
+        event_type, agent = event["type"], event["agent"]
+        if event_type not in COALESCED_TYPES:
+            self.flush()
+            self.publish(event)
+            return
+
+        key = (event_type, agent)
+        # Keep each agent's events in order when it switches e.g. from thought to action
+        for other in [k for k in self.pending if k[1] == agent and k != key]:
+            self._flush_key(other)
+
+        pending = self.pending.get(key)
+        if pending is None:
+            timer = None
+            if self.window > 0:
+                timer = asyncio.get_running_loop().call_later(self.window, self._flush_key, key)
+            pending = self.pending[key] = _PendingChunks(event_type, agent, timer)
+
+        content = event["content"]
+        pending.parts.append(content)
+        pending.size += len(content.encode("utf-8"))
+        if self.max_bytes > 0 and pending.size >= self.max_bytes:
+            self._flush_key(key)
+
+    def flush(self):
+        for key in list(self.pending):
+            self._flush_key(key)
+
+    def _flush_key(self, key: Tuple[str, str]):
+        pending = self.pending.pop(key, None)
+        if pending is None:
+            return
+        if pending.timer:
+            pending.timer.cancel()
+        self.publish({
+            "type": pending.event_type,
+            "agent": pending.agent,
+            "content": "".join(pending.parts)
+        })
@@ -1,17 +1,91 @@
 import asyncio
-import json
-from typing import List, Dict, Optional
-from .agents import Agent, God, Werewolf, Seer, Witch
+import random
+import time
+import uuid
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+from . import metrics
+from .accounting import Budget, UsageLedger
+from .agents import Agent, God, Werewolf
+from .checkpoint import engine_state, remove_checkpoint, write_checkpoint
+from .config import GameConfig
+from .decisions import parse_potion, resolve, resolve_name
+from .event_log import EventLogWriter
+from .events import ChunkCoalescer, EventBus
+from .registry import VILLAGERS, WEREWOLVES, PlayerRegistry
+from .tracing import Tracer, add_time, span, traced, tracing
+
+# name -> (names of actions it depends on, coroutine function taking their results)
+ActionGraph = Dict[str, Tuple[List[str], Callable[..., Awaitable[Any]]]]
+
+T = TypeVar("T")
+
+async def run_action_graph(actions: ActionGraph) -> Dict[str, Any]:
+    """
+    Run role actions as a dependency graph.
+    Every action starts as soon as the actions it depends on have finished,
+    so independent actions run concurrently. Returns {name: result}.
+    """
+    tasks: Dict[str, asyncio.Task] = {}
+    
+    async def run(name: str):
+        deps, action = actions[name]
+        results = [await tasks[dep] for dep in deps]
+        return await action(*results)
+    
+    for name in actions:
+        tasks[name] = asyncio.ensure_future(run(name))
+    
+    try:
+        await asyncio.gather(*tasks.values())
+    finally:
+        for task in tasks.values():
+            task.cancel()
+    return {name: task.result() for name, task in tasks.items()}
 
 class GameEngine:
-    def __init__(self, players: List[Agent]):
+    def __init__(self, players: List[Agent], config: Optional[GameConfig] = None, event_bus: Optional[EventBus] = None,
+                 game_id: Optional[str] = None, seed: Optional[int] = None):
+        self.config = config or GameConfig()
+        self.game_id = game_id or uuid.uuid4().hex[:12]
         self.players = players
-        self.alive_players = [p.name for p in players if p.is_alive and p.role != "God"]
+        self.registry = PlayerRegistry(players)
         self.god = next((p for p in players if isinstance(p, God)), None)
         self.roles = {p.name: p.role for p in players}
-        self.event_queue = asyncio.Queue()
+        events = self.config.section("events")
+        self.events = event_bus or EventBus.from_config(events)
+        self.coalescer = ChunkCoalescer(self.events.publish, events["coalesce_window_ms"], events["coalesce_max_bytes"])
+        
+        # Persist every published event so finished games can be replayed
+        self.event_log: Optional[EventLogWriter] = None
+        event_log = self.config.section("event_log")
+        if event_log["enabled"]:
+            self.event_log = EventLogWriter(event_log["dir"], self.game_id)
+            self.events.sinks.append(self.event_log.append)
+        self.voting = self.config.section("voting")
+        self.night = self.config.section("night")
+        self.discussion = self.config.section("discussion")
+        self.rng = random.Random(seed)  # Sampled discussion speakers
+        self.max_rounds = self.config.config.get("max_rounds")
         self.is_game_over = False
+        self.winner: Optional[str] = None  # "villagers", "werewolves" or "draw"
+        self.end_reason: Optional[str] = None  # "victory", "max_rounds" or "budget"
+        self.finished_at: Optional[float] = None  # Wall clock time the game ended
+        self.game_over_message = ""
         self.round_number = 0
+        self.next_phase = "night"  # Phase to run next; lets a checkpointed game resume mid-round
+        self.resumed = False
+        self.checkpoints = self.config.section("checkpoint")
+        self.decisions = self.config.section("decisions")
+        self.deadlines = self.config.section("deadlines")
+        self.ledger = UsageLedger(self.config.section("pricing"))
+        self.budget = Budget(self.config.section("budget"))
+        self.downgraded = False
+        # Decisions of every night and day, for post-game analytics (see src/analytics.py)
+        self.record: Dict[str, List[dict]] = {"nights": [], "days": []}
+        self.tonight: dict = {}
+        self.trace_settings = self.config.section("tracing")
+        self.tracer = Tracer(self.game_id) if self.trace_settings["enabled"] else None
         
         # Generate game intro
         player_names = ", ".join([p.name for p in players if p.role != "God"])
@@ -25,47 +99,199 @@ class GameEngine:
         role_desc = ", ".join([f"{count} {role}(s)" for role, count in role_counts.items()])
         self.game_intro = f"Werewolf Game with {len(players)-1} players: {player_names}. Role distribution: {role_desc}."
         
+        # The intro is part of every agent's static message prefix
+        for p in players:
+            p.game_intro = self.game_intro
+            p.event_callback = self.broadcast
+            p.ledger = self.ledger
+        
         if not self.god:
             raise ValueError("Game must have a God agent.")
 
-    async def broadcast(self, event_type: str, agent_name: str, content: str):
+    @property
+    def alive_players(self) -> List[str]:
+        """Names of living players, in seating order"""
+        return self.registry.alive_names()
+
+    @alive_players.setter
+    def alive_players(self, names: List[str]):
+        self.registry.set_alive(names)
+
+    async def broadcast(self, event_type: str, agent_name: str, content: str, **fields):
+        """Publish an event; extra keyword fields (e.g. usage on game_over) are added to it as-is"""
         event = {
             "type": event_type,
             "agent": agent_name,
-            "content": content
+            "content": content,
+            **fields
         }
-        await self.event_queue.put(json.dumps(event))
+        metrics.EVENTS_PUBLISHED.inc(type=event_type)
+        started = time.perf_counter()
+        self.coalescer.add(event)
+        add_time("broadcast", time.perf_counter() - started)
 
     async def start_game(self):
-        await self.broadcast("system", "System", "Game Started")
-        
-        while not self.is_game_over:
-            self.round_number += 1
+        with tracing(self.tracer):
+            try:
+                with span("game", "game", game_id=self.game_id):
+                    await self.run_game()
+            finally:
+                self.report_trace()
+
+    def report_trace(self):
+        """Write the Chrome trace of this game and print its critical path"""
+        if not self.tracer:
+            return
+        path = self.tracer.export(self.trace_settings["dir"])
+        if self.trace_settings["print_summary"]:
+            print(f"{self.tracer.summary()}\n  Trace: {path}")
+
+    async def run_game(self):
+        try:
+            await self.warmup()
+            if self.resumed:
+                await self.broadcast("system", "System", f"Game Resumed (Round {self.round_number}, {self.next_phase} phase)")
+            else:
+                await self.broadcast("system", "System", "Game Started")
             
-            # Night Phase
-            await self.run_night_phase()
-            if self.check_game_over(): break
+            while not self.is_game_over:
+                phase = self.next_phase
+                phase_started = time.monotonic()
+                self.ledger.phase = f"{phase} {self.round_number + (phase == 'night')}"
+                if phase == "night":
+                    self.round_number += 1
+                    
+                    # Night Phase
+                    await self.run_phase("night", self.run_night_phase)
+                    self.next_phase = "day"
+                else:
+                    # Day Phase
+                    await self.run_phase("day", self.run_day_phase)
+                    self.next_phase = "night"
+                metrics.PHASE_DURATION.observe(time.monotonic() - phase_started, phase=phase)
+                
+                if self.check_game_over(): break
+                
+                if await self.enforce_budget(): break
+                
+                if self.next_phase == "night" and self.max_rounds and self.round_number >= self.max_rounds:
+                    self.is_game_over = True
+                    self.winner = "draw"
+                    self.end_reason = "max_rounds"
+                    self.game_over_message = f"Draw! No side won within {self.max_rounds} rounds."
+                    break
+                
+                await self.save_checkpoint()
             
-            # Day Phase
-            await self.run_day_phase()
-            if self.check_game_over(): break
+            self.finished_at = time.time()
+            await self.broadcast("game_over", "System", self.game_over_message, usage=self.ledger.summary(),
+                                 winner=self.winner, end_reason=self.end_reason, players=self.player_summary(),
+                                 record=self.record)
+            metrics.GAMES_FINISHED.inc(winner=self.winner)
+            if self.checkpoints["enabled"]:
+                # Finished games have nothing to resume
+                remove_checkpoint(self.checkpoints["dir"], self.game_id)
+        finally:
+            # End every viewer's stream once they have drained it
+            self.coalescer.flush()
+            self.events.close()
+            if self.event_log:
+                self.event_log.close()
+
+    async def enforce_budget(self) -> bool:
+        """Downgrade models or end the game once the token/cost budget runs low. True if the game ended."""
+        spent = self.ledger.game
+        if self.budget.exhausted(spent):
+            self.is_game_over = True
+            self.winner = "draw"
+            self.end_reason = "budget"
+            self.game_over_message = (f"Game ended: budget exhausted after {spent.total_tokens} tokens "
+                                      f"(${spent.cost_usd:.4f}).")
+            return True
+        if not self.downgraded and self.budget.should_downgrade(spent):
+            self.downgraded = True
+            for p in self.players:
+                p.model = self.budget.cheap_model
+            await self.broadcast("system", "System",
+                                 f"{self.budget.used(spent):.0%} of the budget used: switching every agent to {self.budget.cheap_model}.")
+        return False
+
+    async def warmup(self):
+        """Open every backend's connections before the first turn"""
+        backends = {id(p.backend): p.backend for p in self.players}
+        await asyncio.gather(*(backend.warmup() for backend in backends.values()))
+
+    async def save_checkpoint(self):
+        """Snapshot the game at a phase boundary (written atomically, off the event loop)"""
+        if not self.checkpoints["enabled"]:
+            return
+        # Pending chunks belong to the phase that just ended
+        self.coalescer.flush()
+        # The game waits for the write, so the state can't change while it is written
+        await asyncio.to_thread(write_checkpoint, self.checkpoints["dir"], engine_state(self))
 
+    def player_summary(self) -> List[dict]:
+        # Credit each player to the model it was seated with, even after a budget downgrade
+        return [{"name": p.name, "role": p.role, "model": p.assigned_model, "alive": p.is_alive}
+                for p in self.registry.by_name.values()]
+
+    async def run_phase(self, phase: str, run: Callable[[], Awaitable[None]]):
+        """Run a phase under `deadlines.phase_seconds`; past it, the rest of the phase is skipped"""
+        limit = self.deadlines["phase_seconds"]
+        try:
+            await asyncio.wait_for(run(), limit)
+        except asyncio.TimeoutError:
+            metrics.TIMEOUTS.inc(scope="phase")
+            await self.broadcast("timeout", "System", f"The {phase} phase ran past {limit:g} s and was cut short.\n")
+
+    async def decide(self, agent: Agent, kind: str, decision: Awaitable[Optional[T]],
+                     fallback: Callable[[], Tuple[Optional[T], str]]) -> Optional[T]:
+        """
+        Run one decision under `deadlines.decision_seconds`. If it, or one of its
+        LLM calls, timed out without a legal result, `fallback()` gives the
+        result to use instead (and a description for the timeout event).
+        """
+        agent.deadline_hit = False
+        limit = self.deadlines["decision_seconds"]
+        try:
+            result = await asyncio.wait_for(decision, limit)
+        except asyncio.TimeoutError:
+            result = None
+            agent.deadline_hit = True
+            metrics.TIMEOUTS.inc(scope="decision")
+        if result is None and agent.deadline_hit:
+            result, description = fallback()
+            await self.broadcast("timeout", agent.name, f"No {kind} in time; falling back to {description}.\n")
+        return result
+
+    def fallback_target(self, setting: str, candidates: List[str]) -> Tuple[Optional[str], str]:
+        """A random candidate when the `deadlines` setting says "random", otherwise no target"""
+        if self.deadlines[setting] == "random" and candidates:
+            target = self.rng.choice(candidates)
+            return target, f"a random target ({target})"
+        return None, "abstaining"
+
+    @traced("phase")
     async def run_night_phase(self):
         await self.broadcast("phase", "System", "Night Phase Started")
         
+        self.tonight = {"round": self.round_number}
+        self.record["nights"].append(self.tonight)
+        
         async for chunk in self.god.announce("The night has fallen. Everyone close your eyes."):
             await self.broadcast("speech", "God", chunk)
         
-        # 1. Werewolves Action
-        victim = await self.process_werewolves()
-        
-        # 2. Seer Action
-        await self.process_seer()
+        # 1. Role actions: Werewolves and Seer act at the same time,
+        #    the Witch waits for the pack's victim
+        results = await run_action_graph({
+            "werewolves": ([], self.process_werewolves),
+            "seer": ([], self.process_seer),
+            "witch": (["werewolves"], self.process_witch),
+        })
+        final_victim = results["witch"]
+        self.tonight.update(wolf_target=results["werewolves"], died=final_victim)
         
-        # 3. Witch Action
-        final_victim = await self.process_witch(victim)
-        
-        # 4. Resolve Night
+        # 2. Resolve Night
         if final_victim:
             self.eliminate_player(final_victim)
             async for chunk in self.god.announce(f"Last night, {final_victim} died."):
@@ -76,83 +302,166 @@ class GameEngine:
             
         await self.broadcast("phase", "System", "Night Phase Ended")
 
+    @traced("phase")
     async def run_day_phase(self):
         await self.broadcast("phase", "System", "Day Phase Started")
         
-        # 1. Discussion (Simplified: Random subset speaks)
-        speakers = [p for p in self.players if p.name in self.alive_players][:3]
-        for speaker in speakers:
-            context = f"Alive players: {', '.join(self.alive_players)}. Discuss who might be the werewolf."
+        # 1. Discussion
+        context = f"Alive players: {', '.join(self.alive_players)}. Discuss who might be the werewolf."
+        for speaker in self.discussion_speakers():
             
-            # Think
             await self.broadcast("thought", speaker.name, "[Thinking...]")
+            if speaker.act_mode == "single_call":
+                # Think and speak in one request
+                async for event_type, chunk in speaker.discuss(context, self.round_number):
+                    await self.broadcast(event_type, speaker.name, chunk)
+                continue
+            
+            # Think
             async for chunk in speaker.think(context, self.round_number, self.game_intro):
                 await self.broadcast("thought", speaker.name, chunk)
             
             # Speak
             async for chunk in speaker.speak(context, self.round_number, self.game_intro):
                 await self.broadcast("speech", speaker.name, chunk)
-            
-            await asyncio.sleep(1.5)  # Rate limit protection between speakers
 
         # 2. Voting - Collect votes from all players
         await self.broadcast("system", "System", "Voting phase started.")
         
-        votes = {}  # {voter_name: voted_name}
-        voters = [p for p in self.players if p.name in self.alive_players]
+        voters = self.registry.alive_agents()
+        context = f"Alive players: {', '.join(self.alive_players)}. Based on today's discussion, who should be eliminated?"
         
-        for voter in voters:
-            context = f"Alive players: {', '.join(self.alive_players)}. Based on today's discussion, who should be eliminated?"
-            
-            vote = await voter.vote(context, self.round_number, self.game_intro, broadcast_callback=self.broadcast)
-            votes[voter.name] = vote
-            await self.broadcast("action", voter.name, f"Voted for {vote}\n")
-            await asyncio.sleep(1)  # Rate limit protection
+        if self.voting["mode"] == "concurrent":
+            votes = await self.collect_votes_concurrently(voters, context)
+        else:
+            votes = {}  # {voter_name: voted_name, or None for an unusable ballot}
+            for voter in voters:
+                votes[voter.name] = await self.decide(
+                    voter, "vote", self.cast_vote(voter, context),
+                    lambda: self.fallback_target("vote_fallback", self.alive_players)
+                )
+                await self.broadcast("action", voter.name, self.ballot_text(votes[voter.name]))
         
-        # Count votes
-        from collections import Counter
-        vote_counts = Counter(votes.values())
+        # Count votes (unusable ballots are abstentions)
+        vote_counts = Counter(vote for vote in votes.values() if vote)
+        today = {"round": self.round_number, "votes": votes, "eliminated": None}
+        self.record["days"].append(today)
         
         if vote_counts:
             # Get player with most votes
             eliminated, count = vote_counts.most_common(1)[0]
-            
-            # Check if they're actually alive (LLM might hallucinate)
-            if eliminated in self.alive_players:
-                self.eliminate_player(eliminated)
-                async for chunk in self.god.announce(f"By majority vote, {eliminated} has been eliminated."):
-                    await self.broadcast("speech", "God", chunk)
-            else:
-                await self.broadcast("system", "System", f"Invalid vote target: {eliminated}. No elimination.")
+            today["eliminated"] = eliminated
+            self.eliminate_player(eliminated)
+            async for chunk in self.god.announce(f"By majority vote, {eliminated} has been eliminated."):
+                await self.broadcast("speech", "God", chunk)
+        else:
+            await self.broadcast("system", "System", "No valid votes. No elimination.")
         
         await self.broadcast("phase", "System", "Day Phase Ended")
 
+    async def cast_vote(self, voter: Agent, context: str, stream_decision: bool = True) -> Optional[str]:
+        vote = await voter.vote(
+            context, self.round_number, self.game_intro,
+            broadcast_callback=self.broadcast, stream_decision=stream_decision
+        )
+        return await self.resolve_target(voter, vote, self.alive_players)
+
+    def discussion_speakers(self) -> List[Agent]:
+        """
+        Who speaks today, per the `discussion` config: the first `speakers` alive
+        players in seating order, a window that rotates round by round, or a
+        random sample. `speakers` of 0 (or None) lets everyone speak.
+        """
+        alive = self.registry.alive_agents()
+        count = self.discussion["speakers"] or len(alive)
+        if count >= len(alive):
+            return alive
+        selection = self.discussion["selection"]
+        if selection == "rotate":
+            start = ((self.round_number - 1) * count) % len(alive)
+            return (alive[start:] + alive[:start])[:count]
+        if selection == "sample":
+            chosen = set(self.rng.sample(range(len(alive)), count))
+            return [p for i, p in enumerate(alive) if i in chosen]
+        return alive[:count]
+
+    @traced("action")
+    async def collect_votes_concurrently(self, voters: List[Agent], context: str) -> Dict[str, str]:
+        """
+        Secret ballot: every voter decides at the same time (up to voting.max_concurrency LLM
+        calls in flight). Thoughts stream as they arrive, tagged with each voter's name,
+        but ballots are only revealed once all are in, in seating order.
+        """
+        semaphore = asyncio.Semaphore(max(1, self.voting["max_concurrency"]))
+        
+        async def cast(voter: Agent) -> Optional[str]:
+            async with semaphore:
+                return await self.decide(
+                    voter, "vote", self.cast_vote(voter, context, stream_decision=False),
+                    lambda: self.fallback_target("vote_fallback", self.alive_players)
+                )
+        
+        ballots = await asyncio.gather(*(cast(voter) for voter in voters))
+        votes = {voter.name: ballot for voter, ballot in zip(voters, ballots)}
+        
+        # Reveal
+        for voter_name, vote in votes.items():
+            await self.broadcast("action", voter_name, self.ballot_text(vote))
+        return votes
+
+    async def resolve_target(self, agent: Agent, answer: str, candidates: List[str]) -> Optional[str]:
+        """The legal target an answer names, re-asking the agent if it names none"""
+        return await resolve(
+            agent, answer, lambda text: resolve_name(text, candidates), candidates,
+            "Output ONLY the player's name. No other text.", self.decisions
+        )
+
+    @staticmethod
+    def ballot_text(vote: Optional[str]) -> str:
+        return f"Voted for {vote}\n" if vote else "Abstained (no valid target)\n"
+
+    @traced("action")
     async def process_werewolves(self) -> Optional[str]:
-        werewolves = [p for p in self.players if isinstance(p, Werewolf) and p.is_alive]
+        werewolves = self.registry.alive_with_role("Werewolf")
         if not werewolves:
             return None
             
         # Get all werewolf names for teammate awareness
         all_wolf_names = [p.name for p in werewolves]
+        prey = [name for name in self.alive_players if name not in all_wolf_names]
             
-        votes = []
-        for wolf in werewolves:
-            vote = await wolf.kill(
+        async def choose(wolf: Werewolf, teammate_votes: Optional[List[str]]) -> Optional[str]:
+            answer = await wolf.kill(
                 self.alive_players, 
                 self.round_number, 
                 self.game_intro, 
                 teammates=all_wolf_names,
-                teammate_votes=votes, 
+                teammate_votes=teammate_votes, 
                 broadcast_callback=self.broadcast
             )
-            votes.append(vote)
-            await asyncio.sleep(1)  # Rate limit protection
-            
-        if not votes:
+            return await self.resolve_target(wolf, answer, self.alive_players)
+        
+        async def propose(wolf: Werewolf, teammate_votes: Optional[List[str]] = None) -> Optional[str]:
+            return await self.decide(
+                wolf, "kill target", choose(wolf, teammate_votes),
+                lambda: self.fallback_target("werewolf_fallback", prey)
+            )
+        
+        # Every wolf proposes a target at the same time
+        votes = list(await asyncio.gather(*(propose(wolf) for wolf in werewolves)))
+        
+        # Short consensus rounds: if the pack disagrees, each wolf sees the others' picks and votes again
+        for _ in range(self.night["wolf_consensus_rounds"]):
+            if len(set(votes)) <= 1:
+                break
+            votes = list(await asyncio.gather(*(
+                propose(wolf, [f"{other.name}: {vote or 'undecided'}" for other, vote in zip(werewolves, votes) if other is not wolf])
+                for wolf in werewolves
+            )))
+        
+        vote_counts = Counter(vote for vote in votes if vote)
+        if not vote_counts:
             return None
-            
-        from collections import Counter
-        vote_counts = Counter(votes)
         victim = vote_counts.most_common(1)[0][0]
         
         for wolf in werewolves:
@@ -160,62 +469,79 @@ class GameEngine:
             
         return victim
 
+    @traced("action")
     async def process_seer(self):
-        seer = next((p for p in self.players if isinstance(p, Seer) and p.is_alive), None)
+        seer = self.registry.first_alive("Seer")
         if not seer:
             return
 
-        target_name = await seer.verify(self.alive_players, self.round_number, self.game_intro, broadcast_callback=self.broadcast)
+        candidates = [name for name in self.alive_players if name != seer.name]
+        
+        async def check() -> Optional[str]:
+            answer = await seer.verify(self.alive_players, self.round_number, self.game_intro, broadcast_callback=self.broadcast)
+            return await self.resolve_target(seer, answer, candidates)
+        
+        target_name = await self.decide(seer, "check", check(), lambda: self.fallback_target("seer_fallback", candidates))
+        self.tonight.update(seer=seer.name, seer_check=target_name)
+        if not target_name:
+            seer.add_memory("Your check failed tonight: you did not name a living player.")
+            return
         
-        target_role = self.roles.get(target_name, "Unknown")
-        seer.add_memory(f"You checked {target_name}: {target_role}.")
-        await asyncio.sleep(1)  # Rate limit protection
+        seer.add_memory(f"You checked {target_name}: {self.roles[target_name]}.")
 
+    @traced("action")
     async def process_witch(self, victim: Optional[str]) -> Optional[str]:
-        witch = next((p for p in self.players if isinstance(p, Witch) and p.is_alive), None)
-        if not witch:
+        witch = self.registry.first_alive("Witch")
+        if not witch or not (witch.has_antidote or witch.has_poison):
             return victim
 
         night_info = f"Target attacked: {victim}." if victim else "No attack tonight."
+        night_info += f" {witch.potions_left()} Alive players: {', '.join(self.alive_players)}."
         
-        decision = await witch.use_potion(night_info, self.round_number, self.game_intro, broadcast_callback=self.broadcast)
+        options = ["SAVE", "PASS"] + [f"POISON {name}" for name in self.alive_players]
         
-        parts = decision.split()
-        action = parts[0].upper()
+        async def potion():
+            answer = await witch.use_potion(night_info, self.round_number, self.game_intro, broadcast_callback=self.broadcast)
+            return await resolve(
+                witch, answer, lambda text: parse_potion(text, self.alive_players), options,
+                "Output format: 'SAVE' or 'POISON <Name>' or 'PASS'. Output ONLY the decision.", self.decisions
+            )
+        
+        decision = await self.decide(witch, "potion decision", potion(), lambda: (("PASS", None), "PASS"))
+        action, target = decision or ("PASS", None)
         
-        if action == "SAVE" and victim:
+        if action == "SAVE" and victim and witch.has_antidote:
+            witch.has_antidote = False
             witch.add_memory(f"You saved {victim}.")
-            await asyncio.sleep(1)  # Rate limit protection
+            self.tonight["witch"] = {"name": witch.name, "action": "SAVE", "target": victim}
             return None
-        elif action == "POISON" and len(parts) > 1:
-            target = parts[1]
-            if target in self.alive_players:
-                witch.add_memory(f"You poisoned {target}.")
-                await asyncio.sleep(1)  # Rate limit protection
-                return target
-        
-        await asyncio.sleep(1)  # Rate limit protection
+        elif action == "POISON" and witch.has_poison:
+            witch.has_poison = False
+            witch.add_memory(f"You poisoned {target}.")
+            self.tonight["witch"] = {"name": witch.name, "action": "POISON", "target": target}
+            return target
+        
+        self.tonight["witch"] = {"name": witch.name, "action": "PASS", "target": None}
         return victim
 
     def eliminate_player(self, player_name: str):
-        if player_name in self.alive_players:
-            self.alive_players.remove(player_name)
-            player = next((p for p in self.players if p.name == player_name), None)
-            if player:
-                player.is_alive = False
-                player.status = "dead"
+        self.registry.eliminate(player_name)
                 
     def check_game_over(self) -> bool:
-        wolves = [p for p in self.players if isinstance(p, Werewolf) and p.is_alive]
-        villagers = [p for p in self.players if not isinstance(p, Werewolf) and p.role != "God" and p.is_alive]
+        wolves = self.registry.faction_alive[WEREWOLVES]
+        villagers = self.registry.faction_alive[VILLAGERS]
         
         if not wolves:
             self.is_game_over = True
-            asyncio.create_task(self.broadcast("game_over", "System", "Villagers Win! All Werewolves are dead."))
+            self.winner = "villagers"
+            self.end_reason = "victory"
+            self.game_over_message = "Villagers Win! All Werewolves are dead."
             return True
-        if len(wolves) >= len(villagers):
+        if wolves >= villagers:
             self.is_game_over = True
-            asyncio.create_task(self.broadcast("game_over", "System", "Werewolves Win! They outnumber the Villagers."))
+            self.winner = "werewolves"
+            self.end_reason = "victory"
+            self.game_over_message = "Werewolves Win! They outnumber the Villagers."
             return True
             
         return False
@@ -0,0 +1,169 @@
+import asyncio
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Optional
+
+from .backends import LLMBackend
+
+_END = object()
+
+
+class LatencyTracker:
+    """Rolling window of time-to-first-token samples per model"""
+
+    def __init__(self, window: int = 50, percentile: float = 95, min_samples: int = 10):
+        self.window = window
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.samples: Dict[str, Deque[float]] = {}
+
+    def record(self, model: str, seconds: float):
+        self.samples.setdefault(model, deque(maxlen=self.window)).append(seconds)
+
+    def quantile(self, model: str) -> Optional[float]:
+        """The configured percentile of recent samples, or None until there are enough"""
+        samples = sorted(self.samples.get(model, ()))
+        if len(samples) < self.min_samples:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * self.percentile / 100))
+        return samples[index]
+
+
+class _Attempt:
+    """One in-flight streaming request, read through a queue so it can be raced and cancelled"""
+
+    def __init__(self, backend: LLMBackend, model: str, messages: List[dict], params: dict):
+        self.model = model
+        self.usage: dict = {}
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.started = time.monotonic()
+        self.first_token_at: Optional[float] = None
+        self.error: Optional[BaseException] = None
+        self.ready = asyncio.Event()  # First chunk arrived, or the request ended
+        self.task = asyncio.create_task(self.run(backend, messages, params))
+
+    async def run(self, backend: LLMBackend, messages: List[dict], params: dict):
+        try:
+            async for chunk in backend.stream(self.model, messages, usage=self.usage, **params):
+                if self.first_token_at is None:
+                    self.first_token_at = time.monotonic()
+                    self.ready.set()
+                self.queue.put_nowait(chunk)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.ready.set()
+            self.queue.put_nowait(_END)
+
+    @property
+    def ttft(self) -> float:
+        return (self.first_token_at or time.monotonic()) - self.started
+
+    @property
+    def succeeded(self) -> bool:
+        return self.ready.is_set() and self.error is None
+
+    def cancel(self):
+        self.task.cancel()
+
+    async def chunks(self) -> AsyncIterator[str]:
+        while True:
+            chunk = await self.queue.get()
+            if chunk is _END:
+                if self.error:
+                    raise self.error
+                return
+            yield chunk
+
+
+class HedgingBackend(LLMBackend):
+    """
+    Hedged requests: when a model has not sent its first token within the hedge
+    delay (its rolling p95 time-to-first-token times `multiplier`, clamped to
+    min/max), the same request is also sent to a fallback model. Whichever
+    stream starts first is used and the other is cancelled. A hedged call adds
+    a `hedge` entry to the usage dict so agents can report it.
+    """
+
+    def __init__(self, inner: LLMBackend, settings: dict):
+        self.inner = inner
+        self.fallbacks: Dict[str, str] = settings.get("fallbacks") or {}
+        self.hedge_same_model = settings["hedge_same_model"]
+        self.initial_delay = settings["initial_delay_ms"] / 1000
+        self.min_delay = settings["min_delay_ms"] / 1000
+        self.max_delay = settings["max_delay_ms"] / 1000
+        self.multiplier = settings["multiplier"]
+        self.tracker = LatencyTracker(settings["window"], settings["percentile"], settings["min_samples"])
+        self.hedged = 0
+
+    def fallback_for(self, model: str) -> Optional[str]:
+        fallback = self.fallbacks.get(model) or self.fallbacks.get(model.split("/", 1)[0])
+        return fallback or (model if self.hedge_same_model else None)
+
+    def hedge_delay(self, model: str) -> float:
+        quantile = self.tracker.quantile(model)
+        if quantile is None:
+            return self.initial_delay
+        return min(self.max_delay, max(self.min_delay, quantile * self.multiplier))
+
+    async def stream(self, model: str, messages: List[dict], usage: Optional[dict] = None, **params) -> AsyncIterator[str]:
+        fallback = self.fallback_for(model)
+        primary = _Attempt(self.inner, model, messages, params)
+        attempts = [primary]
+        delay = self.hedge_delay(model)
+        try:
+            waiter = asyncio.ensure_future(primary.ready.wait())
+            await asyncio.wait([waiter], timeout=delay)
+            waiter.cancel()
+            if not primary.ready.is_set() and fallback:
+                attempts.append(_Attempt(self.inner, fallback, messages, params))
+
+            winner = await self.race(attempts)
+            for attempt in attempts:
+                if attempt is not winner:
+                    attempt.cancel()
+            # A cancelled primary still says something about its latency (at least this slow)
+            self.tracker.record(model, primary.ttft)
+            if winner is not primary:
+                self.tracker.record(winner.model, winner.ttft)
+
+            async for chunk in winner.chunks():
+                yield chunk
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+        if usage is not None:
+            usage.update(winner.usage)
+            if len(attempts) > 1:
+                usage["hedge"] = {"model": model, "fallback": fallback, "winner": winner.model,
+                                  "delay_ms": round(delay * 1000)}
+        if len(attempts) > 1:
+            self.hedged += 1
+
+    @staticmethod
+    async def race(attempts: List[_Attempt]) -> _Attempt:
+        """First attempt to start streaming; an attempt that failed only wins if all did"""
+        pending = list(attempts)
+        while True:
+            for attempt in pending:
+                if attempt.succeeded:
+                    return attempt
+            pending = [a for a in pending if not a.ready.is_set()]
+            if not pending:
+                return attempts[0]
+            waiters = [asyncio.ensure_future(a.ready.wait()) for a in pending]
+            await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+            for waiter in waiters:
+                waiter.cancel()
+            pending = list(attempts)  # Re-check everything, including ones that just finished
+
+    async def warmup(self):
+        await self.inner.warmup()
+
+
+def with_hedging(backend: LLMBackend, settings: dict) -> LLMBackend:
+    """Wrap a backend according to the `hedging` section of game_config.yaml"""
+    if not settings.get("enabled"):
+        return backend
+    return HedgingBackend(backend, settings)
@@ -0,0 +1,108 @@
+from typing import List
+
+SUMMARY_HEADER = "[Summary of earlier turns]:"
+NOTIFICATION_PREFIX = "[System Notification]: "
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count without a tokenizer: ~4 ASCII characters per token,
+    ~1 token per CJK (or other non-ASCII) character.
+    """
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def message_text(message: dict) -> str:
+    """Text of a message whose content is a string or a list of content parts"""
+    content = message.get("content") or ""
+    if isinstance(content, str):
+        return content
+    return "".join(part.get("text", "") for part in content)
+
+
+def count_tokens(messages: List[dict]) -> int:
+    # +4 per message for role/formatting overhead
+    return sum(estimate_tokens(message_text(m)) + 4 for m in messages)
+
+
+class ContextMemory:
+    """
+    Keeps an agent's conversation history within a token budget.
+
+    The agent's full history is left untouched; `build` returns the messages to
+    actually send. While the history fits in the budget it is sent verbatim.
+    Once it doesn't, everything but the `keep_recent` newest messages is folded
+    into a rolling summary: system notifications (game facts) are kept as-is,
+    the agent's own replies are shortened, and the repeated task prompts are
+    dropped. Compaction happens in one step each time the budget is exceeded,
+    so the message prefix stays stable between compactions.
+    """
+
+    def __init__(self, budget_tokens: int = 4000, keep_recent: int = 6, summary_chars: int = 160, enabled: bool = True):
+        self.enabled = enabled
+        self.budget_tokens = budget_tokens
+        self.keep_recent = keep_recent
+        self.summary_chars = summary_chars
+        self.summary_lines: List[str] = []
+        self.compacted = 0  # Number of history messages folded into the summary
+        self.last_saved_tokens = 0
+        self.total_saved_tokens = 0
+
+    @classmethod
+    def from_config(cls, settings: dict) -> "ContextMemory":
+        return cls(
+            budget_tokens=settings["budget_tokens"],
+            keep_recent=settings["keep_recent"],
+            summary_chars=settings["summary_chars"],
+            enabled=settings["enabled"],
+        )
+
+    def summary_message(self) -> List[dict]:
+        if not self.summary_lines:
+            return []
+        return [{"role": "user", "content": "\n".join([SUMMARY_HEADER] + self.summary_lines)}]
+
+    def view(self, history: List[dict]) -> List[dict]:
+        return self.summary_message() + history[self.compacted:]
+
+    def summarize(self, message: dict) -> str:
+        content = (message.get("content") or "").strip()
+        if message["role"] == "assistant":
+            if len(content) > self.summary_chars:
+                content = content[:self.summary_chars].rstrip() + "..."
+            return f"- You said: {content}" if content else ""
+        if content.startswith(NOTIFICATION_PREFIX):
+            return f"- {content[len(NOTIFICATION_PREFIX):]}"
+        # Task prompts are rebuilt on every call, no need to remember them
+        return ""
+
+    def compact(self, history: List[dict]):
+        """Fold everything but the most recent messages into the summary"""
+        cut = max(self.compacted, len(history) - self.keep_recent)
+        # Start the verbatim part on a user message
+        while cut > self.compacted and cut < len(history) and history[cut]["role"] != "user":
+            cut -= 1
+        for message in history[self.compacted:cut]:
+            line = self.summarize(message)
+            if line:
+                self.summary_lines.append(line)
+        self.compacted = cut
+
+        # The summary itself must fit in half the budget: drop its oldest lines
+        while self.summary_lines and count_tokens(self.summary_message()) > self.budget_tokens // 2:
+            self.summary_lines.pop(0)
+
+    def build(self, history: List[dict]) -> List[dict]:
+        """Messages to send for this history, recording how many tokens were saved"""
+        if not self.enabled:
+            self.last_saved_tokens = 0
+            return list(history)
+
+        if count_tokens(self.view(history)) > self.budget_tokens:
+            self.compact(history)
+
+        messages = self.view(history)
+        self.last_saved_tokens = max(0, count_tokens(history) - count_tokens(messages))
+        self.total_saved_tokens += self.last_saved_tokens
+        return messages
@@ -0,0 +1,179 @@
+import bisect
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Label values of one series, in the order of the metric's label names
+LabelValues = Tuple[str, ...]
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+RATE_BUCKETS = (5, 10, 20, 40, 60, 80, 120, 200, 400)
+PHASE_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1200)
+
+
+def format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in pairs) + "}"
+
+
+class Metric:
+    """A named metric with labelled series, rendered in the Prometheus text format"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.lock = threading.Lock()
+
+    def key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self.values.get(self.key(labels), 0)
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{format_labels(self.label_names, key)} {format_value(value)}"
+            for key, value in sorted(self.values.items())
+        ]
+
+
+class Gauge(Metric):
+    """
+    A value that goes up and down. Gauges over live objects (games, queues) are
+    computed at scrape time by a collector function instead of being set.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 collect: Optional[Callable[[], Iterable[Tuple[Dict[str, str], float]]]] = None):
+        super().__init__(name, help_text, labels)
+        self.values: Dict[LabelValues, float] = {}
+        self.collect = collect
+
+    def set(self, value: float, **labels):
+        with self.lock:
+            self.values[self.key(labels)] = value
+
+    def render(self) -> List[str]:
+        values = dict(self.values)
+        if self.collect:
+            values.update((self.key(labels), value) for labels, value in self.collect())
+        return self.header() + [
+            f"{self.name}{format_labels(self.label_names, key)} {format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per series: (count per bucket, sum, count); the last bucket is +Inf
+        self.series: Dict[LabelValues, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self.key(labels)
+        with self.lock:
+            counts, total, count = self.series.get(key) or ([0] * (len(self.buckets) + 1), 0.0, 0)
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.series[key] = (counts, total + value, count + 1)
+
+    def count(self, **labels) -> int:
+        series = self.series.get(self.key(labels))
+        return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, (counts, total, count) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                labels = format_labels(self.label_names, key, ("le", format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# LLM calls (Agent.call_model, OpenAIBackend)
+LLM_TIME_TO_FIRST_TOKEN = REGISTRY.register(Histogram(
+    "werewolf_llm_time_to_first_token_seconds", "Time from request to first streamed chunk.", ["model"]))
+LLM_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "werewolf_llm_request_duration_seconds", "Total duration of a completion.", ["model"]))
+LLM_TOKENS_PER_SECOND = REGISTRY.register(Histogram(
+    "werewolf_llm_tokens_per_second", "Completion tokens per second of generation.", ["model"], RATE_BUCKETS))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "werewolf_llm_tokens_total", "Tokens processed, by kind (prompt, cached, completion).", ["model", "kind"]))
+LLM_REQUESTS = REGISTRY.register(Counter(
+    "werewolf_llm_requests_total", "Completions requested by agents.", ["model"]))
+LLM_ERRORS = REGISTRY.register(Counter(
+    "werewolf_llm_errors_total", "Completions that failed after all retries.", ["model"]))
+LLM_RETRIES = REGISTRY.register(Counter(
+    "werewolf_llm_retries_total", "Provider requests retried after a 429, 5xx or connection error.", ["model"]))
+LLM_HEDGES = REGISTRY.register(Counter(
+    "werewolf_llm_hedges_total", "Requests duplicated to a fallback after a slow first token.", ["model", "winner"]))
+
+# Game engine
+EVENTS_PUBLISHED = REGISTRY.register(Counter(
+    "werewolf_events_total", "Events broadcast by game engines.", ["type"]))
+PHASE_DURATION = REGISTRY.register(Histogram(
+    "werewolf_phase_duration_seconds", "Duration of night and day phases.", ["phase"], PHASE_BUCKETS))
+GAMES_FINISHED = REGISTRY.register(Counter(
+    "werewolf_games_finished_total", "Finished games by winner.", ["winner"]))
+TIMEOUTS = REGISTRY.register(Counter(
+    "werewolf_timeouts_total", "LLM calls, decisions and phases cut off at their deadline.", ["scope"]))
@@ -1,13 +1,22 @@
+import argparse
 import asyncio
 import httpx
 import json
-import sys
-from rich.console import Console
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+from rich.console import Console, Group
+from rich.layout import Layout
+from rich.live import Live
 from rich.panel import Panel
 from rich.prompt import Confirm
+from rich.table import Table
+from rich.text import Text
 
 console = Console()
 
+API_URL = "http://127.0.0.1:8000"
+
 # Role to emoji mapping
 ROLE_EMOJIS = {
     "Werewolf": "🐺",
@@ -17,20 +26,56 @@ ROLE_EMOJIS = {
     "God": "👀"
 }
 
+# Styles of transcript lines in the live views
+LINE_STYLES = {
+    "thought": "italic cyan",
+    "speech": "green",
+    "action": "bold magenta",
+    "system": "bold cyan",
+    "phase": "bold yellow",
+    "hedge": "dim yellow",
+    "timeout": "bold yellow",
+    "game_over": "bold red",
+}
+STREAMED_TYPES = ("thought", "speech", "action")
+NOTICE_TYPES = ("hedge", "timeout")  # Call-level notices; they don't interrupt anyone's stream
+
 class GameViewer:
-    def __init__(self, god_mode: bool = False):
+    def __init__(self, game_id: str, god_mode: bool = False, stream_path: str = None):
+        self.game_id = game_id
+        self.stream_path = stream_path or f"/games/{game_id}/stream"
+        self.reconnect = stream_path is None  # Live games are followed until game over
         self.buffer = {}  # {(type, agent): accumulated_content}
         self.player_roles = {}  # {agent_name: role}
         self.god_mode = god_mode
+        self.last_event_id = 0
+        self.game_over = False
         
     async def watch_stream(self):
-        async with httpx.AsyncClient() as client:
-            async with client.stream("GET", "http://127.0.0.1:8000/stream", timeout=None) as response:
-                async for line in response.aiter_lines():
-                    if line.startswith("data: "):
-                        data = line[6:]
-                        event = json.loads(data)
-                        await self.handle_event(event)
+        # Reconnect with Last-Event-ID until the game is over, so no chunks are lost
+        while not self.game_over:
+            headers = {"Last-Event-ID": str(self.last_event_id)} if self.last_event_id else {}
+            try:
+                async with httpx.AsyncClient() as client:
+                    async with client.stream("GET", f"{API_URL}{self.stream_path}", headers=headers, timeout=None) as response:
+                        if response.status_code != 200:
+                            console.print(f"[bold red]Stream unavailable (HTTP {response.status_code})[/]")
+                            return
+                        async for line in response.aiter_lines():
+                            if line.startswith("id: "):
+                                self.last_event_id = int(line[4:])
+                            elif line.startswith("data: "):
+                                data = line[6:]
+                                event = json.loads(data)
+                                await self.handle_event(event)
+            except httpx.HTTPError:
+                pass
+            
+            if not self.reconnect:
+                break
+            if not self.game_over:
+                console.print("[dim yellow]Stream interrupted, reconnecting...[/]")
+                await asyncio.sleep(1)
     
     def get_emoji(self, agent_name):
         """Get emoji for agent based on their role (if God Mode) or generic"""
@@ -83,9 +128,19 @@ class GameViewer:
                 # Clear buffer
                 del self.buffer[key]
         
+        elif event_type == "hedge":
+            console.print(f"[dim yellow]⏱️ {agent}: {content.strip()}[/]")
+        
+        elif event_type == "timeout":
+            console.print(f"[bold yellow]⌛ {agent}: {content.strip()}[/]")
+        
         # Game over
         elif event_type == "game_over":
+            self.game_over = True
             console.print(Panel(f"[bold red]{content}[/]", title="🏁 Game Over", border_style="red"))
+            usage = (event.get("usage") or {}).get("game")
+            if usage:
+                console.print(f"[dim]Usage: {usage['total_tokens']} tokens over {usage['calls']} calls, ${usage['cost_usd']:.4f}[/]")
     
     def display_message(self, event_type, agent, content):
         emoji = self.get_emoji(agent)
@@ -97,11 +152,229 @@ class GameViewer:
         elif event_type == "action":
             console.print(f"[bold magenta]⚙️ {emoji} {agent} → {content}[/]")
 
+class GameState:
+    """
+    What the live views show of one game. Events only append to per-agent
+    chunk lists (O(1) per event, however fast they arrive); text is joined
+    when a message completes or a frame is drawn.
+    """
+
+    def __init__(self, game_id: str, history: int = 500):
+        self.game_id = game_id
+        self.phase = ""
+        self.active: Dict[str, Tuple[str, List[str]]] = {}  # {agent: (type, chunks of the message being streamed)}
+        self.transcript: Deque[Tuple[str, str, str]] = deque(maxlen=history)  # (type, agent, text)
+        self.last_action: Dict[str, str] = {}
+        self.events = 0
+        self.result: Optional[str] = None
+        self.usage: Optional[dict] = None
+        self.dirty = True  # Changed since the last frame
+        self.rate_mark = (time.monotonic(), 0)
+        self.rate_value = 0.0
+
+    def apply(self, event: dict):
+        event_type, agent, content = event["type"], event["agent"], event["content"]
+        self.events += 1
+        self.dirty = True
+
+        if event_type in STREAMED_TYPES:
+            current = self.active.get(agent)
+            if current and current[0] != event_type:
+                self.finish(agent)
+                current = None
+            if current is None:
+                current = self.active[agent] = (event_type, [])
+            current[1].append(content)
+            if content.endswith("\n"):
+                self.finish(agent)
+            return
+
+        if event_type in NOTICE_TYPES:
+            self.transcript.append((event_type, agent, content.strip()))
+            return
+
+        # Anything else is a complete message, and ends whatever was streaming
+        for name in list(self.active):
+            self.finish(name)
+        if event_type == "phase":
+            self.phase = content.strip()
+        elif event_type == "game_over":
+            self.result = content.strip()
+            self.usage = (event.get("usage") or {}).get("game")
+        self.transcript.append((event_type, agent, content.strip()))
+
+    def finish(self, agent: str):
+        event_type, chunks = self.active.pop(agent)
+        text = "".join(chunks).strip()
+        if text:
+            self.transcript.append((event_type, agent, text))
+            if event_type == "action":
+                self.last_action[agent] = text
+
+    def headline(self) -> str:
+        if self.result:
+            return self.result.splitlines()[0]
+        return self.phase.splitlines()[0] if self.phase else "Waiting for the game to start"
+
+    def rate(self) -> float:
+        """Events per second, over roughly the last second"""
+        now = time.monotonic()
+        since, count = self.rate_mark
+        if now - since >= 1:
+            self.rate_value = (self.events - count) / (now - since)
+            self.rate_mark = (now, self.events)
+        return self.rate_value
+
+
+class LiveViewer(GameViewer):
+    """
+    Full-screen viewer: events update a GameState and a rich.Live layout is
+    redrawn at most `fps` times per second (only when something changed),
+    with the transcript on the left and one pane per agent still streaming.
+    """
+
+    def __init__(self, game_id: str, god_mode: bool = False, stream_path: str = None, fps: float = 10):
+        super().__init__(game_id, god_mode=god_mode, stream_path=stream_path)
+        self.state = GameState(game_id)
+        self.fps = fps
+
+    async def handle_event(self, event):
+        self.state.apply(event)
+        self.game_over = self.state.result is not None
+
+    async def watch(self):
+        await run_live(self.render, lambda: [self.state], [asyncio.create_task(self.watch_stream())], self.fps)
+        if self.state.usage:
+            usage = self.state.usage
+            console.print(f"[dim]Usage: {usage['total_tokens']} tokens over {usage['calls']} calls, ${usage['cost_usd']:.4f}[/]")
+
+    def line(self, event_type: str, agent: str, text: str) -> Text:
+        if event_type in STREAMED_TYPES:
+            prefix = {"thought": "💭 ", "speech": "", "action": "⚙️ "}[event_type]
+            return Text.assemble(f"{prefix}{self.get_emoji(agent)} ", (f"{agent}: ", "bold"), (text, LINE_STYLES[event_type]))
+        if event_type in NOTICE_TYPES:
+            return Text(f"{'⏱️' if event_type == 'hedge' else '⌛'} {agent}: {text}", style=LINE_STYLES[event_type])
+        return Text(text, style=LINE_STYLES.get(event_type, ""))
+
+    def render(self) -> Layout:
+        state = self.state
+        height = max(5, console.size.height - 5)
+        header = Text.assemble(
+            ("🐺 ", ""), (f"Game {state.game_id}", "bold cyan"), "  ",
+            (state.headline(), "bold yellow"),
+            f"  ·  {state.events} events, {state.rate():.0f}/s",
+        )
+        # Newest entries that fit the pane, counting wrapped lines (the panel crops from the bottom)
+        width = max(20, console.size.width * 3 // 5 - 4)
+        lines: List[Text] = []
+        for entry in reversed(state.transcript):
+            line = self.line(*entry)
+            height -= len(line) // width + 1
+            if height < 0:
+                break
+            lines.append(line)
+        transcript = Text("\n").join(reversed(lines))
+        streaming = [
+            Panel(Text("".join(chunks)[-600:], style=LINE_STYLES[event_type]),
+                  title=f"{self.get_emoji(agent)} {agent} · {event_type}", title_align="left", border_style="blue")
+            for agent, (event_type, chunks) in state.active.items()
+        ]
+
+        layout = Layout()
+        layout.split_column(Layout(Panel(header, border_style="cyan"), size=3), Layout(name="body"))
+        layout["body"].split_row(
+            Layout(Panel(transcript, title="Transcript", border_style="white"), ratio=3),
+            Layout(Group(*streaming) if streaming else Panel(Text("Nobody is talking", style="dim"), border_style="blue"), ratio=2),
+        )
+        return layout
+
+
+class Dashboard:
+    """One row per game: follows the given games, or every running game on the server"""
+
+    def __init__(self, game_ids: List[str], fps: float = 4, poll_seconds: float = 5):
+        self.follow_all = not game_ids
+        self.viewers: Dict[str, LiveViewer] = {}
+        self.tasks: List[asyncio.Task] = []
+        self.fps = fps
+        self.poll_seconds = poll_seconds
+        for game_id in game_ids:
+            self.add(game_id)
+
+    def add(self, game_id: str):
+        if game_id not in self.viewers:
+            viewer = self.viewers[game_id] = LiveViewer(game_id)
+            self.tasks.append(asyncio.create_task(viewer.watch_stream()))
+
+    async def discover(self):
+        """Pick up newly started games until interrupted"""
+        while True:
+            try:
+                async with httpx.AsyncClient() as client:
+                    response = await client.get(f"{API_URL}/games")
+                for game in response.json():
+                    if game["status"] == "running":
+                        self.add(game["game_id"])
+            except (httpx.HTTPError, ValueError):
+                pass
+            await asyncio.sleep(self.poll_seconds)
+
+    async def watch(self):
+        if self.follow_all:
+            self.tasks.append(asyncio.create_task(self.discover()))
+        states = lambda: [viewer.state for viewer in self.viewers.values()]
+        await run_live(self.render, states, self.tasks, self.fps, until_all_done=not self.follow_all)
+
+    def render(self) -> Table:
+        table = Table(title="🐺 Werewolf Arena - Games", expand=True)
+        table.add_column("Game", style="bold cyan", no_wrap=True)
+        table.add_column("Phase", style="yellow")
+        table.add_column("Events", justify="right")
+        table.add_column("/s", justify="right")
+        table.add_column("Streaming", style="blue")
+        table.add_column("Latest", ratio=1, no_wrap=True)
+        for game_id, viewer in self.viewers.items():
+            state = viewer.state
+            latest = state.transcript[-1] if state.transcript else None
+            table.add_row(
+                game_id,
+                state.headline(),
+                str(state.events),
+                f"{state.rate():.0f}",
+                ", ".join(state.active) or "-",
+                viewer.line(*latest) if latest else "",
+            )
+        return table
+
+
+async def run_live(render, states, tasks: List[asyncio.Task], fps: float, until_all_done: bool = True):
+    """
+    Redraw `render()` at most `fps` times per second while the streaming tasks
+    run (or until interrupted), skipping frames in which no game changed.
+    """
+    interval = 1 / max(fps, 0.1)
+    last_draw = time.monotonic()
+    with Live(render(), console=console, auto_refresh=False, vertical_overflow="crop") as live:
+        try:
+            while not (until_all_done and all(task.done() for task in tasks)):
+                await asyncio.sleep(interval)
+                changed = [state for state in states() if state.dirty]
+                # Rates are shown too, so redraw at least once a second
+                if changed or time.monotonic() - last_draw >= 1:
+                    for state in changed:
+                        state.dirty = False
+                    live.update(render(), refresh=True)
+                    last_draw = time.monotonic()
+        finally:
+            for task in tasks:
+                task.cancel()
+        live.update(render(), refresh=True)
+
 async def fetch_role_mapping(viewer: GameViewer):
     """Fetch role mapping from API for God Mode"""
     try:
         async with httpx.AsyncClient() as client:
-            response = await client.get("http://127.0.0.1:8000/roles")
+            response = await client.get(f"{API_URL}/games/{viewer.game_id}/roles")
             if response.status_code == 200:
                 viewer.player_roles = response.json()
                 console.print("[dim]God Mode: Role mapping loaded[/]\n")
@@ -109,24 +382,60 @@ async def fetch_role_mapping(viewer: GameViewer):
         console.print("[dim yellow]Warning: Could not load role mapping[/]\n")
 
 async def main():
+    parser = argparse.ArgumentParser(description="Werewolf Arena terminal viewer")
+    parser.add_argument("game_id", nargs="?", help="Join this game instead of starting a new one")
+    parser.add_argument("--replay", action="store_true", help="Replay a finished game from its event log")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed multiplier (0 = instant)")
+    parser.add_argument("--phase", type=int, default=0, help="Start the replay at the n-th phase event")
+    parser.add_argument("--live", action="store_true", help="Full-screen view redrawn at a capped frame rate")
+    parser.add_argument("--fps", type=float, default=10, help="Maximum redraws per second of the live views")
+    parser.add_argument("--dashboard", nargs="*", metavar="GAME_ID",
+                        help="Watch several games at once (all running games if no ids are given)")
+    args = parser.parse_args()
+    
+    if args.dashboard is not None:
+        await Dashboard(args.dashboard, fps=args.fps).watch()
+        return
+    
     console.print(Panel("[bold cyan]🐺 Werewolf Arena - Terminal Viewer 🐺[/]", border_style="cyan"))
     
+    if args.replay and not args.game_id:
+        console.print("[bold red]--replay needs a game id[/]")
+        return
+    
     # Ask for God Mode
     god_mode = Confirm.ask("🔮 Enable God Mode (see real player roles)?", default=False)
     
     console.print("[dim]Connecting to game stream...[/]\n")
     
-    # Start game
-    async with httpx.AsyncClient() as client:
-        await client.post("http://127.0.0.1:8000/start")
+    # Start game (or join an existing one: `play.py <game_id>`)
+    if args.game_id:
+        game_id = args.game_id
+    else:
+        async with httpx.AsyncClient() as client:
+            response = await client.post(f"{API_URL}/games")
+            if response.status_code != 200:
+                console.print(f"[bold red]Could not start game: {response.json().get('detail')}[/]")
+                return
+            game_id = response.json()["game_id"]
+    console.print(f"[dim]Game ID: {game_id}[/]\n")
     
-    viewer = GameViewer(god_mode=god_mode)
+    stream_path = None
+    if args.replay:
+        stream_path = f"/games/{game_id}/replay?speed={args.speed}&phase={args.phase}"
+    if args.live:
+        viewer = LiveViewer(game_id, god_mode=god_mode, stream_path=stream_path, fps=args.fps)
+    else:
+        viewer = GameViewer(game_id, god_mode=god_mode, stream_path=stream_path)
     
     # Fetch roles if God Mode enabled
     if god_mode:
         await fetch_role_mapping(viewer)
     
-    await viewer.watch_stream()
+    if args.live:
+        await viewer.watch()
+    else:
+        await viewer.watch_stream()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -30,11 +30,17 @@ Use your potions strategically. Timing is crucial.""",
 - Participate actively in discussions
 - Vote wisely to eliminate threats""",
     
-    # Agent method prompts
+    # Static per-game context, sent once as the system message.
+    # Kept byte-identical across calls so provider prompt caching can hit.
+    "static_context": """Game Settings: {game_intro}
+
+{system_prompt}
+
+Your Identity: {player_name}""",
+    
+    # Agent method prompts (volatile context only)
     "think": """Context: {context}
 Current Round: {round}
-Game Settings: {game_intro}
-Your Identity: {player_name}
 
 Analyze the situation carefully. Consider:
 - Who appears suspicious and why?
@@ -46,8 +52,6 @@ Keep your analysis concise and focused.""",
     
     "speak": """Context: {context}
 Current Round: {round}
-Game Settings: {game_intro}
-Your Identity: {player_name}
 Your Reasoning: {thought_process}
 
 Speak to other players. You may:
@@ -59,8 +63,6 @@ Be concise and strategic. Limit: 30 words.""",
     
     "act_think": """Context: {context}
 Current Round: {round}
-Game Settings: {game_intro}
-Your Identity: {player_name}
 Task: {task}
 
 Analyze the situation thoroughly. What is the best course of action and why?
@@ -68,13 +70,36 @@ Provide your strategic reasoning.""",
     
     "act_decide": """Context: {context}
 Current Round: {round}
-Game Settings: {game_intro}
-Your Identity: {player_name}
 Your Reasoning: {thought_process}
 
 Task: {task}
 Instruction: {output_instruction}""",
     
+    # Single-call variants: reasoning and result in one tagged response
+    "act_structured": """Context: {context}
+Current Round: {round}
+Task: {task}
+
+First analyze the situation and decide on the best course of action, then give your decision.
+Answer in exactly this format:
+<thought>your strategic reasoning</thought>
+<answer>your decision</answer>
+Instruction for the answer: {output_instruction}""",
+    
+    "discuss_structured": """Context: {context}
+Current Round: {round}
+
+Analyze the situation carefully (who appears suspicious, your strategy, what you can deduce), then speak to the other players.
+IMPORTANT: If this is Round 1, there is NO prior history (no votes, no deaths). Do not hallucinate past events.
+Answer in exactly this format:
+<thought>your concise analysis</thought>
+<speech>what you say to the other players (limit: 30 words)</speech>""",
+    
+    # Follow-up when a decision named no legal option
+    "decision_retry": """Your answer "{answer}" is not a valid choice.
+Valid choices: {options}
+{output_instruction}""",
+    
     # God/Host prompts
     "god_announce": """Task: Announce the following event to the players and audience.
 Event: {message}
@@ -84,8 +109,6 @@ Keep it under 2 sentences.""",
     # Voting prompt
     "vote": """Context: {context}
 Current Round: {round}
-Game Settings: {game_intro}
-Your Identity: {player_name}
 Your Reasoning: {thought_process}
 
 Task: Vote to eliminate one player during the day discussion.
@@ -123,11 +146,17 @@ PROMPTS_ZH = {
 - 积极参与讨论
 - 明智投票，消灭威胁""",
     
-    # Agent 方法提示词
+    # 每局固定的上下文，作为系统消息发送一次。
+    # 每次调用保持字节一致，以便命中服务商的提示缓存。
+    "static_context": """游戏设定：{game_intro}
+
+{system_prompt}
+
+你的身份：{player_name}""",
+    
+    # Agent 方法提示词（仅包含变化的上下文）
     "think": """情境：{context}
 当前回合：{round}
-游戏设定：{game_intro}
-你的身份：{player_name}
 
 仔细分析局势。思考：
 - 谁看起来可疑？为什么？
@@ -139,8 +168,6 @@ PROMPTS_ZH = {
     
     "speak": """情境：{context}
 当前回合：{round}
-游戏设定：{game_intro}
-你的身份：{player_name}
 你的推理：{thought_process}
 
 对其他玩家发言。你可以：
@@ -152,8 +179,6 @@ PROMPTS_ZH = {
     
     "act_think": """情境：{context}
 当前回合：{round}
-游戏设定：{game_intro}
-你的身份：{player_name}
 任务：{task}
 
 全面分析局势。最佳行动方案是什么？为什么？
@@ -161,13 +186,36 @@ PROMPTS_ZH = {
     
     "act_decide": """情境：{context}
 当前回合：{round}
-游戏设定：{game_intro}
-你的身份：{player_name}
 你的推理：{thought_process}
 
 任务：{task}
 指令：{output_instruction}""",
     
+    # 单次调用版本：推理与结果在同一个带标签的回复中
+    "act_structured": """情境：{context}
+当前回合：{round}
+任务：{task}
+
+先分析局势并确定最佳行动方案，再给出你的决定。
+严格按以下格式回答：
+<thought>你的战略推理</thought>
+<answer>你的决定</answer>
+答案指令：{output_instruction}""",
+    
+    "discuss_structured": """情境：{context}
+当前回合：{round}
+
+仔细分析局势（谁可疑、你的策略、你能推断出什么），然后对其他玩家发言。
+重要：如果是第1轮，没有历史记录（无投票、无死亡）。不要编造过去发生的事件。
+严格按以下格式回答：
+<thought>你的简要分析</thought>
+<speech>你对其他玩家说的话（30字内）</speech>""",
+    
+    # 决定无效时的追问
+    "decision_retry": """你的回答“{answer}”不是有效选项。
+有效选项：{options}
+{output_instruction}""",
+    
     # 上帝/主持人提示词
     "god_announce": """任务：向玩家和观众宣布以下事件。
 事件：{message}
@@ -177,8 +225,6 @@ PROMPTS_ZH = {
     # 投票提示词
     "vote": """情境：{context}
 当前回合：{round}
-游戏设定：{game_intro}
-你的身份：{player_name}
 你的推理：{thought_process}
 
 任务：在白天讨论中投票淘汰一名玩家。
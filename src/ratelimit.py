@@ -0,0 +1,189 @@
+import asyncio
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Dict, Iterator, Optional
+
+
+class TokenBucket:
+    """
+    Token bucket that hands out request slots at `rate` per second with bursts up to `capacity`.
+    Callers reserve a slot immediately (tokens may go negative) and then sleep until
+    it is theirs, so no lock is needed and waiters are served in arrival order.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0  # Set from Retry-After when the provider pushes back
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Take a slot and return how long to wait before using it"""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.blocked_until - now)
+
+    async def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def block_for(self, seconds: float):
+        """Hold back every caller of this bucket, e.g. after a 429 with Retry-After"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class RateLimiter:
+    """
+    Per-provider (or per-model) request rate limiting with jittered retry backoff.
+    Limits come from the `rate_limits` section of game_config.yaml. A model uses its
+    own entry under `models` if present, otherwise the entry for its provider
+    (the part before the '/'), otherwise `default`. Every key gets its own bucket.
+    """
+
+    def __init__(self, settings: dict):
+        self.enabled = settings.get("enabled", True)
+        self.default = settings.get("default") or {"requests_per_second": 5, "burst": 10}
+        self.providers: Dict[str, dict] = settings.get("providers") or {}
+        self.models: Dict[str, dict] = settings.get("models") or {}
+        self.max_retries = settings.get("max_retries", 4)
+        self.base_delay = settings.get("base_delay", 1.0)
+        self.max_delay = settings.get("max_delay", 30.0)
+        self.scale = 1.0  # Share of the configured limits this process may use
+        self.buckets: Dict[str, TokenBucket] = {}
+
+    def set_share(self, share: float):
+        """
+        Use only a fraction of the configured limits, e.g. 1/N when N worker
+        processes each run their own limiter against the same provider.
+        """
+        self.scale = share
+        self.buckets.clear()
+
+    def limits_for(self, model: str):
+        """Return (bucket key, limits) for a model"""
+        if model in self.models:
+            return model, self.models[model]
+        provider = model.split("/", 1)[0]
+        return provider, self.providers.get(provider, self.default)
+
+    def bucket(self, model: str) -> TokenBucket:
+        key, limits = self.limits_for(model)
+        if key not in self.buckets:
+            self.buckets[key] = TokenBucket(
+                limits["requests_per_second"] * self.scale,
+                max(1, limits.get("burst", 1) * self.scale)
+            )
+        return self.buckets[key]
+
+    async def acquire(self, model: str):
+        if self.enabled:
+            await self.bucket(model).acquire()
+
+    def backoff(self, model: str, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Delay before retry number `attempt` (0-based).
+        Honors the provider's Retry-After when given, otherwise exponential backoff with full jitter.
+        The delay also blocks the whole bucket, so other agents on the same provider back off too.
+        """
+        if retry_after is not None:
+            delay = retry_after + random.uniform(0, self.base_delay)
+        else:
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if self.enabled:
+            self.bucket(model).block_for(delay)
+        return delay
+
+
+def parse_retry_after(headers) -> Optional[float]:
+    """Seconds to wait from Retry-After / retry-after-ms response headers, if present"""
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        # HTTP-date form
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class CallClock:
+    """
+    How long an LLM call has been up to the provider: time since it started,
+    minus time spent queued for a rate limit slot or backing off before a
+    retry. Call deadlines run on this clock, so our own throttling doesn't
+    count against them.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.excluded = 0.0
+        self.waits = 0  # Waits in progress (hedged requests can wait at the same time)
+        self.waiting_since = 0.0
+
+    @property
+    def waiting(self) -> bool:
+        return self.waits > 0
+
+    def elapsed(self) -> float:
+        now = time.monotonic()
+        current_wait = now - self.waiting_since if self.waiting else 0.0
+        return now - self.started - self.excluded - current_wait
+
+    @contextmanager
+    def paused(self) -> Iterator[None]:
+        if not self.waiting:
+            self.waiting_since = time.monotonic()
+        self.waits += 1
+        try:
+            yield
+        finally:
+            self.waits -= 1
+            if not self.waiting:
+                self.excluded += time.monotonic() - self.waiting_since
+
+
+# Clock of the LLM call the current task is making (tasks it starts inherit it)
+_current_call_clock: ContextVar[Optional[CallClock]] = ContextVar("call_clock", default=None)
+
+
+def clocked_task(clock: CallClock, awaitable: Awaitable) -> asyncio.Future:
+    """Run `awaitable` as a task whose rate limit waits and backoffs pause `clock`"""
+    token = _current_call_clock.set(clock)
+    try:
+        return asyncio.ensure_future(awaitable)
+    finally:
+        _current_call_clock.reset(token)
+
+
+@contextmanager
+def throttled() -> Iterator[None]:
+    """Mark a wait on our own limits; it doesn't count toward the current call's deadline"""
+    clock = _current_call_clock.get()
+    if clock is None:
+        yield
+        return
+    with clock.paused():
+        yield
@@ -0,0 +1,79 @@
+from typing import Dict, Iterable, List, Optional
+
+from .agents import Agent
+
+WEREWOLVES = "werewolves"
+VILLAGERS = "villagers"
+
+
+def faction(agent: Agent) -> str:
+    return WEREWOLVES if agent.role == "Werewolf" else VILLAGERS
+
+
+class PlayerRegistry:
+    """
+    The players of one game (God excluded), indexed by name and by role.
+    Alive players are kept per role in seating order (dicts used as ordered
+    sets) and living faction sizes are counted, so lookups, eliminations and
+    game-over checks don't scan the whole lobby.
+    """
+
+    def __init__(self, players: Iterable[Agent]):
+        self.by_name: Dict[str, Agent] = {}
+        self.alive: Dict[str, Agent] = {}
+        self.alive_by_role: Dict[str, Dict[str, Agent]] = {}
+        self.faction_alive: Dict[str, int] = {WEREWOLVES: 0, VILLAGERS: 0}
+        for player in players:
+            if player.role == "God":
+                continue
+            self.by_name[player.name] = player
+            self.alive_by_role.setdefault(player.role, {})
+            if player.is_alive:
+                self._add_alive(player)
+
+    def _add_alive(self, player: Agent):
+        self.alive[player.name] = player
+        self.alive_by_role[player.role][player.name] = player
+        self.faction_alive[faction(player)] += 1
+
+    def get(self, name: str) -> Optional[Agent]:
+        return self.by_name.get(name)
+
+    def is_alive(self, name: str) -> bool:
+        return name in self.alive
+
+    def alive_names(self) -> List[str]:
+        return list(self.alive)
+
+    def alive_agents(self) -> List[Agent]:
+        return list(self.alive.values())
+
+    def alive_with_role(self, role: str) -> List[Agent]:
+        return list(self.alive_by_role.get(role, {}).values())
+
+    def first_alive(self, role: str) -> Optional[Agent]:
+        return next(iter(self.alive_by_role.get(role, {}).values()), None)
+
+    def eliminate(self, name: str) -> Optional[Agent]:
+        """Mark a living player dead; returns them, or None if they were not alive"""
+        player = self.alive.pop(name, None)
+        if player is None:
+            return None
+        del self.alive_by_role[player.role][name]
+        self.faction_alive[faction(player)] -= 1
+        player.is_alive = False
+        player.status = "dead"
+        return player
+
+    def set_alive(self, names: Iterable[str]):
+        """Rebuild the alive indexes from a list of living names (e.g. from a checkpoint)"""
+        alive = set(names)
+        self.alive = {}
+        self.alive_by_role = {role: {} for role in self.alive_by_role}
+        self.faction_alive = {WEREWOLVES: 0, VILLAGERS: 0}
+        for player in self.by_name.values():
+            player.is_alive = player.name in alive
+            if player.is_alive:
+                self._add_alive(player)
+            else:
+                player.status = "dead"
@@ -0,0 +1,232 @@
+import asyncio
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from . import agents
+from .agents import Agent, God, Werewolf, Seer, Witch
+from .backends import LLMBackend, create_backend
+from .cache import with_response_cache
+from .checkpoint import apply_state, load_checkpoint
+from .config import GameConfig
+from .game_engine import GameEngine
+from .hedging import with_hedging
+from .memory import ContextMemory
+
+
+class GameLimitError(Exception):
+    """Raised when the server already hosts the maximum number of running games"""
+
+
+class GameActiveError(Exception):
+    """Raised when resuming a game that is still running"""
+
+
+def build_players(config: GameConfig, player_configs: List[dict], backend: LLMBackend) -> List[Agent]:
+    """God plus one agent per player config (name, role, model), in order"""
+    # Get prompts based on language
+    prompts = config.get_prompts()
+    
+    # Create God
+    god = God("God", "x-ai/grok-4.1-fast:free", "God", prompts["god"], backend)
+    
+    # Create players based on configuration
+    players = [god]
+    for pc in player_configs:
+        role_type = pc["role"]
+        name = pc["name"]
+        model = pc["model"]
+        prompt = prompts.get(role_type, prompts["villager"])
+        
+        if role_type == "werewolf":
+            players.append(Werewolf(name, model, "Werewolf", prompt, backend))
+        elif role_type == "seer":
+            players.append(Seer(name, model, "Seer", prompt, backend))
+        elif role_type == "witch":
+            players.append(Witch(name, model, "Witch", prompt, backend))
+        else:  # villager
+            players.append(Agent(name, model, "Villager", prompt, backend))
+    
+    memory = config.section("memory")
+    cache_control = config.section("prompt_cache")["cache_control"]
+    call_timeout = config.section("deadlines")["call_seconds"]
+    for player in players:
+        player.memory = ContextMemory.from_config(memory)
+        player.cache_control = cache_control
+        player.act_mode = config.config["act_mode"]
+        player.call_timeout = call_timeout
+    return players
+
+
+def game_backend(config: GameConfig, seed: Optional[int] = None) -> LLMBackend:
+    backend = create_backend(config.section("backend"), agents.rate_limiter, seed=seed)
+    backend = with_hedging(backend, config.section("hedging"))
+    return with_response_cache(backend, config.section("response_cache"))
+
+
+def build_engine(config: GameConfig, seed: Optional[int] = None, backend: Optional[LLMBackend] = None,
+                 game_id: Optional[str] = None) -> GameEngine:
+    """
+    Create a fresh GameEngine with randomly assigned roles (reproducible when seeded).
+    All agents share one backend; by default it comes from the config's `backend` section.
+    """
+    if backend is None:
+        backend = game_backend(config, seed)
+    
+    # Assign roles randomly
+    players = build_players(config, config.assign_roles(seed), backend)
+    
+    engine = GameEngine(players, config=config, game_id=game_id, seed=seed)
+    
+    # Store role mapping for God Mode in terminal
+    engine.role_mapping = {p.name: p.role for p in players if p.name != "God"}
+    return engine
+
+
+def resume_engine(config: GameConfig, game_id: str, backend: Optional[LLMBackend] = None) -> GameEngine:
+    """
+    Rebuild a game from its last checkpoint: same players, roles and models,
+    with their histories, memories and potions restored.
+    """
+    state = load_checkpoint(config.section("checkpoint")["dir"], game_id)
+    if state is None:
+        raise FileNotFoundError(f"No checkpoint for game {game_id}")
+    if backend is None:
+        backend = game_backend(config)
+    
+    player_configs = [
+        {"name": p["name"], "role": p["role"].lower(), "model": p["model"]}
+        for p in state["players"] if p["role"] != "God"
+    ]
+    players = build_players(config, player_configs, backend)
+    
+    engine = GameEngine(players, config=config, game_id=game_id)
+    apply_state(engine, state)
+    engine.role_mapping = {p.name: p.role for p in players if p.name != "God"}
+    return engine
+
+
+class GameSession:
+    """A single game hosted by the server: its engine and the task running it"""
+
+    def __init__(self, game_id: str, engine: GameEngine,
+                 on_finished: Optional[Callable[["GameSession"], None]] = None):
+        self.game_id = game_id
+        self.engine = engine
+        self.on_finished = on_finished
+        self.task: Optional[asyncio.Task] = None
+        self.created_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+
+    @property
+    def is_finished(self) -> bool:
+        return self.finished_at is not None
+
+    def start(self):
+        self.task = asyncio.create_task(self.engine.start_game())
+        self.task.add_done_callback(self._on_done)
+
+    def _on_done(self, task: asyncio.Task):
+        self.finished_at = time.monotonic()
+        if task.cancelled():
+            return
+        if task.exception():
+            print(f"Game {self.game_id} crashed: {task.exception()!r}")
+        elif self.on_finished:
+            self.on_finished(self)
+
+    def summary(self) -> dict:
+        return {
+            "game_id": self.game_id,
+            "status": "finished" if self.is_finished else "running",
+            "round": self.engine.round_number,
+            "alive_players": list(self.engine.alive_players),
+            "winner": self.engine.winner,
+            "subscribers": len(self.engine.events.subscribers),
+        }
+
+
+class GameManager:
+    """
+    Holds one GameEngine per game id.
+    Running games are capped at max_games; finished games are kept around
+    for ttl_seconds (so late viewers can still fetch roles) and then evicted.
+    on_finished is called with each session whose game ran to the end; work it
+    starts goes through run_in_background so its task isn't garbage collected.
+    """
+
+    def __init__(self, max_games: int = 32, ttl_seconds: float = 600,
+                 on_finished: Optional[Callable[[GameSession], None]] = None):
+        self.max_games = max_games
+        self.ttl_seconds = ttl_seconds
+        self.on_finished = on_finished
+        self.sessions: Dict[str, GameSession] = {}
+        self.background_tasks: Set[asyncio.Task] = set()  # The event loop only keeps weak references
+
+    @property
+    def active_count(self) -> int:
+        return sum(1 for s in self.sessions.values() if not s.is_finished)
+
+    def create_game(self, config: GameConfig) -> GameSession:
+        self.evict_expired()
+        if self.active_count >= self.max_games:
+            raise GameLimitError(f"Too many running games (limit {self.max_games}).")
+        
+        game_id = uuid.uuid4().hex[:12]
+        session = GameSession(game_id, build_engine(config, game_id=game_id), self.on_finished)
+        self.sessions[game_id] = session
+        
+        print(f"Game {game_id} created. Player Assignment:")
+        for name, role in session.engine.role_mapping.items():
+            print(f"  - {name}: {role}")
+        
+        session.start()
+        return session
+
+    def resume_game(self, game_id: str, config: GameConfig) -> GameSession:
+        """Continue an interrupted game from its checkpoint under the same id"""
+        session = self.sessions.get(game_id)
+        if session and not session.is_finished:
+            raise GameActiveError(f"Game {game_id} is still running.")
+        self.evict_expired()
+        if self.active_count >= self.max_games:
+            raise GameLimitError(f"Too many running games (limit {self.max_games}).")
+        
+        session = GameSession(game_id, resume_engine(config, game_id), self.on_finished)
+        self.sessions[game_id] = session
+        print(f"Game {game_id} resumed at round {session.engine.round_number} ({session.engine.next_phase}).")
+        
+        session.start()
+        return session
+
+    def get(self, game_id: str) -> Optional[GameSession]:
+        return self.sessions.get(game_id)
+
+    def list_games(self) -> List[dict]:
+        return [s.summary() for s in self.sessions.values()]
+
+    def evict_expired(self) -> int:
+        """Drop finished games older than the TTL. Returns the number evicted."""
+        now = time.monotonic()
+        expired = [
+            game_id for game_id, s in self.sessions.items()
+            if s.is_finished and now - s.finished_at >= self.ttl_seconds
+        ]
+        for game_id in expired:
+            del self.sessions[game_id]
+        return len(expired)
+
+    def run_in_background(self, awaitable: Awaitable) -> asyncio.Task:
+        """Run a task nobody awaits (the reaper, rating a finished game), keeping it referenced until done"""
+        task = asyncio.ensure_future(awaitable)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+        return task
+
+    async def run_reaper(self, interval: float = 30):
+        """Background loop that periodically evicts expired games"""
+        while True:
+            await asyncio.sleep(interval)
+            evicted = self.evict_expired()
+            if evicted:
+                print(f"Evicted {evicted} finished game(s).")
@@ -0,0 +1,78 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# (section the text belongs to, text); section is None outside any tag
+Segment = Tuple[Optional[str], str]
+
+
+class TaggedStreamParser:
+    """
+    Splits a streamed response of the form
+        <thought>...</thought><answer>...</answer>
+    into its sections as the chunks arrive. Tags may be split across chunks
+    and are matched case-insensitively; anything that is not one of the known
+    tags is passed through as text.
+    """
+
+    def __init__(self, tags: Sequence[str]):
+        self.tags = tuple(tags)
+        self.markers = {f"<{tag}>": tag for tag in self.tags}
+        self.markers.update({f"</{tag}>": None for tag in self.tags})
+        self.section: Optional[str] = None
+        self.buffer = ""
+        self.parts: Dict[str, str] = {tag: "" for tag in self.tags}
+        self.untagged = ""
+
+    def emit(self, out: List[Segment], text: str):
+        if not text:
+            return
+        if self.section is None:
+            self.untagged += text
+        else:
+            self.parts[self.section] += text
+        if out and out[-1][0] == self.section:
+            out[-1] = (self.section, out[-1][1] + text)
+        else:
+            out.append((self.section, text))
+
+    def feed(self, chunk: str) -> List[Segment]:
+        out: List[Segment] = []
+        self.buffer += chunk
+        while self.buffer:
+            lt = self.buffer.find("<")
+            if lt == -1:
+                self.emit(out, self.buffer)
+                self.buffer = ""
+            elif lt > 0:
+                self.emit(out, self.buffer[:lt])
+                self.buffer = self.buffer[lt:]
+            else:
+                gt = self.buffer.find(">")
+                if gt == -1:
+                    if any(marker.startswith(self.buffer.lower()) for marker in self.markers):
+                        break  # Possibly a tag cut off by the chunk boundary: wait for more
+                    self.emit(out, "<")
+                    self.buffer = self.buffer[1:]
+                    continue
+                candidate = self.buffer[:gt + 1].lower()
+                if candidate in self.markers:
+                    self.section = self.markers[candidate]
+                    self.buffer = self.buffer[gt + 1:]
+                else:
+                    self.emit(out, "<")
+                    self.buffer = self.buffer[1:]
+        return out
+
+    def close(self) -> List[Segment]:
+        """Flush whatever is left (an unfinished tag is kept as text)"""
+        out: List[Segment] = []
+        self.emit(out, self.buffer)
+        self.buffer = ""
+        return out
+
+    def get(self, tag: str) -> str:
+        """Text of a section; falls back to the last untagged line for a model that ignored the format"""
+        text = self.parts[tag].strip()
+        if text:
+            return text
+        lines = [line.strip() for line in self.untagged.splitlines() if line.strip()]
+        return lines[-1] if lines else ""
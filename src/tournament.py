@@ -0,0 +1,144 @@
+"""
+Headless tournament runner.
+
+Plays many seeded games without the API server or SSE and writes one JSON line
+per game to a results file. Seeds are split over a process pool, and each
+worker plays its whole share on one event loop, several games at a time:
+
+    python -m src.tournament --games 200 --workers 4 --concurrency 8 --seed 1000 --output results.jsonl
+"""
+import argparse
+import asyncio
+import json
+import os
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Manager
+from typing import List, Optional
+
+from . import agents
+from .backends import close_backends
+from .config import GameConfig
+from .sessions import build_engine
+
+
+def init_worker(rate_limit_share: float):
+    """Give each worker its share of the provider rate limits"""
+    agents.rate_limiter.set_share(rate_limit_share)
+
+
+async def play_game(config_path: str, seed: int, max_rounds: Optional[int], checkpoints: bool = False) -> dict:
+    config = GameConfig(config_path)
+    if max_rounds:
+        config.config["max_rounds"] = max_rounds
+    # Nothing resumes a tournament game, so by default its checkpoints are skipped
+    config.config["checkpoint"] = dict(config.section("checkpoint"), enabled=checkpoints)
+    engine = build_engine(config, seed=seed)
+
+    error = None
+    start = time.perf_counter()
+    try:
+        await engine.start_game()
+    except Exception as e:
+        error = repr(e)
+
+    return {
+        "game_id": engine.game_id,
+        "seed": seed,
+        "winner": engine.winner,
+        "end_reason": engine.end_reason,
+        "finished_at": engine.finished_at,
+        "rounds": engine.round_number,
+        "duration_s": round(time.perf_counter() - start, 3),
+        "players": [
+            {"name": p.name, "role": p.role, "model": p.assigned_model, "alive": p.is_alive,
+             "tokens_saved": p.memory.total_saved_tokens, **p.cache_stats}
+            for p in engine.players if p.role != "God"
+        ],
+        "usage": engine.ledger.game.as_dict(),
+        "record": engine.record,
+        "error": error,
+    }
+
+
+async def play_share(config_path: str, seeds: List[int], concurrency: int, max_rounds: Optional[int], results,
+                     checkpoints: bool = False) -> None:
+    """
+    Play one worker's seeds, `concurrency` at a time: the next game starts as
+    soon as any running one finishes, and each result is sent back when ready.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(seed: int):
+        async with semaphore:
+            result = await play_game(config_path, seed, max_rounds, checkpoints)
+        results.put(result)
+
+    try:
+        await asyncio.gather(*(run(seed) for seed in seeds))
+    finally:
+        # Shared HTTP clients are bound to this loop
+        await close_backends()
+
+
+def run_share(config_path: str, seeds: List[int], concurrency: int, max_rounds: Optional[int], results,
+              checkpoints: bool = False) -> int:
+    """Worker entry point: one event loop for all of this worker's games"""
+    asyncio.run(play_share(config_path, seeds, concurrency, max_rounds, results, checkpoints))
+    return len(seeds)
+
+
+def collect(results, futures: list, total: int):
+    """Yield results as workers send them; re-raise if a worker dies first"""
+    received = 0
+    while received < total:
+        try:
+            result = results.get(timeout=1)
+        except queue.Empty:
+            for future in futures:
+                if future.done() and future.exception():
+                    raise future.exception()
+            continue
+        received += 1
+        yield result
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Run a headless Werewolf tournament.")
+    parser.add_argument("--games", type=int, default=10, help="Number of games to play")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--concurrency", type=int, default=4, help="Games running at once per worker")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the first game (game i uses seed + i)")
+    parser.add_argument("--max-rounds", type=int, default=20, help="Call undecided games a draw after this many rounds")
+    parser.add_argument("--config", default="game_config.yaml", help="Game config file")
+    parser.add_argument("--output", default="results.jsonl", help="Results file (JSON lines, appended)")
+    parser.add_argument("--checkpoints", action="store_true", help="Checkpoint games at phase boundaries (off by default)")
+    args = parser.parse_args(argv)
+
+    seeds = [args.seed + i for i in range(args.games)]
+    workers = max(1, min(args.workers, len(seeds)))
+    # Each worker gets every n-th seed and plays them all on one event loop
+    shares = [seeds[i::workers] for i in range(workers)]
+
+    print(f"Playing {args.games} games on {workers} worker(s), {args.concurrency} per worker...")
+    start = time.perf_counter()
+    wins = {}
+
+    with open(args.output, "a", encoding="utf-8") as out, Manager() as manager, \
+            ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(1 / workers,)) as pool:
+        results = manager.Queue()
+        futures = [pool.submit(run_share, args.config, share, args.concurrency, args.max_rounds, results,
+                               args.checkpoints)
+                   for share in shares]
+        for result in collect(results, futures, len(seeds)):
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            wins[result["winner"]] = wins.get(result["winner"], 0) + 1
+            print(f"  seed {result['seed']}: {result['winner']} after {result['rounds']} round(s)")
+
+    print(f"\nDone in {time.perf_counter() - start:.1f}s. Results: {wins} -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import asyncio
+import functools
+import json
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Tracer of the game running in the current task (child tasks inherit it)
+_current_tracer: ContextVar[Optional["Tracer"]] = ContextVar("tracer", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "category", "parent", "lane", "start", "end", "args")
+
+    def __init__(self, name: str, category: str, parent: Optional["Span"], lane: int, args: dict):
+        self.name = name
+        self.category = category
+        self.parent = parent
+        self.lane = lane
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.args = args
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+    @property
+    def kind(self) -> str:
+        """Name without the per-agent suffix ("think Alice" -> "think"), for aggregation"""
+        return self.name.split(" ", 1)[0]
+
+
+class Tracer:
+    """
+    Records timing spans of one game. Each asyncio task gets its own lane
+    (a thread in the Chrome trace), so concurrent actions show side by side.
+    Very frequent, very short operations (broadcasts) are only summed up in
+    `totals` instead of getting a span each.
+    """
+
+    def __init__(self, game_id: str):
+        self.game_id = game_id
+        self.origin = time.perf_counter()
+        self.spans: List[Span] = []
+        self.lanes: Dict[int, int] = {}
+        self.totals: Dict[str, float] = defaultdict(float)
+        self.counts: Dict[str, int] = defaultdict(int)
+
+    def lane(self) -> int:
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        return self.lanes.setdefault(id(task), len(self.lanes) + 1)
+
+    @contextmanager
+    def span(self, name: str, category: str, **args) -> Iterator[Span]:
+        span = Span(name, category, _current_span.get(), self.lane(), args)
+        token = _current_span.set(span)
+        try:
+            yield span
+        finally:
+            span.end = time.perf_counter()
+            self.spans.append(span)
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                pass  # Async generator finalized from another context
+
+    def add_time(self, name: str, seconds: float):
+        self.totals[name] += seconds
+        self.counts[name] += 1
+
+    def chrome_trace(self) -> dict:
+        """Trace Event Format (chrome://tracing, Perfetto): one complete event per span"""
+        events = [
+            {
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": round((span.start - self.origin) * 1e6),
+                "dur": round(span.duration * 1e6),
+                "pid": 1,
+                "tid": span.lane,
+                "args": span.args,
+            }
+            for span in sorted(self.spans, key=lambda s: s.start)
+        ]
+        events.append({"name": "process_name", "ph": "M", "pid": 1, "args": {"name": f"game {self.game_id}"}})
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"game_id": self.game_id, "totals_s": dict(self.totals), "counts": dict(self.counts)},
+        }
+
+    def export(self, trace_dir: str) -> str:
+        os.makedirs(trace_dir, exist_ok=True)
+        path = os.path.join(trace_dir, f"{self.game_id}.trace.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
+        return path
+
+    def critical_path(self) -> List[Tuple[Span, float]]:
+        """
+        The chain of spans that determined the game's wall-clock time, as
+        (span, time attributed to it) pairs. Walking back from the end of a span,
+        the child that finished last is what the span was waiting for; time not
+        covered by any child is the span's own.
+        """
+        children: Dict[int, List[Span]] = defaultdict(list)
+        for span in self.spans:
+            if span.parent is not None:
+                children[id(span.parent)].append(span)
+        roots = [s for s in self.spans if s.parent is None]
+        if not roots:
+            return []
+
+        path: List[Tuple[Span, float]] = []
+
+        def walk(span: Span):
+            cursor = span.end
+            own = 0.0
+            candidates = sorted(children.get(id(span), []), key=lambda s: s.end, reverse=True)
+            while True:
+                child = next((c for c in candidates if c.end <= cursor + 1e-9 and c.start >= span.start), None)
+                if child is None:
+                    own += cursor - span.start
+                    break
+                own += cursor - child.end
+                walk(child)
+                cursor = child.start
+                candidates = [c for c in candidates if c.end <= cursor + 1e-9]
+            path.append((span, own))
+
+        walk(max(roots, key=lambda s: s.duration))
+        return path
+
+    def summary(self, top: int = 8) -> str:
+        path = self.critical_path()
+        if not path:
+            return f"No spans recorded for game {self.game_id}."
+        total = sum(own for _, own in path)
+        by_kind: Dict[Tuple[str, str], List[float]] = defaultdict(lambda: [0.0, 0])
+        for span, own in path:
+            entry = by_kind[(span.category, span.kind)]
+            entry[0] += own
+            entry[1] += 1
+
+        lines = [f"Critical path of game {self.game_id}: {total:.2f} s"]
+        for (category, kind), (seconds, count) in sorted(by_kind.items(), key=lambda item: -item[1][0])[:top]:
+            share = seconds / total if total else 0
+            lines.append(f"  {category:<8} {kind:<22} {seconds:8.2f} s {share:6.1%}  ({count} spans)")
+        for name, seconds in sorted(self.totals.items()):
+            lines.append(f"  (total {name}: {seconds:.3f} s over {self.counts[name]} calls)")
+        return "\n".join(lines)
+
+
+@contextmanager
+def _no_span() -> Iterator[None]:
+    yield None
+
+
+def span(name: str, category: str, **args):
+    """Span in the current game's trace; a no-op when tracing is off"""
+    tracer = _current_tracer.get()
+    if tracer is None:
+        return _no_span()
+    return tracer.span(name, category, **args)
+
+
+def add_time(name: str, seconds: float):
+    tracer = _current_tracer.get()
+    if tracer is not None:
+        tracer.add_time(name, seconds)
+
+
+@contextmanager
+def tracing(tracer: Optional[Tracer]) -> Iterator[Optional[Tracer]]:
+    """Make `tracer` the current one for this task and the tasks it starts"""
+    token = _current_tracer.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _current_tracer.reset(token)
+
+
+def traced(category: str):
+    """Decorator: run an async method inside a span named after it (and its owner's name, for agents)"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            owner = getattr(args[0], "name", None) if args else None
+            name = f"{func.__name__} {owner}" if isinstance(owner, str) else func.__name__
+            with span(name, category):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,84 @@
+import json
+from functools import lru_cache
+from typing import Dict, List, Optional, Union
+
+try:
+    import msgpack
+except ImportError:  # Optional: JSON text frames are used without it
+    msgpack = None
+
+PROTOCOL_VERSION = 1
+FORMATS = ("msgpack", "json")
+
+# Event types are interned with fixed codes, sent once in the handshake
+EVENT_TYPES = ("system", "phase", "thought", "speech", "action", "game_over", "hedge", "timeout")
+
+# Position of each field in an event frame: [op, game, id, type, agent, content, extra?]
+OP_EVENT = 0
+
+
+@lru_cache(maxsize=8192)
+def decode_event(event_json: str) -> dict:
+    """Parse a bus event once, however many connections forward it (treat the result as read-only)"""
+    return json.loads(event_json)
+
+
+class WireProtocol:
+    """
+    Per-connection framing for the WebSocket transport.
+
+    Control messages are maps with an "op" key. Events are compact arrays
+        [0, game code, event id, type code, agent code, content(, extra fields)]
+    where game, type and agent are small integers: type codes come with the
+    handshake, and the first time a game or agent appears on the connection
+    an {"op": "intern"} message maps its code to the name.
+    Frames are msgpack (binary) when the client asks for it and msgpack is
+    installed, JSON text otherwise.
+    """
+
+    def __init__(self, requested_format: str = "msgpack"):
+        self.format = "msgpack" if requested_format == "msgpack" and msgpack is not None else "json"
+        self.type_codes = {name: code for code, name in enumerate(EVENT_TYPES)}
+        self.codes: Dict[str, Dict[str, int]] = {"agent": {}, "game": {}}
+
+    def hello(self) -> dict:
+        return {"op": "hello", "version": PROTOCOL_VERSION, "format": self.format, "types": list(EVENT_TYPES)}
+
+    def intern(self, kind: str, name: str, out: List[Union[dict, list]]) -> int:
+        """Code for a game id or agent name, announcing it first if it is new"""
+        codes = self.codes[kind]
+        code = codes.get(name)
+        if code is None:
+            code = codes[name] = len(codes)
+            out.append({"op": "intern", "kind": kind, "code": code, "name": name})
+        return code
+
+    def event(self, game_id: str, event_id: int, event_json: str) -> List[Union[dict, list]]:
+        """Messages to send for one bus event (intern announcements, then the event)"""
+        event = decode_event(event_json)
+        out: List[Union[dict, list]] = []
+        game = self.intern("game", game_id, out)
+        agent = self.intern("agent", event["agent"], out)
+        event_type = self.type_codes.get(event["type"], event["type"])  # Unknown types go by name
+        frame = [OP_EVENT, game, event_id, event_type, agent, event["content"]]
+        extra = {k: v for k, v in event.items() if k not in ("type", "agent", "content")}
+        if extra:
+            frame.append(extra)
+        out.append(frame)
+        return out
+
+    def encode(self, message: Union[dict, list]) -> Union[bytes, str]:
+        if self.format == "msgpack":
+            return msgpack.packb(message, use_bin_type=True)
+        return json.dumps(message, ensure_ascii=False, separators=(",", ":"))
+
+    def decode(self, data: Union[bytes, str]) -> Optional[dict]:
+        """A client control message (either format is accepted), or None if malformed"""
+        try:
+            if isinstance(data, bytes) and msgpack is not None:
+                message = msgpack.unpackb(data, raw=False)
+            else:
+                message = json.loads(data)
+        except (ValueError, TypeError):
+            return None
+        return message if isinstance(message, dict) else None
@@ -0,0 +1,120 @@
+import asyncio
+import os
+
+from src import api
+from src.analytics import Analytics, Leaderboard, build_report, decision_stats, game_from_engine, load_games
+from src.sessions import GameManager, GameSession, build_engine
+from test_engine import fake_config
+
+
+def played_games(tmp_path, seeds):
+    config = fake_config(max_rounds=3, event_log={"enabled": True, "dir": str(tmp_path)})
+    engines = []
+    for seed in seeds:
+        engine = build_engine(config, seed=seed)
+        asyncio.run(engine.start_game())
+        engine.event_log.close()
+        engines.append(engine)
+    return engines
+
+
+def test_event_logs_carry_decision_records(tmp_path):
+    engines = played_games(tmp_path, [1, 2])
+    games = {game["game_id"]: game for game in load_games([str(tmp_path)])}
+
+    for engine in engines:
+        game = games[engine.game_id]
+        assert game["winner"] == engine.winner
+        assert {p["name"] for p in game["players"]} == set(engine.registry.by_name)
+        assert len(game["record"]["nights"]) == engine.round_number
+
+
+def test_leaderboard_rates_each_game_once():
+    board = Leaderboard(k_factor=32)
+    game = {
+        "game_id": "g1", "winner": "werewolves",
+        "players": [{"name": "A", "role": "Werewolf", "model": "m1"},
+                    {"name": "B", "role": "Villager", "model": "m2"},
+                    {"name": "C", "role": "Seer", "model": "m2"}],
+    }
+    assert board.update(game)
+    assert not board.update(game)
+    assert not board.update(dict(game, game_id="g2", winner="draw", end_reason="budget"))
+
+    assert board.rating("m1", "werewolves") == 1516
+    assert board.rating("m2", "villagers") == 1484
+    assert Leaderboard.from_dict(board.to_dict()).table() == board.table()
+
+
+def test_games_load_in_finishing_order(tmp_path):
+    engines = played_games(tmp_path, [7, 8, 9])
+    games = load_games([str(tmp_path)])
+
+    assert [game["game_id"] for game in games] == [engine.game_id for engine in engines]
+    assert all(game["end_reason"] in ("victory", "max_rounds") for game in games)
+
+
+def test_report_updates_ratings_incrementally(tmp_path):
+    played_games(tmp_path / "logs", [3, 4])
+    settings = {"ratings_path": str(tmp_path / "ratings.json"), "k_factor": 24, "initial_rating": 1500}
+
+    first = build_report([str(tmp_path / "logs")], settings)
+    second = build_report([str(tmp_path / "logs")], settings)
+
+    assert first["games"] == second["games"] == 2
+    assert first["newly_rated"] == 2 and second["newly_rated"] == 0
+    assert first["leaderboard"] == second["leaderboard"]
+
+
+def test_finished_games_are_rated_as_they_end(tmp_path):
+    played_games(tmp_path / "logs", [5])
+    settings = {"ratings_path": str(tmp_path / "ratings.json"), "k_factor": 24, "initial_rating": 1500}
+    stats = Analytics([str(tmp_path / "logs")], settings)
+    assert stats.report()["games"] == 1
+
+    engine = build_engine(fake_config(max_rounds=3), seed=6)
+    asyncio.run(engine.start_game())
+    stats.add(game_from_engine(engine))
+    stats.add(game_from_engine(engine))
+
+    assert stats.report()["games"] == 2
+    assert len(Leaderboard.load(settings["ratings_path"]).rated_games) == 2
+    assert sorted(os.listdir(tmp_path)) == ["logs", "ratings.json"]
+
+
+def test_server_keeps_rating_tasks_until_they_finish(tmp_path, monkeypatch):
+    settings = {"ratings_path": str(tmp_path / "ratings.json"), "k_factor": 24, "initial_rating": 1500}
+    monkeypatch.setattr(api, "manager", GameManager())
+    monkeypatch.setattr(api, "game_analytics", Analytics([], settings))
+    engine = build_engine(fake_config(max_rounds=3), seed=6)
+
+    async def run():
+        session = GameSession("g", engine, api.rate_finished_game)
+        session.start()
+        await session.task
+        tracked = set(api.manager.background_tasks)
+        await asyncio.gather(*tracked)
+        await asyncio.sleep(0)  # Done callbacks run on the next pass of the loop
+        return tracked, api.manager.background_tasks
+
+    tracked, remaining = asyncio.run(run())
+    assert len(tracked) == 1 and not remaining
+    assert api.game_analytics.report()["games"] == 1
+
+
+def test_decision_stats_over_records():
+    players = [{"name": "W", "role": "Werewolf", "model": "a"}, {"name": "S", "role": "Seer", "model": "b"},
+               {"name": "H", "role": "Witch", "model": "b"}, {"name": "V", "role": "Villager", "model": "a"}]
+    record = {
+        "nights": [{"round": 1, "seer": "S", "seer_check": "W", "witch": {"name": "H", "action": "SAVE", "target": "V"}},
+                   {"round": 2, "seer": "S", "seer_check": "V", "witch": {"name": "H", "action": "PASS", "target": None}}],
+        "days": [{"round": 1, "votes": {"W": "V", "S": "W", "H": "W", "V": None}, "eliminated": "W"}],
+    }
+    stats = decision_stats([{"game_id": "g", "winner": "villagers", "players": players, "record": record}])
+
+    assert stats["vote_matrix"]["villagers"] == {"villagers": 0, "werewolves": 2, "abstained": 1}
+    assert stats["vote_matrix"]["werewolves"] == {"villagers": 1, "werewolves": 0, "abstained": 0}
+    assert stats["voter_accuracy"]["overall"] == 1.0
+    assert stats["seer_hit_rate"]["models"]["b"] == {"rate": 0.5, "decisions": 2}
+    assert stats["witch_save_efficiency"]["overall"] == 1.0
+    assert stats["witch_poison_accuracy"]["decisions"] == 0
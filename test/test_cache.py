@@ -0,0 +1,93 @@
+import asyncio
+import sqlite3
+import time
+
+from src.accounting import UsageLedger
+from src.backends import LLMBackend, ScriptedBackend
+from src.cache import CachingBackend, ResponseCache
+
+
+def collect(backend, messages, usage=None):
+    async def run():
+        return [chunk async for chunk in backend.stream("m", messages, usage=usage)]
+
+    return asyncio.run(run())
+
+
+def test_replay_restreams_original_chunks_without_calling_backend(tmp_path):
+    inner = ScriptedBackend([["Ali", "ce", "\n"]])
+    backend = CachingBackend(inner, ResponseCache(str(tmp_path / "cache.sqlite"), 1 << 20), mode="replay")
+    messages = [{"role": "user", "content": "Who?"}]
+
+    live = collect(backend, messages)
+    usage = {}
+    replayed = collect(backend, messages, usage)
+
+    assert live == replayed == ["Ali", "ce", "\n"]
+    assert len(inner.calls) == 1
+    assert usage["cache_hit"]
+
+
+class HedgedBackend(LLMBackend):
+    """Answers once, reporting usage and a hedge the way HedgingBackend does"""
+
+    async def stream(self, model, messages, usage=None, **params):
+        usage.update(prompt_tokens=100, completion_tokens=10, cached_tokens=0,
+                     hedge={"model": model, "fallback": "fast", "winner": "fast", "delay_ms": 20})
+        yield "Alice"
+
+
+def test_replays_cost_nothing_and_carry_no_hedge(tmp_path):
+    backend = CachingBackend(HedgedBackend(), ResponseCache(str(tmp_path / "cache.sqlite"), 1 << 20), mode="replay")
+    messages = [{"role": "user", "content": "Who?"}]
+    ledger = UsageLedger({"default": {"input": 1.0, "output": 2.0}})
+
+    live, replayed = {}, {}
+    collect(backend, messages, live)
+    collect(backend, messages, replayed)
+    ledger.record("Alice", "m", live)
+    ledger.record("Alice", "m", replayed)
+
+    assert "hedge" in live and "hedge" not in replayed
+    totals = ledger.game.as_dict()
+    assert totals["calls"] == 2 and totals["cache_hits"] == 1
+    assert totals["total_tokens"] == 110
+    assert totals["cost_usd"] == ledger.cost("m", live)
+
+
+def test_key_depends_on_messages_and_params():
+    messages = [{"role": "user", "content": "a"}]
+    key = ResponseCache.make_key("m", messages, {})
+    assert key == ResponseCache.make_key("m", [{"content": "a", "role": "user"}], {})
+    assert key != ResponseCache.make_key("m", messages, {"temperature": 0.5})
+    assert key != ResponseCache.make_key("other", messages, {})
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_bytes=40)
+    cache.put("a", "m", ["x" * 10], [0.0], {})
+    cache.put("b", "m", ["y" * 10], [0.0], {})
+    cache.get("a")  # a is now more recent than b
+    cache.put("c", "m", ["z" * 10], [0.0], {})
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+
+def test_locked_cache_skips_stores_instead_of_blocking(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path, 1 << 20)
+    cache.put("a", "m", ["x"], [0.0], {})
+    other = sqlite3.connect(path)
+    other.execute("BEGIN IMMEDIATE")  # Another worker holding the write lock
+
+    async def run():
+        await cache.put_async("b", "m", ["y"], [0.0], {})
+        return await cache.get_async("a")
+
+    start = time.monotonic()
+    assert asyncio.run(run()) == (["x"], [0.0], {})
+    assert time.monotonic() - start < 5
+    other.rollback()
+    assert cache.get("b") is None
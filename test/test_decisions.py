@@ -0,0 +1,53 @@
+import asyncio
+
+from src.agents import Agent
+from src.backends import ScriptedBackend
+from src.decisions import parse_potion, resolve, resolve_name
+
+PLAYERS = ["Alice", "Bob", "Charlie"]
+SETTINGS = {"max_retries": 1, "retry_max_tokens": 20}
+
+
+def test_names_are_matched_loosely():
+    assert resolve_name("**bob**", PLAYERS) == "Bob"
+    assert resolve_name("Alice seems honest, so I vote Charlie.", PLAYERS) == "Charlie"
+    assert resolve_name("我投Bob", PLAYERS) == "Bob"
+    assert resolve_name("Alise", PLAYERS) == "Alice"
+    assert resolve_name("Diana", PLAYERS) is None
+
+
+def test_witch_commands_in_english_and_chinese():
+    assert parse_potion("poison: bob", PLAYERS) == ("POISON", "Bob")
+    assert parse_potion("SAVE", PLAYERS) == ("SAVE", None)
+    assert parse_potion("不救，毒Alice", PLAYERS) == ("POISON", "Alice")
+    assert parse_potion("跳过", PLAYERS) == ("PASS", None)
+    assert parse_potion("POISON Diana", PLAYERS) is None
+    assert parse_potion("", PLAYERS) is None
+
+
+def test_declining_a_potion_is_a_pass():
+    assert parse_potion("不救", PLAYERS) == ("PASS", None)
+    assert parse_potion("别救了", PLAYERS) == ("PASS", None)
+    assert parse_potion("No.", PLAYERS) == ("PASS", None)
+    assert parse_potion("none", PLAYERS) == ("PASS", None)
+    assert parse_potion("Skip this night", PLAYERS) == ("PASS", None)
+    assert parse_potion("I don't save anyone", PLAYERS) == ("PASS", None)
+    assert parse_potion("Do not poison", PLAYERS) == ("PASS", None)
+    assert parse_potion("No one", PLAYERS) == ("PASS", None)
+    assert parse_potion("No, poison Bob", PLAYERS) == ("POISON", "Bob")
+    assert parse_potion("Don't save; poison Charlie", PLAYERS) == ("POISON", "Charlie")
+
+
+def test_unmatched_answer_is_asked_again_with_tight_limit():
+    backend = ScriptedBackend(["Charlie"])
+    max_tokens = []
+    original = backend.stream
+    backend.stream = lambda model, messages, **params: max_tokens.append(params.get("max_tokens")) or original(model, messages, **params)
+    agent = Agent("Bob", "m", "Villager", "You are a villager.", backend)
+
+    target = asyncio.run(resolve(agent, "the quiet one", lambda text: resolve_name(text, PLAYERS), PLAYERS,
+                                 "Output ONLY the player's name.", SETTINGS))
+
+    assert target == "Charlie"
+    assert max_tokens == [20]
+    assert "Alice, Bob, Charlie" in backend.calls[0][1][-1]["content"]
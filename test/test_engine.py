@@ -0,0 +1,337 @@
+import asyncio
+import json
+import time
+
+from fastapi.testclient import TestClient
+
+from src import api
+from src.agents import Agent
+from src.backends import FakeBackend, LLMBackend, RoutedBackend, ScriptedBackend, create_backend
+from src.config import GameConfig
+from src.event_log import EventLogReader, EventLogWriter
+from src.hedging import HedgingBackend
+from src.ratelimit import throttled
+from src.checkpoint import load_checkpoint
+from src.sessions import build_engine, resume_engine
+
+
+def fake_config(**overrides) -> GameConfig:
+    config = GameConfig()
+    config.config["backend"] = {"type": "fake"}
+    config.config["max_rounds"] = 10
+    config.config["event_log"] = {"enabled": False}
+    config.config["checkpoint"] = {"enabled": False}
+    config.config.update(overrides)
+    return config
+
+
+def play(engine):
+    async def run():
+        subscription = engine.events.subscribe()
+        await engine.start_game()
+        return [event async for _, event in subscription]
+
+    return asyncio.run(run())
+
+
+def test_full_game_runs_offline_quickly():
+    engine = build_engine(fake_config(), seed=7)
+
+    start = time.perf_counter()
+    events = play(engine)
+
+    assert time.perf_counter() - start < 1
+    assert engine.winner in ("villagers", "werewolves", "draw")
+    assert '"game_over"' in events[-1]
+
+
+def test_seeded_games_are_reproducible():
+    # Timed flushes of the chunk coalescer depend on the wall clock, so only size-based ones here
+    events = dict(GameConfig().section("events"), coalesce_window_ms=0)
+    first = build_engine(fake_config(events=events), seed=3)
+    second = build_engine(fake_config(events=events), seed=3)
+
+    assert play(first) == play(second)
+    assert first.winner == second.winner
+
+
+def test_seeded_fake_answers_do_not_depend_on_request_order():
+    requests = [[{"role": "user", "content": f"Alive players: Alice, Bob, Cara, Dan, Eve\nOutput ONLY the name. Q{i}"}]
+                for i in range(6)]
+
+    async def answers(order):
+        backend = FakeBackend(seed=3)
+        return {i: await backend.complete("m", requests[i]) for i in order}
+
+    assert asyncio.run(answers(range(6))) == asyncio.run(answers(reversed(range(6))))
+
+
+def test_scripted_backend_replays_chunks_in_order():
+    backend = ScriptedBackend([["Ali", "ce"], "PASS"])
+
+    async def run():
+        first = [chunk async for chunk in backend.stream("m", [{"role": "user", "content": "a"}])]
+        second = await backend.complete("m", [{"role": "user", "content": "b"}])
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == ["Ali", "ce"]
+    assert second == "PASS"
+    assert [messages[-1]["content"] for _, messages in backend.calls] == ["a", "b"]
+
+
+def test_fake_backend_answers_decisions_with_living_players():
+    backend = FakeBackend(seed=1)
+    messages = [{"role": "user", "content": "Alive players: Alice, Bob\nOutput ONLY the name. No other text."}]
+    answer = asyncio.run(backend.complete("m", messages))
+    assert answer in ("Alice", "Bob")
+
+
+def test_requests_share_a_cacheable_prefix():
+    engine = build_engine(fake_config(), seed=4)
+    play(engine)
+
+    player = engine.players[1]
+    first, second = player.build_messages("a"), player.build_messages("b")
+    assert first[:-1] == second[:-1]
+    assert engine.game_intro in first[0]["content"]
+    assert player.cache_stats["cached_tokens"] > 0
+
+
+def test_event_log_replays_published_events(tmp_path):
+    engine = build_engine(fake_config(event_log={"enabled": True, "dir": str(tmp_path)}), seed=5)
+    events = play(engine)
+
+    reader = EventLogReader(str(tmp_path), engine.game_id)
+    assert [event for _, _, event in reader.read()] == events
+    assert reader.is_finished()
+
+    # Seeking to the second phase event starts the replay there
+    second_phase = reader.phases()[1]
+    first_replayed = next(reader.read(reader.seek_phase(1)))
+    assert first_replayed[0] == second_phase["event_id"]
+
+
+def test_only_finished_games_can_be_replayed(tmp_path, monkeypatch):
+    engine = build_engine(fake_config(event_log={"enabled": True, "dir": str(tmp_path)}), seed=5)
+    play(engine)
+    unfinished = EventLogWriter(str(tmp_path), "running")
+    unfinished.append(1, {"type": "phase", "content": "Night 1"}, json.dumps({"type": "phase", "content": "Night 1"}))
+    unfinished.close()
+    monkeypatch.setattr(api, "event_log_dir", str(tmp_path))
+
+    client = TestClient(api.app)
+    assert client.get("/games/running/replay").status_code == 409
+    response = client.get(f"/games/{engine.game_id}/replay?speed=0")
+    assert response.status_code == 200 and "game_over" in response.text
+
+
+def test_interrupted_game_resumes_from_checkpoint(tmp_path):
+    config = fake_config(checkpoint={"enabled": True, "dir": str(tmp_path)})
+    engine = build_engine(config, seed=6, game_id="resumed")
+
+    async def crash():
+        raise RuntimeError("server went down")
+
+    # Die right after the first night's checkpoint
+    engine.run_day_phase = crash
+    try:
+        play(engine)
+    except RuntimeError:
+        pass
+
+    state = load_checkpoint(str(tmp_path), "resumed")
+    assert (state["round_number"], state["next_phase"]) == (1, "day")
+
+    resumed = resume_engine(config, "resumed")
+    assert resumed.alive_players == engine.alive_players
+    assert [p.history for p in resumed.players] == [p.history for p in engine.players]
+
+    events = play(resumed)
+    assert "Game Resumed" in events[0]
+    assert resumed.winner in ("villagers", "werewolves", "draw")
+    assert load_checkpoint(str(tmp_path), "resumed") is None
+
+
+def test_single_call_mode_halves_requests():
+    calls = {}
+    for mode in ("two_call", "single_call"):
+        backend = FakeBackend(seed=8)
+        requests = []
+        original = backend.stream
+        backend.stream = lambda model, messages, **kw: requests.append(model) or original(model, messages, **kw)
+
+        engine = build_engine(fake_config(act_mode=mode, max_rounds=1), seed=8, backend=backend)
+        events = play(engine)
+        calls[mode] = len(requests)
+
+    assert any('"thought"' in event for event in events)
+    assert calls["single_call"] < calls["two_call"]
+
+
+def test_models_are_routed_to_their_endpoints():
+    backend = create_backend({
+        "type": "openai", "base_url": "https://example.invalid/v1", "api_key_env": None,
+        "pool": {"read_timeout": 30},
+        "endpoints": {"local": {"base_url": "http://localhost:8000/v1", "pool": {"read_timeout": 300}}},
+        "routes": {"qwen": "local", "openai/gpt-5.1": "local"},
+    })
+
+    assert isinstance(backend, RoutedBackend)
+    assert backend.backend_for("qwen/qwen3-235b-a22b-2507").base_url == "http://localhost:8000/v1"
+    assert backend.backend_for("openai/gpt-5.1").base_url == "http://localhost:8000/v1"
+    assert backend.backend_for("x-ai/grok-4").base_url == "https://example.invalid/v1"
+    assert backend.backend_for("qwen/x").http_client.timeout.read == 300
+    assert backend.default.http_client.timeout.read == 30
+
+
+class SlowPrimaryBackend(LLMBackend):
+    """`slow` takes a second to start; every other model answers at once"""
+
+    def __init__(self):
+        self.cancelled = []
+
+    async def stream(self, model, messages, usage=None, **params):
+        try:
+            if model == "slow":
+                await asyncio.sleep(1)
+            yield f"answer from {model}"
+        except asyncio.CancelledError:
+            self.cancelled.append(model)
+            raise
+
+
+def test_slow_first_token_is_hedged_to_fallback():
+    inner = SlowPrimaryBackend()
+    settings = dict(GameConfig().section("hedging"), enabled=True, fallbacks={"slow": "fast"}, initial_delay_ms=20)
+    agent = Agent("Alice", "slow", "Villager", "You are a villager.", HedgingBackend(inner, settings))
+    events = []
+
+    async def record(event_type, agent_name, content):
+        events.append((event_type, agent_name, content))
+
+    agent.event_callback = record
+
+    async def run():
+        start = time.perf_counter()
+        chunks = [chunk async for chunk in agent.call_model("Who is the wolf?")]
+        return chunks, time.perf_counter() - start
+
+    chunks, elapsed = asyncio.run(run())
+    assert chunks[0] == "answer from fast"
+    assert elapsed < 0.5
+    assert inner.cancelled == ["slow"]
+    assert events[0][0] == "hedge" and "answered by fast" in events[0][2]
+
+
+def test_budget_downgrades_then_ends_the_game():
+    config = fake_config(
+        pricing={"default": {"input": 1.0, "output": 2.0}},
+        budget={"max_tokens": 15000, "downgrade_at": 0.5, "cheap_model": "cheap/model"},
+    )
+    engine = build_engine(config, seed=10)
+    events = play(engine)
+
+    usage = json.loads(events[-1])["usage"]
+    assert engine.winner == "draw" and "budget exhausted" in engine.game_over_message
+    assert usage["game"]["total_tokens"] >= 15000
+    assert usage["game"]["cost_usd"] > 0
+    assert "cheap/model" in usage["models"]
+    assert set(usage["agents"]) == {p.name for p in engine.players}
+    # Results still credit the models the players were seated with
+    players = json.loads(events[-1])["players"]
+    assert all(p.model == "cheap/model" for p in engine.players)
+    assert "cheap/model" not in {p["model"] for p in players}
+    assert {p["model"] for p in players} == {p.assigned_model for p in engine.players}
+
+
+def test_large_lobby_rotates_discussion_speakers():
+    config = fake_config(
+        max_rounds=2, lobby={"size": 30}, discussion={"speakers": 5, "selection": "rotate"},
+        voting={"mode": "concurrent", "max_concurrency": 8},
+    )
+    engine = build_engine(config, seed=5)
+    assert len(engine.alive_players) == 30
+    assert len(engine.registry.alive_with_role("Werewolf")) == 8
+
+    engine.round_number = 1
+    first = [p.name for p in engine.discussion_speakers()]
+    engine.round_number = 2
+    second = [p.name for p in engine.discussion_speakers()]
+    assert len(first) == len(second) == 5 and not set(first) & set(second)
+
+    events = play(engine)
+    alive = engine.registry.alive_agents()
+    assert engine.registry.faction_alive["werewolves"] == sum(p.role == "Werewolf" for p in alive)
+    assert all(p.is_alive for p in alive) and len(alive) < 30
+    assert '"game_over"' in events[-1]
+
+
+class HangingBackend(FakeBackend):
+    """`hang` sends one chunk and then never finishes; every other model is the fake backend"""
+
+    def __init__(self, seed=None):
+        super().__init__(seed)
+        self.opened = 0
+        self.closed = 0
+
+    async def stream(self, model, messages, usage=None, **params):
+        if model != "hang":
+            async for chunk in super().stream(model, messages, usage=usage, **params):
+                yield chunk
+            return
+        self.opened += 1
+        try:
+            yield "Let me think"
+            await asyncio.sleep(3600)
+        finally:
+            self.closed += 1
+
+
+def test_hung_calls_time_out_and_fall_back():
+    config = fake_config(max_rounds=2, enable_streaming=True,
+                         deadlines={"call_seconds": 0.1, "decision_seconds": 0.5, "phase_seconds": 10})
+    backend = HangingBackend(seed=4)
+    engine = build_engine(config, seed=4, backend=backend)
+    wolves = engine.registry.alive_with_role("Werewolf")
+    for wolf in wolves:
+        wolf.model = "hang"
+
+    start = time.perf_counter()
+    events = [json.loads(event) for event in play(engine)]
+
+    assert time.perf_counter() - start < 5
+    assert events[-1]["type"] == "game_over"
+    assert backend.opened > 0 and backend.closed == backend.opened
+    timeouts = [e for e in events if e["type"] == "timeout"]
+    assert {e["agent"] for e in timeouts} <= {wolf.name for wolf in wolves}
+    assert any("falling back to a random target" in e["content"] for e in timeouts)
+
+
+class ThrottledBackend(ScriptedBackend):
+    """Waits for a rate limit slot (as OpenAIBackend.create does), or just stalls, before answering"""
+
+    def __init__(self, responses, wait, throttle=True):
+        super().__init__(responses)
+        self.wait = wait
+        self.throttle = throttle
+
+    async def stream(self, model, messages, usage=None, **params):
+        if self.throttle:
+            with throttled():
+                await asyncio.sleep(self.wait)
+        else:
+            await asyncio.sleep(self.wait)
+        async for chunk in super().stream(model, messages, usage=usage, **params):
+            yield chunk
+
+
+def test_rate_limit_waits_do_not_count_toward_call_deadline():
+    async def call(backend):
+        agent = Agent("Bob", "m", "Villager", "You are a villager.", backend)
+        agent.call_timeout = 0.1
+        response = "".join([chunk async for chunk in agent.call_model("Hi")])
+        return response.strip(), agent.deadline_hit
+
+    assert asyncio.run(call(ThrottledBackend([["Hello", " there"]], wait=0.3))) == ("Hello there", False)
+    assert asyncio.run(call(ThrottledBackend([["Hello", " there"]], wait=0.3, throttle=False))) == ("", True)
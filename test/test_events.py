@@ -0,0 +1,89 @@
+import asyncio
+
+from src.events import ChunkCoalescer, EventBus
+
+
+def test_every_subscriber_sees_every_event():
+    async def run():
+        bus = EventBus()
+        a, b = bus.subscribe(), bus.subscribe()
+        for i in range(3):
+            bus.publish({"type": "speech", "agent": "Alice", "content": str(i)})
+        bus.close()
+        return [item async for item in a], [item async for item in b]
+
+    a_events, b_events = asyncio.run(run())
+    assert [event_id for event_id, _ in a_events] == [1, 2, 3]
+    assert a_events == b_events
+
+
+def test_resume_from_last_event_id():
+    async def run():
+        bus = EventBus(buffer_size=4)
+        for i in range(6):
+            bus.publish({"type": "speech", "agent": "Bob", "content": str(i)})
+        resumed = bus.subscribe(last_event_id=4)
+        stale = bus.subscribe(last_event_id=1)
+        bus.close()
+        return [i for i, _ in [item async for item in resumed]], stale.missed
+
+    resumed_ids, missed = asyncio.run(run())
+    assert resumed_ids == [5, 6]
+    # Ring buffer only holds events 3..6, so 2 was lost
+    assert missed == 1
+
+
+def test_slow_subscriber_is_disconnected_not_blocking():
+    async def run():
+        bus = EventBus(subscriber_queue_size=2)
+        slow = bus.subscribe()
+        for i in range(5):
+            bus.publish({"type": "speech", "agent": "Eve", "content": str(i)})
+        received = [i for i, _ in [item async for item in slow]]
+        return received, slow.overflowed, len(bus.subscribers)
+
+    received, overflowed, subscribers = asyncio.run(run())
+    assert received == [1, 2]
+    assert overflowed
+    assert subscribers == 0
+
+
+def test_drop_oldest_policy_keeps_latest():
+    async def run():
+        bus = EventBus(subscriber_queue_size=2, overflow_policy="drop_oldest")
+        sub = bus.subscribe()
+        for i in range(5):
+            bus.publish({"type": "speech", "agent": "Eve", "content": str(i)})
+        bus.close()
+        return [i for i, _ in [item async for item in sub]], sub.dropped
+
+    received, dropped = asyncio.run(run())
+    assert received == [4, 5]
+    assert dropped == 3
+
+
+def test_coalescer_merges_chunks_and_flushes_on_phase():
+    async def run():
+        published = []
+        coalescer = ChunkCoalescer(published.append, window_ms=50, max_bytes=512)
+        for chunk in ["I ", "suspect ", "Bob."]:
+            coalescer.add({"type": "speech", "agent": "Alice", "content": chunk})
+        coalescer.add({"type": "phase", "agent": "System", "content": "Night Phase Started"})
+        return published
+
+    published = asyncio.run(run())
+    assert [e["content"] for e in published] == ["I suspect Bob.", "Night Phase Started"]
+
+
+def test_coalescer_flushes_on_window_and_size():
+    async def run():
+        published = []
+        coalescer = ChunkCoalescer(published.append, window_ms=10, max_bytes=8)
+        coalescer.add({"type": "thought", "agent": "Bob", "content": "abcd"})
+        coalescer.add({"type": "thought", "agent": "Bob", "content": "efgh"})  # hits max_bytes
+        coalescer.add({"type": "thought", "agent": "Bob", "content": "ij"})
+        await asyncio.sleep(0.03)  # window expires
+        return published
+
+    published = asyncio.run(run())
+    assert [e["content"] for e in published] == ["abcdefgh", "ij"]
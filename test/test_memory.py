@@ -0,0 +1,42 @@
+from src.memory import ContextMemory, count_tokens
+
+
+def make_history(turns: int):
+    history = []
+    for i in range(turns):
+        history.append({"role": "user", "content": f"Task prompt {i}: " + "context " * 200})
+        history.append({"role": "assistant", "content": f"Reply {i}: " + "reasoning " * 100})
+        history.append({"role": "user", "content": f"[System Notification]: Event {i} happened."})
+    return history
+
+
+def test_history_within_budget_is_sent_verbatim():
+    memory = ContextMemory(budget_tokens=100000)
+    history = make_history(3)
+    assert memory.build(history) == history
+    assert memory.last_saved_tokens == 0
+
+
+def test_old_turns_are_summarized_under_budget():
+    memory = ContextMemory(budget_tokens=2000, keep_recent=4)
+    history = make_history(10)
+
+    messages = memory.build(history)
+
+    assert count_tokens(messages) <= 2000
+    assert messages[-4:] == history[-4:]
+    summary = messages[0]["content"]
+    assert "Event 0 happened." in summary
+    assert "Task prompt" not in summary
+    assert memory.last_saved_tokens == count_tokens(history) - count_tokens(messages)
+
+
+def test_prefix_is_stable_until_next_compaction():
+    memory = ContextMemory(budget_tokens=2000, keep_recent=4)
+    history = make_history(10)
+    first = memory.build(history)
+
+    history.append({"role": "user", "content": "[System Notification]: Something small."})
+    second = memory.build(history)
+
+    assert second[:len(first)] == first
@@ -0,0 +1,35 @@
+import asyncio
+
+from src import metrics
+from src.metrics import Counter, Histogram, Registry
+from src.sessions import build_engine
+from test_engine import fake_config
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    latency = registry.register(Histogram("llm_seconds", "Latency.", ["model"], buckets=(0.1, 1)))
+    errors = registry.register(Counter("llm_errors_total", "Errors.", ["model"]))
+    for value in (0.05, 0.5, 3):
+        latency.observe(value, model="a/b")
+    errors.inc(model='say "hi"')
+
+    lines = registry.render().splitlines()
+    assert 'llm_seconds_bucket{model="a/b",le="0.1"} 1' in lines
+    assert 'llm_seconds_bucket{model="a/b",le="1"} 2' in lines
+    assert 'llm_seconds_bucket{model="a/b",le="+Inf"} 3' in lines
+    assert 'llm_seconds_count{model="a/b"} 3' in lines
+    assert 'llm_errors_total{model="say \\"hi\\""} 1' in lines
+    assert "# TYPE llm_seconds histogram" in lines
+
+
+def test_game_records_call_and_phase_metrics():
+    engine = build_engine(fake_config(max_rounds=1), seed=9)
+    model = engine.players[1].model
+    calls_before = metrics.LLM_REQUEST_DURATION.count(model=model)
+
+    asyncio.run(engine.start_game())
+
+    assert metrics.LLM_REQUEST_DURATION.count(model=model) > calls_before
+    assert metrics.PHASE_DURATION.count(phase="night") >= 1
+    assert metrics.EVENTS_PUBLISHED.get(type="game_over") >= 1
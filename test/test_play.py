@@ -0,0 +1,47 @@
+import asyncio
+import io
+import json
+
+from rich.console import Console
+
+from src.play import Dashboard, GameState, LiveViewer
+from src.sessions import build_engine
+from test_engine import fake_config, play
+
+
+def test_game_state_joins_chunks_per_agent():
+    state = GameState("g")
+    for chunk in ("I suspect ", "Bob", "."):
+        state.apply({"type": "speech", "agent": "Alice", "content": chunk})
+        state.apply({"type": "thought", "agent": "Bob", "content": chunk.upper()})
+    assert set(state.active) == {"Alice", "Bob"}
+
+    state.apply({"type": "action", "agent": "Alice", "content": "vote Bob\n"})
+    state.apply({"type": "phase", "agent": "God", "content": "Night 2"})
+
+    assert not state.active
+    assert ("speech", "Alice", "I suspect Bob.") in state.transcript
+    assert ("thought", "Bob", "I SUSPECT BOB.") in state.transcript
+    assert state.last_action == {"Alice": "vote Bob"}
+    assert state.headline() == "Night 2"
+
+
+def test_live_views_render_a_whole_game():
+    events = [json.loads(e) for e in play(build_engine(fake_config(max_rounds=2), seed=3))]
+
+    async def render():
+        viewer = LiveViewer("g")
+        for event in events:
+            await viewer.handle_event(event)
+        dashboard = Dashboard(["g"])
+        dashboard.viewers["g"] = viewer
+        for task in dashboard.tasks:
+            task.cancel()
+        return viewer, [viewer.render(), dashboard.render()]
+
+    viewer, renderables = asyncio.run(render())
+    assert viewer.game_over and viewer.state.events == len(events)
+    output = Console(width=120, height=40, record=True, file=io.StringIO())
+    for renderable in renderables:
+        output.print(renderable)
+    assert viewer.state.result.splitlines()[0] in output.export_text()
@@ -0,0 +1,25 @@
+from src.structured import TaggedStreamParser
+
+
+def parse(chunks):
+    parser = TaggedStreamParser(("thought", "answer"))
+    segments = []
+    for chunk in chunks:
+        segments.extend(parser.feed(chunk))
+    segments.extend(parser.close())
+    return parser, segments
+
+
+def test_tags_split_across_chunks():
+    parser, segments = parse(["<tho", "ught>Bob is quiet", " a < b</thou", "ght>\n<ANSWER>", "Bob</answer>"])
+
+    assert parser.parts["thought"] == "Bob is quiet a < b"
+    assert parser.get("answer") == "Bob"
+    # Streamed segments carry the same text as the final sections
+    assert "".join(text for section, text in segments if section == "thought") == parser.parts["thought"]
+    assert ("answer", "Bob") in segments
+
+
+def test_untagged_response_falls_back_to_last_line():
+    parser, _ = parse(["I suspect Alice.\n", "Alice"])
+    assert parser.get("answer") == "Alice"
@@ -0,0 +1,33 @@
+import asyncio
+import json
+
+from src.tracing import Tracer, span, tracing
+
+
+def test_critical_path_follows_the_slowest_concurrent_branch(tmp_path):
+    tracer = Tracer("g1")
+
+    async def work(name, seconds):
+        with span(name, "llm"):
+            await asyncio.sleep(seconds)
+
+    async def game():
+        with tracing(tracer), span("game", "game"):
+            with span("night", "phase"):
+                await asyncio.gather(work("fast", 0.01), work("slow", 0.05))
+            await work("day", 0.02)
+
+    asyncio.run(game())
+
+    names = [s.name for s, _ in tracer.critical_path()]
+    assert "slow" in names and "day" in names and "fast" not in names
+    assert sum(own for _, own in tracer.critical_path()) >= 0.07
+
+    trace = json.load(open(tracer.export(str(tmp_path))))
+    lanes = {e["name"]: e["tid"] for e in trace["traceEvents"] if e["ph"] == "X"}
+    assert lanes["fast"] != lanes["slow"]
+
+
+def test_spans_are_free_without_a_tracer():
+    with span("anything", "llm") as recorded:
+        assert recorded is None
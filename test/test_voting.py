@@ -0,0 +1,46 @@
+import asyncio
+import json
+
+from src.agents import Agent, God
+from src.backends import FakeBackend
+from src.config import GameConfig
+from src.game_engine import GameEngine
+
+SEATS = ["Alice", "Bob", "Cara", "Dan", "Eve"]
+
+
+class SlowVoter(Agent):
+    """Votes for `target` after a delay; records when its ballot came back"""
+
+    def __init__(self, name: str, delay: float, target: str, answered: list):
+        super().__init__(name, "m", "Villager", "You are a villager.", FakeBackend())
+        self.delay = delay
+        self.target = target
+        self.answered = answered
+
+    async def vote(self, context, round_num, game_intro, broadcast_callback=None, stream_decision=True):
+        await asyncio.sleep(self.delay)
+        self.answered.append(self.name)
+        return self.target
+
+
+def test_concurrent_votes_are_revealed_in_seat_order():
+    config = GameConfig()
+    config.config["voting"] = {"mode": "concurrent", "max_concurrency": len(SEATS)}
+    answered = []
+    # The earlier the seat, the slower the vote: ballots come back in reverse seat order
+    voters = [SlowVoter(name, 0.01 * (len(SEATS) - i), "Eve", answered) for i, name in enumerate(SEATS)]
+    engine = GameEngine([God("God", "m", "God", "", FakeBackend())] + voters, config=config)
+
+    async def run():
+        subscription = engine.events.subscribe()
+        votes = await engine.collect_votes_concurrently(voters, "Who should be eliminated?")
+        engine.coalescer.flush()
+        engine.events.close()
+        return votes, [json.loads(event) async for _, event in subscription]
+
+    votes, events = asyncio.run(run())
+
+    assert answered == SEATS[::-1]
+    assert [e["agent"] for e in events if e["type"] == "action"] == SEATS
+    assert votes == {name: "Eve" for name in SEATS}
@@ -0,0 +1,54 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+from src import api
+from src.sessions import GameManager, GameSession, build_engine
+from src.wire import EVENT_TYPES, WireProtocol
+from test_engine import fake_config
+
+
+def test_names_are_interned_once_per_connection():
+    protocol = WireProtocol("json")
+    first = protocol.event("g1", 1, json.dumps({"type": "speech", "agent": "Alice", "content": "hi"}))
+    second = protocol.event("g1", 2, json.dumps({"type": "speech", "agent": "Alice", "content": "again"}))
+
+    assert [m["name"] for m in first[:-1]] == ["g1", "Alice"]
+    assert first[-1] == [0, 0, 1, EVENT_TYPES.index("speech"), 0, "hi"]
+    assert second == [[0, 0, 2, EVENT_TYPES.index("speech"), 0, "again"]]
+    assert protocol.decode(protocol.encode({"op": "subscribe"})) == {"op": "subscribe"}
+    assert protocol.decode("not json") is None
+
+
+def test_websocket_replays_several_games_on_one_connection():
+    manager = GameManager()
+    for game_id, seed in (("a", 1), ("b", 2)):
+        engine = build_engine(fake_config(max_rounds=1), seed=seed)
+        asyncio.run(engine.start_game())
+        manager.sessions[game_id] = GameSession(game_id, engine)
+    api.manager = manager
+
+    try:
+        with TestClient(api.app).websocket_connect("/ws?format=json") as ws:
+            hello = ws.receive_json()
+            assert hello["op"] == "hello" and hello["types"] == list(EVENT_TYPES)
+
+            ws.send_json({"op": "subscribe", "game_id": "a", "last_event_id": "soon"})
+            assert ws.receive_json()["op"] == "error"
+            ws.send_json({"op": "subscribe", "game_id": "a", "last_event_id": "0"})
+            ws.send_json({"op": "subscribe", "game_id": "b", "last_event_id": 0})
+            names, events, ended = {}, {"a": 0, "b": 0}, set()
+            while len(ended) < 2:
+                message = ws.receive_json()
+                if isinstance(message, list):
+                    events[names[("game", message[1])]] += 1
+                elif message["op"] == "intern":
+                    names[(message["kind"], message["code"])] = message["name"]
+                elif message["op"] == "end":
+                    ended.add(message["game_id"])
+    finally:
+        api.manager = None
+
+    assert events["a"] == manager.get("a").engine.events.last_id
+    assert events["b"] == manager.get("b").engine.events.last_id